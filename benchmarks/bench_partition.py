@@ -0,0 +1,80 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+'''
+'@file: bench_partition.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 19:20
+'
+'''
+
+import os
+import sys, getopt
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import inventory
+from mongodb_zabbix import partition
+from fixtures import cluster
+
+
+def assign(targets, count):
+	'''Return zabbix host -> the collector it falls to, out of count collectors.'''
+	ring = partition.HashRing([str(i) for i in range(count)])
+	return dict((t[0], ring.owner(t[0])) for t in targets)
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return the number of clusters and collectors.'''
+	clusters = 200
+	collectors = 4
+	try:
+		opts, args = getopt.getopt(argv, "hc:n:", ["help"])
+	except getopt.GetoptError:
+		print('invalid option\nplease use python bench_partition.py --help for more information\n')
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			print('usage:\n  python bench_partition.py [-c <clusters>] [-n <collectors>]\n')
+			sys.exit()
+		elif opt == '-c':
+			clusters = int(arg)
+		elif opt == '-n':
+			collectors = int(arg)
+	return clusters, collectors
+
+
+def main(argv):
+	clusters, collectors = parseArg(argv)
+	targets = []
+	for i in range(clusters):
+		targets.extend(inventory.clusterTargets(cluster(i, shards=5), None))
+	hosts = set(t[0] for t in targets)
+	print('%d targets on %d zabbix hosts, %d collectors\n' % (len(targets), len(hosts), collectors))
+
+	# every target of a host lands on the same collector, and each one on exactly one
+	shares = [partition.indexPartition(i, collectors) for i in range(collectors)]
+	selected = [share.select(targets) for share in shares]
+	assert sum(len(s) for s in selected) == len(targets)
+	owners = Counter((t[0], i) for i, s in enumerate(selected) for t in s)
+	assert len(owners) == len(hosts)
+	print('%-12s %10s %10s' % ('collector', 'targets', 'hosts'))
+	for i, s in enumerate(selected):
+		print('%-12d %10d %10d' % (i, len(s), len(set(t[0] for t in s))))
+
+	before = assign(targets, collectors)
+	after = assign(targets, collectors + 1)
+	moved = sum(1 for h in hosts if before[h] != after[h])
+	print('\nhosts moved from %d to %d collectors: %d of %d (%.1f%%, ideal %.1f%%)' % (
+		collectors, collectors + 1, moved, len(hosts), 100.0 * moved / len(hosts), 100.0 / (collectors + 1)))
+	assert all(after[h] == str(collectors) for h in hosts if before[h] != after[h])
+
+	start = time.perf_counter()
+	shares[0].select(targets)
+	print('select: %.1f us per target' % ((time.perf_counter() - start) * 1e6 / len(targets)))
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
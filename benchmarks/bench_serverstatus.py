@@ -0,0 +1,108 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+'''
+'@file: bench_serverstatus.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:09
+'
+'''
+
+import os
+import sys, getopt
+import time
+import tracemalloc
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix.metrics import metric_table
+from mongodb_zabbix.status import StatusQuery, extract
+from fixtures import serverStatus
+
+
+# the fields read by the standalone and replica set collectors
+paths = [row[0] for row in metric_table]
+
+raw_options = CodecOptions(document_class=RawBSONDocument)
+
+
+def lookup(doc, path):
+	for name in path.split('.'):
+		doc = doc[name]
+	return doc
+
+
+def full_decode(data):
+	'''Decode the whole reply into dicts, as db.command('serverStatus') does.'''
+	doc = bson.BSON(data).decode()
+	return dict((p, lookup(doc, p)) for p in paths)
+
+
+def raw_document(data):
+	'''Wrap the reply in a RawBSONDocument and access the fields through it.'''
+	doc = RawBSONDocument(data, raw_options)
+	return dict((p, lookup(doc, p)) for p in paths)
+
+
+def measure(fn, data, number):
+	'''Return the mean seconds per call and the peak bytes allocated by one call.'''
+	fn(data)
+	start = time.perf_counter()
+	for i in range(number):
+		fn(data)
+	elapsed = (time.perf_counter() - start) / number
+	tracemalloc.start()
+	fn(data)
+	peak = tracemalloc.get_traced_memory()[1]
+	tracemalloc.stop()
+	return elapsed, peak
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return the number of iterations.'''
+	number = 2000
+	try:
+		opts, args = getopt.getopt(argv, "hn:", ["help"])
+	except getopt.GetoptError:
+		print('invalid option\nplease use python bench_serverstatus.py --help for more information\n')
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			print('usage:\n  python bench_serverstatus.py [-n <iterations>]\n')
+			sys.exit()
+		elif opt == '-n':
+			number = int(arg)
+	return number
+
+
+def main(argv):
+	number = parseArg(argv)
+	query = StatusQuery(paths)
+	doc = serverStatus()
+	data = bson.BSON.encode(doc)
+	# what the server sends back when the unused sections are excluded by the command
+	trimmed = dict((k, v) for k, v in doc.items() if query.command.get(k) != 0)
+	trimmed_data = bson.BSON.encode(trimmed)
+
+	assert full_decode(data) == extract(trimmed_data, query.keys) == full_decode(trimmed_data)
+
+	cases = [
+		('full decode, full reply', full_decode, data),
+		('RawBSONDocument, full reply', raw_document, data),
+		('full decode, trimmed reply', full_decode, trimmed_data),
+		('RawBSONDocument, trimmed reply', raw_document, trimmed_data),
+		('extract, trimmed reply', lambda d: extract(d, query.keys), trimmed_data),
+	]
+	print('serverStatus reply: %d bytes full, %d bytes with excluded sections\n' % (len(data), len(trimmed_data)))
+	print('%-30s %14s %14s' % ('case', 'us per node', 'peak bytes'))
+	for name, fn, payload in cases:
+		elapsed, peak = measure(fn, payload, number)
+		print('%-30s %14.1f %14d' % (name, elapsed * 1e6, peak))
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,402 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+'''
+'@file: bench_suite.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:09
+'
+'''
+
+import glob
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys, getopt
+import time
+
+import bson
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import connection
+from mongodb_zabbix import inventory
+from mongodb_zabbix import rates
+from mongodb_zabbix.metrics import getMetricMap
+from mongodb_zabbix.sender import ZabbixBatch, ZabbixSender, clockNow
+from mongodb_zabbix.status import extract, raw_options
+from fixtures import serverStatus
+
+
+bench_dir = os.path.dirname(os.path.abspath(__file__))
+default_results_dir = os.path.join(bench_dir, 'results')
+
+# the credentials every simulated node requires, so that new connections pay for authentication
+sim_user = 'bench'
+sim_pwd = 'bench'
+
+# the simulated fleet: clusters of 3 shards of 3 members, replica sets of 3 members and standalone nodes
+sim_clusters = 10
+sim_repls = 20
+sim_standalones = 50
+
+
+def simulatorOptions(out_dir, port):
+	return ['-o', out_dir, '-p', str(port), '-c', str(sim_clusters), '-r', str(sim_repls),
+		'-a', str(sim_standalones), '-u', sim_user, '-d', sim_pwd]
+
+
+def loadInventories(out_dir, kind):
+	'''Read the inventories of one kind written by the simulator.'''
+	inventories = []
+	for path in sorted(glob.glob(os.path.join(out_dir, 'fleet', '*.json'))):
+		with open(path, 'r') as f:
+			inv = json.load(f)
+		if inventory.inventoryType(inv) == kind:
+			inventories.append(inv)
+	return inventories
+
+
+def standaloneNode(out_dir):
+	inv = loadInventories(out_dir, 'standalone')[0]
+	return inv['ip'], inv['port']
+
+
+def benchDecode(number, out_dir, port):
+	'''Extract the fields of the mongod metric map from recorded serverStatus replies.'''
+	metric_map = getMetricMap('mongo')
+	replies = []
+	for seed in range(8):
+		doc = serverStatus(seed)
+		# what the server sends back for the command of the metric map
+		replies.append(bson.BSON.encode(dict((k, v) for k, v in doc.items() if metric_map.query.command.get(k) != 0)))
+	start = time.perf_counter()
+	for i in range(number):
+		extract(replies[i % len(replies)], metric_map.query.keys)
+	return number, time.perf_counter() - start
+
+
+def benchFormat(number, out_dir, port):
+	'''Turn extracted fields into item values, the counters through the rate state.'''
+	metric_map = getMetricMap('mongo')
+	statuses = [extract(bson.BSON.encode(serverStatus(seed)), metric_map.query.keys) for seed in range(8)]
+	clock = clockNow() / 1e9
+	values = 0
+	start = time.perf_counter()
+	for i in range(number):
+		# every host has its previous sample, as from the second cycle on
+		items = metric_map.items(statuses[i % len(statuses)])
+		items.extend(rates.state.rates('bench_%d' % (i % 100), metric_map.counters, statuses[i % len(statuses)], clock + i))
+		values += len(items)
+	return values, time.perf_counter() - start
+
+
+def sendItems(number):
+	clock = clockNow()
+	return [('mongo_127.0.0.%d' % (i % 250), 'mongo.op.insert', str(i), clock) for i in range(number)]
+
+
+def benchSendPerItem(number, out_dir, port):
+	'''Send every value in its own trapper request.'''
+	sender = ZabbixSender('127.0.0.1', port, chunk_size=1)
+	items = sendItems(number // 10)
+	start = time.perf_counter()
+	result = sender.send(items)
+	assert result.processed == len(items), str(result)
+	return len(items), time.perf_counter() - start
+
+
+def benchSendBatched(number, out_dir, port):
+	'''Send the values in requests of 250, as ZabbixBatch does.'''
+	sender = ZabbixSender('127.0.0.1', port)
+	items = sendItems(number * 10)
+	start = time.perf_counter()
+	result = sender.send(items)
+	assert result.processed == len(items), str(result)
+	return len(items), time.perf_counter() - start
+
+
+def benchClientPerCall(number, out_dir, port):
+	'''Run serverStatus through a new, authenticated MongoClient for every poll.'''
+	ip, node_port = standaloneNode(out_dir)
+	query = getMetricMap('mongo').query
+	polls = max(1, number // 100)
+	start = time.perf_counter()
+	for i in range(polls):
+		client = MongoClient(ip, node_port, username=sim_user, password=sim_pwd, authSource='admin')
+		try:
+			extract(client.admin.command(query.command, codec_options=raw_options), query.keys)
+		finally:
+			client.close()
+	return polls, time.perf_counter() - start
+
+
+def benchClientReused(number, out_dir, port):
+	'''Run serverStatus through the cached client of the connection manager.'''
+	ip, node_port = standaloneNode(out_dir)
+	query = getMetricMap('mongo').query
+	polls = max(1, number // 10)
+	query.run(connection.get_client(ip, node_port, sim_user, sim_pwd))
+	start = time.perf_counter()
+	for i in range(polls):
+		query.run(connection.get_client(ip, node_port, sim_user, sim_pwd))
+	return polls, time.perf_counter() - start
+
+
+def cycles(build, port, number):
+	'''Poll targets for a few cycles, as the collectors do, and return the values sent and the seconds.
+
+	The first cycle connects every node and is left out.
+
+	Args:
+		build    function   returns the targets adding their values to the given batch
+		port     int        the port of the simulated trapper
+		number   int        the number of iterations, one cycle per 1000
+	'''
+	batch = ZabbixBatch('127.0.0.1:%d' % port)
+	targets = build(batch)
+	inventory.pollTargets(targets, batch)
+	batch.send()
+	values = 0
+	start = time.perf_counter()
+	for i in range(max(1, number // 1000)):
+		inventory.pollTargets(targets, batch)
+		values += len(batch)
+		batch.send()
+	return values, time.perf_counter() - start
+
+
+def benchCycleStandalone(number, out_dir, port):
+	'''Collect all the standalone nodes of the simulator.'''
+	inventories = loadInventories(out_dir, 'standalone')
+
+	def build(batch):
+		return [t for inv in inventories for t in inventory.standaloneTargets(inv['ip'], inv['port'], batch, sim_user, sim_pwd)]
+	return cycles(build, port, number)
+
+
+def benchCycleRepl(number, out_dir, port):
+	'''Collect all the replica sets of the simulator.'''
+	inventories = loadInventories(out_dir, 'repl')
+
+	def build(batch):
+		return [t for inv in inventories for t in inventory.replTargets(inv, batch, sim_user, sim_pwd)]
+	return cycles(build, port, number)
+
+
+def benchCycleSharded(number, out_dir, port):
+	'''Collect all the sharded clusters of the simulator.'''
+	inventories = loadInventories(out_dir, 'sharded')
+
+	def build(batch):
+		return [t for inv in inventories for t in inventory.clusterTargets(inv, batch, sim_user, sim_pwd)]
+	return cycles(build, port, number)
+
+
+# (name, function, unit of its rate, whether it needs the simulator)
+cases = [
+	('decode', benchDecode, 'nodes', False),
+	('format', benchFormat, 'values', False),
+	('send.per_item', benchSendPerItem, 'values', True),
+	('send.batched', benchSendBatched, 'values', True),
+	('client.per_call', benchClientPerCall, 'polls', True),
+	('client.reused', benchClientReused, 'polls', True),
+	('cycle.standalone', benchCycleStandalone, 'values', True),
+	('cycle.repl', benchCycleRepl, 'values', True),
+	('cycle.sharded', benchCycleSharded, 'values', True),
+]
+
+
+def runCase(name, number, repeat, out_dir, port):
+	'''Run one case in this process and print its result as the last line of output.
+
+	Every case runs in its own process, so that its peak RSS is its own.
+	'''
+	fn = dict((c[0], c[1]) for c in cases)[name]
+	best = None
+	for i in range(repeat):
+		count, seconds = fn(number, out_dir, port)
+		if best is None or count / seconds > best[0] / best[1]:
+			best = (count, seconds)
+	connection.close_all()
+	print(json.dumps({
+		'count': best[0],
+		'seconds': best[1],
+		'peak_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	}))
+
+
+def startSimulator(out_dir, port):
+	'''Start simulator.py and wait until its nodes are listening.'''
+	sim = subprocess.Popen([sys.executable, os.path.join(bench_dir, 'simulator.py')] + simulatorOptions(out_dir, port),
+		stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+	for line in sim.stdout:
+		if 'listening' in line:
+			# leave its periodic report unread, it is a few hundred bytes every 10 seconds
+			return sim
+	raise RuntimeError('the simulator did not start')
+
+
+def freePort():
+	sock = socket.socket()
+	sock.bind(('127.0.0.1', 0))
+	port = sock.getsockname()[1]
+	sock.close()
+	return port
+
+
+def gitVersion():
+	try:
+		return subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=bench_dir,
+			stderr=subprocess.DEVNULL, universal_newlines=True).strip()
+	except (OSError, subprocess.CalledProcessError):
+		return 'unknown'
+
+
+def runSuite(selected, number, repeat, out_dir):
+	'''Run the selected cases, each in a child process, and return their results.'''
+	port = freePort()
+	sim = None
+	if any(c[3] for c in cases if c[0] in selected):
+		sim = startSimulator(out_dir, port)
+	results = {}
+	try:
+		for name, fn, unit, needs_sim in cases:
+			if name not in selected:
+				continue
+			output = subprocess.check_output([sys.executable, os.path.abspath(__file__), '--case', name,
+				'-n', str(number), '-k', str(repeat), '-o', out_dir, '--port', str(port)], universal_newlines=True)
+			result = json.loads(output.strip().splitlines()[-1])
+			result['unit'] = unit
+			result['per_sec'] = result['count'] / result['seconds']
+			results[name] = result
+			print('%-18s %12.1f %-7s/s %10.1f MB' % (name, result['per_sec'], unit, result['peak_rss_kb'] / 1024.0))
+	finally:
+		if sim is not None:
+			sim.terminate()
+			sim.wait()
+	return results
+
+
+def compare(results, baseline, threshold):
+	'''Print the change of every case against a baseline and return the regressions.
+
+	A case regresses when its rate drops, or its peak RSS grows, by more than
+	threshold percent.
+	'''
+	regressions = []
+	print('\ncompared with %s (%s):' % (baseline['version'], baseline['date']))
+	print('%-18s %12s %12s' % ('case', 'rate', 'peak RSS'))
+	for name, result in sorted(results.items()):
+		old = baseline['results'].get(name)
+		if old is None:
+			continue
+		rate = 100.0 * (result['per_sec'] / old['per_sec'] - 1)
+		rss = 100.0 * (float(result['peak_rss_kb']) / old['peak_rss_kb'] - 1)
+		print('%-18s %+11.1f%% %+11.1f%%' % (name, rate, rss))
+		if rate < -threshold:
+			regressions.append('%s: %.1f%% fewer %s/s' % (name, -rate, result['unit']))
+		if rss > threshold:
+			regressions.append('%s: %.1f%% more peak RSS' % (name, rss))
+	return regressions
+
+
+def latestResults(results_dir, machine, exclude):
+	'''Return the newest stored results of the machine, other than the given file, None if there are none.'''
+	latest = None
+	for path in glob.glob(os.path.join(results_dir, '*.json')):
+		if os.path.abspath(path) == os.path.abspath(exclude):
+			continue
+		with open(path, 'r') as f:
+			stored = json.load(f)
+		if stored.get('machine') == machine and (latest is None or stored['date'] > latest['date']):
+			latest = stored
+	return latest
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return the suite options.'''
+	options = {
+		'case': '', 'port': 0, 'number': 20000, 'repeat': 3, 'out_dir': '/tmp/mongodb_bench',
+		'results_dir': default_results_dir, 'version': '', 'baseline': '', 'threshold': 10.0, 'select': ''
+	}
+	try:
+		opts, args = getopt.getopt(argv, "hn:k:o:s:v:b:p:c:", ["help", "case=", "port="])
+	except getopt.GetoptError:
+		print('invalid option\nplease use python bench_suite.py --help for more information\n')
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			print('usage:\n  python bench_suite.py [-n <number>] [-k <repeat>] [-c <case,...>] [-o <simulator_dir>] [-s <results_dir>] [-v <version>] [-b <baseline.json>] [-p <threshold_percent>]\n')
+			print('  cases: ' + ', '.join(c[0] for c in cases))
+			print('  the results are stored as <results_dir>/<version>.json, the version defaults to git describe,')
+			print('  and compared with -b, or the newest results of the same machine; the exit status is 1 when a case')
+			print('  lost more than <threshold_percent> (default: 10) of its rate or gained as much peak RSS')
+			sys.exit()
+		elif opt == '--case':
+			options['case'] = arg
+		elif opt == '--port':
+			options['port'] = int(arg)
+		elif opt == '-n':
+			options['number'] = int(arg)
+		elif opt == '-k':
+			options['repeat'] = int(arg)
+		elif opt == '-c':
+			options['select'] = arg
+		elif opt == '-o':
+			options['out_dir'] = arg
+		elif opt == '-s':
+			options['results_dir'] = arg
+		elif opt == '-v':
+			options['version'] = arg
+		elif opt == '-b':
+			options['baseline'] = arg
+		elif opt == '-p':
+			options['threshold'] = float(arg)
+	return options
+
+
+def main(argv):
+	o = parseArg(argv)
+	if o['case']:
+		runCase(o['case'], o['number'], o['repeat'], o['out_dir'], o['port'])
+		return
+	selected = o['select'].split(',') if o['select'] else [c[0] for c in cases]
+	version = o['version'] or gitVersion()
+	machine = platform.node()
+	print('version %s on %s, %d iterations, best of %d\n' % (version, machine, o['number'], o['repeat']))
+	results = runSuite(selected, o['number'], o['repeat'], o['out_dir'])
+
+	if not os.path.isdir(o['results_dir']):
+		os.makedirs(o['results_dir'])
+	path = os.path.join(o['results_dir'], version + '.json')
+	if o['baseline']:
+		with open(o['baseline'], 'r') as f:
+			baseline = json.load(f)
+	else:
+		baseline = latestResults(o['results_dir'], machine, path)
+	stored = {
+		'version': version,
+		'machine': machine,
+		'python': platform.python_version(),
+		'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+		'number': o['number'],
+		'results': results
+	}
+	with open(path, 'w') as f:
+		json.dump(stored, f, indent=1, sort_keys=True)
+	print('\nresults stored in', path)
+
+	if baseline is not None:
+		regressions = compare(results, baseline, o['threshold'])
+		if regressions:
+			print('\nregressions:\n  ' + '\n  '.join(regressions))
+			sys.exit(1)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,133 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: fixtures.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 22:30
+'
+'''
+
+import datetime
+import random
+
+from bson.int64 import Int64
+
+
+# the sections of a MongoDB 4.0 wiredTiger serverStatus and their number of counters
+wiredtiger_sections = {
+	'async': 16, 'block-manager': 14, 'cache': 110, 'connection': 22, 'cursor': 40,
+	'data-handle': 12, 'lock': 30, 'log': 60, 'perf': 40, 'reconciliation': 16,
+	'session': 20, 'thread-state': 4, 'thread-yield': 22, 'transaction': 40,
+	'concurrentTransactions': 6, 'LSM': 20, 'snapshot-window-settings': 6
+}
+
+commands = ['aggregate', 'buildInfo', 'collStats', 'count', 'createIndexes', 'delete',
+	'distinct', 'drop', 'find', 'findAndModify', 'getMore', 'getLastError', 'insert',
+	'isMaster', 'killCursors', 'listCollections', 'listDatabases', 'listIndexes', 'ping',
+	'replSetGetStatus', 'replSetHeartbeat', 'replSetUpdatePosition', 'saslContinue',
+	'saslStart', 'serverStatus', 'update', 'whatsmyuri', 'dbStats', 'explain', 'hello']
+
+
+def counter(rnd):
+	return Int64(rnd.randint(0, 1 << 40))
+
+
+def serverStatus(seed=0, role='mongod'):
+	'''Build a serverStatus document with the shape and size of a MongoDB 4.0 mongod.
+
+	Args:
+		seed   int      the seed of the random counters
+		role   string   'mongod' or 'mongos', mongos has no wiredTiger section
+
+	Returns:
+		the serverStatus dict, about 30-40 KB of BSON for a mongod
+	'''
+	rnd = random.Random(seed)
+	doc = {
+		'host': 'node%d:27017' % seed,
+		'version': '4.0.6',
+		'process': role,
+		'pid': Int64(rnd.randint(1000, 60000)),
+		'uptime': float(rnd.randint(1000, 10000000)),
+		'uptimeMillis': Int64(rnd.randint(1000, 1 << 34)),
+		'uptimeEstimate': Int64(rnd.randint(1000, 10000000)),
+		'localTime': datetime.datetime(2019, 2, 14, 15, 33),
+		'asserts': dict((k, rnd.randint(0, 100)) for k in ('regular', 'warning', 'msg', 'user', 'rollovers')),
+		'connections': {'current': rnd.randint(1, 500), 'available': rnd.randint(1000, 50000), 'totalCreated': rnd.randint(1, 100000)},
+		'extra_info': {'note': 'fields vary by platform', 'page_faults': rnd.randint(0, 10000)},
+		'globalLock': {
+			'totalTime': Int64(rnd.randint(0, 1 << 40)),
+			'currentQueue': {'total': 0, 'readers': 0, 'writers': 0},
+			'activeClients': {'total': 12, 'readers': 0, 'writers': 0}
+		},
+		'locks': dict((name, {
+			'acquireCount': dict((m, counter(rnd)) for m in ('r', 'w', 'R', 'W')),
+			'acquireWaitCount': dict((m, counter(rnd)) for m in ('r', 'w')),
+			'timeAcquiringMicros': dict((m, counter(rnd)) for m in ('r', 'w'))
+		}) for name in ('Global', 'Database', 'Collection', 'Metadata', 'oplog', 'Mutex')),
+		'logicalSessionRecordCache': dict(('field%d' % i, rnd.randint(0, 1000)) for i in range(14)),
+		'network': {
+			'bytesIn': counter(rnd), 'bytesOut': counter(rnd), 'physicalBytesIn': counter(rnd),
+			'physicalBytesOut': counter(rnd), 'numRequests': counter(rnd),
+			'compression': dict((c, {'compressor': {'bytesIn': counter(rnd), 'bytesOut': counter(rnd)},
+				'decompressor': {'bytesIn': counter(rnd), 'bytesOut': counter(rnd)}}) for c in ('snappy', 'zstd', 'zlib')),
+			'serviceExecutorTaskStats': {'executor': 'passthrough', 'threadsRunning': rnd.randint(1, 100)}
+		},
+		'opLatencies': dict((k, {'latency': counter(rnd), 'ops': counter(rnd)}) for k in ('reads', 'writes', 'commands')),
+		'opcounters': dict((k, counter(rnd)) for k in ('insert', 'query', 'update', 'delete', 'getmore', 'command')),
+		'opcountersRepl': dict((k, counter(rnd)) for k in ('insert', 'query', 'update', 'delete', 'getmore', 'command')),
+		'mem': {'bits': 64, 'resident': rnd.randint(100, 64000), 'virtual': rnd.randint(1000, 128000), 'supported': True},
+		'metrics': {
+			'commands': dict((c, {'failed': counter(rnd), 'total': counter(rnd)}) for c in commands),
+			'cursor': {'timedOut': counter(rnd), 'open': {'noTimeout': counter(rnd), 'pinned': counter(rnd), 'total': counter(rnd)}},
+			'document': dict((k, counter(rnd)) for k in ('deleted', 'inserted', 'returned', 'updated')),
+			'getLastError': {'wtime': {'num': 0, 'totalMillis': 0}, 'wtimeouts': counter(rnd)},
+			'operation': dict((k, counter(rnd)) for k in ('scanAndOrder', 'writeConflicts')),
+			'query': {'updateOneOpStyleBroadcastWithExactIDCount': counter(rnd)},
+			'queryExecutor': {'scanned': counter(rnd), 'scannedObjects': counter(rnd)},
+			'record': {'moves': counter(rnd)},
+			'repl': {
+				'executor': dict(('counter%d' % i, counter(rnd)) for i in range(30)),
+				'apply': {'attemptsToBecomeSecondary': counter(rnd), 'batches': {'num': 0, 'totalMillis': 0}, 'ops': counter(rnd)},
+				'buffer': dict((k, counter(rnd)) for k in ('count', 'maxSizeBytes', 'sizeBytes')),
+				'network': dict((k, counter(rnd)) for k in ('bytes', 'getmores', 'ops', 'readersCreated'))
+			},
+			'ttl': {'deletedDocuments': counter(rnd), 'passes': counter(rnd)}
+		},
+		'storageEngine': {'name': 'wiredTiger', 'supportsCommittedReads': True, 'persistent': True},
+		'tcmalloc': {
+			'generic': {'current_allocated_bytes': counter(rnd), 'heap_size': counter(rnd)},
+			'tcmalloc': dict(('counter%d' % i, counter(rnd)) for i in range(24))
+		},
+		'transactions': dict(('counter%d' % i, counter(rnd)) for i in range(10)),
+		'ok': 1.0
+	}
+	if role == 'mongod':
+		doc['wiredTiger'] = dict((section, dict(('%s counter number %d' % (section, i), counter(rnd)) for i in range(size)))
+			for section, size in wiredtiger_sections.items())
+	return doc
+
+
+def cluster(index, shards=3, members=3, network=10):
+	'''Build a cluster.json-shaped inventory whose components share hosts, as in the shipped example.
+
+	Args:
+		index     int   the number of the cluster, used to give it its own ip range
+		shards    int   the number of shards
+		members   int   the number of members of every shard, the last one an arbiter
+		network   int   the first byte of the ips, e.g. 127 for clusters simulated on localhost
+
+	Returns:
+		the cluster dict
+	'''
+	hosts = ['%d.%d.%d.%d' % (network, index // 250, index % 250, i + 1) for i in range(members)]
+	return {
+		'mongos': [{'ip': ip, 'port': 20000} for ip in hosts],
+		'config': [{'ip': ip, 'port': 21000, 'role': 'not arbiter'} for ip in hosts],
+		'shard': [{
+			'name': 'shard%d' % s,
+			'members': [{'ip': hosts[(s + m) % members], 'port': 27001 + s,
+				'role': 'arbiter' if m == members - 1 else 'not arbiter'} for m in range(members)]
+		} for s in range(shards)]
+	}
@@ -0,0 +1,635 @@
+#!/usr/bin/python
+#-*- coding: utf-8 -*-
+
+'''
+'@file: simulator.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:14
+'
+'''
+
+import asyncio
+import base64
+import datetime
+import hashlib
+import hmac
+import json
+import os
+import random
+import resource
+import struct
+import sys, getopt
+import time
+from collections import Counter
+
+import bson
+from bson.binary import Binary
+from bson.int64 import Int64
+
+from fixtures import cluster, serverStatus
+
+
+# the wire protocol opcodes the collectors use
+op_reply = 1
+op_query = 2004
+op_msg = 2013
+msg_header = struct.Struct('<iiii')
+
+# the wire version of MongoDB 4.0, so pymongo neither streams heartbeats nor expects OP_MSG exhaust
+max_wire_version = 7
+
+# the serverStatus documents are built once per seed and shared, nodes only keep their offsets
+status_seeds = 16
+
+# the counters that grow with the uptime of a node: dotted path -> the maximum rate per second
+growing = {
+	'opcounters.insert': 2000, 'opcounters.query': 5000, 'opcounters.update': 1000,
+	'opcounters.delete': 200, 'opcounters.getmore': 500, 'opcounters.command': 8000,
+	'network.bytesIn': 4000000, 'network.bytesOut': 16000000, 'network.numRequests': 10000,
+	'extra_info.page_faults': 5
+}
+
+scram_iterations = 4096
+
+
+class Faults(object):
+	'''How the fake nodes misbehave.
+
+	Attributes:
+		latency     float   the seconds every reply is delayed by
+		jitter      float   the seconds of random delay added on top of latency
+		fail_rate   float   the share of requests answered by dropping the connection
+		hang_rate   float   the share of requests never answered
+	'''
+
+	def __init__(self, latency=0.0, jitter=0.0, fail_rate=0.0, hang_rate=0.0):
+		self.latency = latency
+		self.jitter = jitter
+		self.fail_rate = fail_rate
+		self.hang_rate = hang_rate
+
+
+class Credentials(object):
+	'''The SCRAM-SHA-1 keys of the one user of every fake node.'''
+
+	def __init__(self, user, pwd):
+		self.user = user
+		self.salt = os.urandom(16)
+		digest = hashlib.md5(('%s:mongo:%s' % (user, pwd)).encode('utf-8')).hexdigest()
+		salted = hashlib.pbkdf2_hmac('sha1', digest.encode('utf-8'), self.salt, scram_iterations)
+		self.stored_key = hashlib.sha1(hmacSha1(salted, b'Client Key')).digest()
+		self.server_key = hmacSha1(salted, b'Server Key')
+
+
+def hmacSha1(key, data):
+	return hmac.new(key, data, hashlib.sha1).digest()
+
+
+def parseScram(payload):
+	'''Split a SCRAM message, b'n=user,r=nonce', into its fields.'''
+	return dict(item.split(b'=', 1) for item in payload.split(b','))
+
+
+class Node(object):
+	'''One fake mongod, mongos or arbiter listening on its own ip:port of 127.0.0.0/8.'''
+
+	def __init__(self, ip, port, role, seed):
+		'''
+		Args:
+			ip     string   the ip, e.g. '127.0.1.2'
+			port   int      the port
+			role   string   'mongod', 'mongos' or 'arbiter'
+			seed   int      the seed of the node's counters and rates
+		'''
+		rnd = random.Random(seed)
+		self.ip = ip
+		self.port = port
+		self.name = '%s:%d' % (ip, port)
+		self.role = role
+		self.seed = seed % status_seeds
+		self.started = time.time() - rnd.randint(1000, 1000000)
+		self.rates = dict((path, rnd.random() * rate) for path, rate in growing.items())
+		self.down = False
+		# set by ReplicaSet and SimulatedCluster
+		self.replset = None
+		self.cluster = None
+
+	def uptime(self):
+		return time.time() - self.started
+
+
+class ReplicaSet(object):
+	'''The members of a fake replica set, the first healthy data bearing one is the primary.'''
+
+	def __init__(self, name, nodes):
+		self.name = name
+		self.nodes = nodes
+		rnd = random.Random(name)
+		# name -> the seconds a secondary lags behind
+		self.lags = dict((n.name, rnd.random() * 2) for n in nodes)
+		for n in nodes:
+			n.replset = self
+
+	def primary(self):
+		for n in self.nodes:
+			if n.role == 'mongod' and not n.down:
+				return n
+		return None
+
+	def hostString(self):
+		return self.name + '/' + ','.join(n.name for n in self.nodes if n.role != 'arbiter')
+
+	def state(self, node):
+		if node.down:
+			return 8
+		if node.role == 'arbiter':
+			return 7
+		return 1 if node is self.primary() else 2
+
+	def status(self, me):
+		'''Build the replSetGetStatus reply of a member.'''
+		now = datetime.datetime.utcnow().replace(microsecond=0)
+		primary = self.primary()
+		members = []
+		for i, n in enumerate(self.nodes):
+			member = {
+				'_id': i,
+				'name': n.name,
+				'health': 0.0 if n.down else 1.0,
+				'state': self.state(n),
+				'stateStr': {1: 'PRIMARY', 2: 'SECONDARY', 7: 'ARBITER', 8: '(not reachable/healthy)'}[self.state(n)],
+				'uptime': 0 if n.down else int(n.uptime())
+			}
+			if n.role != 'arbiter':
+				lag = 0 if n is primary else self.lags[n.name]
+				member['optimeDate'] = now - datetime.timedelta(seconds=int(lag))
+			if n is me:
+				member['self'] = True
+			elif not n.down:
+				member['pingMs'] = Int64(random.randint(0, 5))
+			members.append(member)
+		return {'set': self.name, 'date': now, 'myState': self.state(me), 'members': members, 'ok': 1.0}
+
+	def config(self):
+		'''Build the replSetGetConfig reply.'''
+		return {'config': {'_id': self.name, 'version': 1, 'members': [
+			{'_id': i, 'host': n.name, 'arbiterOnly': n.role == 'arbiter'} for i, n in enumerate(self.nodes)]}, 'ok': 1.0}
+
+	def isMaster(self, me):
+		primary = self.primary()
+		reply = {
+			'setName': self.name,
+			'hosts': [n.name for n in self.nodes if n.role != 'arbiter'],
+			'arbiters': [n.name for n in self.nodes if n.role == 'arbiter'],
+			'me': me.name,
+			'ismaster': me is primary,
+			'secondary': me.role == 'mongod' and me is not primary,
+			'arbiterOnly': me.role == 'arbiter'
+		}
+		if primary is not None:
+			reply['primary'] = primary.name
+		return reply
+
+
+class SimulatedCluster(object):
+	'''The mongos, config servers and shards of a fake sharded cluster.'''
+
+	def __init__(self, mongos, config, shards):
+		self.mongos = mongos
+		self.config = config
+		self.shards = shards
+		for n in mongos:
+			n.cluster = self
+
+	def listShards(self):
+		return {'shards': [{'_id': s.name, 'host': s.hostString(), 'state': 1} for s in self.shards], 'ok': 1.0}
+
+	def cmdLineOpts(self):
+		return {'argv': ['mongos'], 'parsed': {'sharding': {'configDB': self.config.hostString()}}, 'ok': 1.0}
+
+	def mongosPings(self):
+		now = datetime.datetime.utcnow()
+		return [{'_id': n.name, 'ping': now} for n in self.mongos if not n.down]
+
+
+class Simulator(object):
+	'''All the fake nodes, served by one asyncio loop, and the statistics of their requests.'''
+
+	def __init__(self, faults, credentials=None):
+		self.faults = faults
+		self.credentials = credentials
+		self.nodes = []
+		self.statuses = [serverStatus(seed) for seed in range(status_seeds)]
+		self.mongos_statuses = [serverStatus(seed, 'mongos') for seed in range(status_seeds)]
+		self.requests = Counter()
+		self.injected = Counter()
+
+	def add(self, node):
+		self.nodes.append(node)
+		return node
+
+	def serverStatus(self, node, command):
+		'''Build the serverStatus of a node: the shared document of its seed with its own uptime and counters.
+
+		The sections excluded by the command, as the collectors do, are left out.
+		'''
+		base = (self.mongos_statuses if node.role == 'mongos' else self.statuses)[node.seed]
+		uptime = node.uptime()
+		doc = dict((k, v) for k, v in base.items() if command.get(k, 1) != 0)
+		doc['uptime'] = float(int(uptime))
+		doc['uptimeMillis'] = Int64(int(uptime * 1000))
+		doc['localTime'] = datetime.datetime.utcnow()
+		doc['host'] = node.name
+		changed = {}
+		for path, rate in node.rates.items():
+			section, field = path.split('.')
+			if section in doc:
+				if section not in changed:
+					changed[section] = doc[section] = dict(doc[section])
+				doc[section][field] = Int64(int(rate * uptime))
+		if 'connections' in doc:
+			doc['connections'] = dict(doc['connections'], current=random.randint(10, 500))
+		return doc
+
+	def command(self, node, session, command):
+		'''Answer one command of a node.
+
+		Args:
+			node      Node     the node that received the command
+			session   dict     the state of the connection: 'authenticated', 'scram'
+			command   dict     the command document
+
+		Returns:
+			the reply document
+		'''
+		name = next(iter(command))
+		self.requests[name] += 1
+		lower = name.lower()
+		if lower in ('ismaster', 'hello'):
+			reply = {
+				'ismaster': True, 'maxBsonObjectSize': 16777216, 'maxMessageSizeBytes': 48000000,
+				'maxWriteBatchSize': 100000, 'localTime': datetime.datetime.utcnow(),
+				'logicalSessionTimeoutMinutes': 30, 'minWireVersion': 0, 'maxWireVersion': max_wire_version,
+				'readOnly': False, 'ok': 1.0
+			}
+			if node.role == 'mongos':
+				reply['msg'] = 'isdbgrid'
+			elif node.replset is not None:
+				reply.update(node.replset.isMaster(node))
+			if self.credentials is not None and 'saslSupportedMechs' in command:
+				reply['saslSupportedMechs'] = ['SCRAM-SHA-1']
+			return reply
+		if lower in ('ping', 'endsessions', 'buildinfo'):
+			return {'version': '4.0.6', 'ok': 1.0}
+		if lower == 'saslstart':
+			return self.saslStart(session, command)
+		if lower == 'saslcontinue':
+			return self.saslContinue(session, command)
+		if self.credentials is not None and not session.get('authenticated') and node.role != 'arbiter':
+			return {'ok': 0.0, 'errmsg': 'command %s requires authentication' % name, 'code': 13, 'codeName': 'Unauthorized'}
+		if lower == 'serverstatus':
+			return self.serverStatus(node, command)
+		if lower == 'replsetgetstatus' and node.replset is not None:
+			return node.replset.status(node)
+		if lower == 'replsetgetconfig' and node.replset is not None:
+			return node.replset.config()
+		if lower == 'listshards' and node.cluster is not None:
+			return node.cluster.listShards()
+		if lower == 'getcmdlineopts' and node.cluster is not None:
+			return node.cluster.cmdLineOpts()
+		if lower == 'find' and node.cluster is not None and command[name] == 'mongos':
+			return {'cursor': {'firstBatch': node.cluster.mongosPings(), 'id': Int64(0), 'ns': 'config.mongos'}, 'ok': 1.0}
+		return {'ok': 0.0, 'errmsg': 'no such command: \'%s\'' % name, 'code': 59, 'codeName': 'CommandNotFound'}
+
+	def saslStart(self, session, command):
+		'''Answer the client first message of SCRAM-SHA-1.'''
+		if self.credentials is None or command.get('mechanism') != 'SCRAM-SHA-1':
+			return {'ok': 0.0, 'errmsg': 'Authentication failed.', 'code': 18, 'codeName': 'AuthenticationFailed'}
+		first_bare = bytes(command['payload'])[3:]
+		fields = parseScram(first_bare)
+		nonce = fields[b'r'] + base64.b64encode(os.urandom(18))
+		server_first = b'r=' + nonce + b',s=' + base64.b64encode(self.credentials.salt) + b',i=' + str(scram_iterations).encode()
+		session['scram'] = (fields[b'n'].decode('utf-8'), first_bare, server_first)
+		return {'conversationId': 1, 'done': False, 'payload': Binary(server_first), 'ok': 1.0}
+
+	def saslContinue(self, session, command):
+		'''Check the client proof of SCRAM-SHA-1 and answer with the server signature.'''
+		if 'scram' not in session:
+			return {'conversationId': 1, 'done': True, 'payload': Binary(b''), 'ok': 1.0}
+		user, first_bare, server_first = session.pop('scram')
+		final = bytes(command['payload'])
+		without_proof, proof = final.rsplit(b',p=', 1)
+		auth_message = first_bare + b',' + server_first + b',' + without_proof
+		signature = hmacSha1(self.credentials.stored_key, auth_message)
+		client_key = bytes(a ^ b for a, b in zip(base64.b64decode(proof), signature))
+		if user != self.credentials.user or hashlib.sha1(client_key).digest() != self.credentials.stored_key:
+			return {'ok': 0.0, 'errmsg': 'Authentication failed.', 'code': 18, 'codeName': 'AuthenticationFailed'}
+		session['authenticated'] = True
+		server_signature = base64.b64encode(hmacSha1(self.credentials.server_key, auth_message))
+		return {'conversationId': 1, 'done': True, 'payload': Binary(b'v=' + server_signature), 'ok': 1.0}
+
+	async def serve(self, node, reader, writer):
+		'''Serve the OP_QUERY and OP_MSG requests of one connection to a node.'''
+		session = {}
+		try:
+			while True:
+				header = await reader.readexactly(msg_header.size)
+				length, request_id, response_to, opcode = msg_header.unpack(header)
+				body = await reader.readexactly(length - msg_header.size)
+				faults = self.faults
+				draw = random.random()
+				if draw < faults.fail_rate:
+					self.injected['failed'] += 1
+					break
+				if draw < faults.fail_rate + faults.hang_rate:
+					self.injected['hung'] += 1
+					await asyncio.sleep(3600)
+					break
+				delay = faults.latency + random.random() * faults.jitter
+				if delay > 0:
+					await asyncio.sleep(delay)
+				if opcode == op_query:
+					writer.write(self.opQuery(node, session, request_id, body))
+				elif opcode == op_msg:
+					reply = self.opMsg(node, session, request_id, body)
+					if reply is None:
+						continue
+					writer.write(reply)
+				else:
+					break
+				await writer.drain()
+		except (asyncio.IncompleteReadError, ConnectionError):
+			pass
+		finally:
+			writer.close()
+
+	def opQuery(self, node, session, request_id, body):
+		'''Answer an OP_QUERY command, as sent by the handshake, with an OP_REPLY.'''
+		offset = 4
+		offset = body.index(b'\x00', offset) + 1 + 8
+		size = struct.unpack_from('<i', body, offset)[0]
+		command = bson.BSON(body[offset:offset + size]).decode()
+		if '$query' in command:
+			command = command['$query']
+		doc = bson.BSON.encode(self.command(node, session, command))
+		payload = struct.pack('<iqii', 0, 0, 0, 1) + doc
+		return msg_header.pack(msg_header.size + len(payload), 0, request_id, op_reply) + payload
+
+	def opMsg(self, node, session, request_id, body):
+		'''Answer an OP_MSG command with an OP_MSG, or return None when no reply is expected.'''
+		flags = struct.unpack_from('<I', body, 0)[0]
+		end = len(body) - (4 if flags & 1 else 0)
+		offset = 4
+		command = None
+		sequences = {}
+		while offset < end:
+			kind = body[offset]
+			offset += 1
+			size = struct.unpack_from('<i', body, offset)[0]
+			if kind == 0:
+				command = bson.BSON(body[offset:offset + size]).decode()
+			else:
+				name_end = body.index(b'\x00', offset + 4)
+				sequences[body[offset + 4:name_end].decode('utf-8')] = bson.decode_all(body[name_end + 1:offset + size])
+			offset += size
+		command.update(sequences)
+		reply = self.command(node, session, command)
+		if flags & 2:
+			return None
+		payload = struct.pack('<IB', 0, 0) + bson.BSON.encode(reply)
+		return msg_header.pack(msg_header.size + len(payload), 0, request_id, op_msg) + payload
+
+	async def listen(self, loop):
+		'''Start listening on every node that is not down.'''
+		for node in self.nodes:
+			if not node.down:
+				await asyncio.start_server(lambda r, w, node=node: self.serve(node, r, w), node.ip, node.port, backlog=64)
+
+
+class Trapper(object):
+	'''A fake zabbix trapper that accepts sender requests and counts the values it receives.'''
+
+	def __init__(self, record_path=''):
+		'''
+		Args:
+			record_path   string   the file every received value is appended to as a JSON line, '' to only count them
+		'''
+		self.values = 0
+		self.requests = 0
+		self.hosts = set()
+		self.keys = Counter()
+		# the sum of (arrival - sample time) in seconds, for the mean delay of the values
+		self.delay = 0.0
+		self.record = open(record_path, 'a') if record_path else None
+
+	async def serve(self, reader, writer):
+		try:
+			header = await reader.readexactly(13)
+			length = struct.unpack('<Q', header[5:])[0]
+			request = json.loads((await reader.readexactly(length)).decode('utf-8'))
+			now = time.time()
+			data = request.get('data', [])
+			self.requests += 1
+			self.values += len(data)
+			for item in data:
+				self.hosts.add(item['host'])
+				self.keys[item['key'].split('.', 1)[-1]] += 1
+				if 'clock' in item:
+					self.delay += now - item['clock'] - item.get('ns', 0) / 1e9
+				if self.record is not None:
+					self.record.write(json.dumps(item) + '\n')
+			info = 'processed: %d; failed: 0; total: %d; seconds spent: 0.000050' % (len(data), len(data))
+			body = json.dumps({'response': 'success', 'info': info}).encode('utf-8')
+			writer.write(b'ZBXD\x01' + struct.pack('<Q', len(body)) + body)
+			await writer.drain()
+		except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+			pass
+		finally:
+			writer.close()
+
+	def stats(self):
+		return 'requests: %d; values: %d; hosts: %d; mean delay: %.3fs' % (
+			self.requests, self.values, len(self.hosts), self.delay / self.values if self.values else 0.0)
+
+
+def generate(sim, out_dir, clusters, shards, members, repls, repl_members, standalones, seeds, down_rate):
+	'''Create the fake nodes and write the inventories that describe them.
+
+	Clusters take 127.0.0.0 - 127.199.x.x with the layout of fixtures.cluster(),
+	replica set members 127.200.x.x, one ip each, and standalone nodes
+	127.240.x.x. Every deployment gets its own file in <out_dir>/fleet for
+	mongodb_fleet.py, and the first cluster and replica set are also written
+	as <out_dir>/cluster.json and <out_dir>/repl.json for the sharded and
+	replica set collectors.
+
+	Args:
+		sim           Simulator  the simulator the nodes are added to
+		out_dir       string     the directory of the inventories
+		clusters      int        the number of sharded clusters
+		shards        int        the number of shards per cluster
+		members       int        the number of members per shard and of hosts per cluster, the last one an arbiter
+		repls         int        the number of replica sets
+		repl_members  int        the number of members per replica set, the last one an arbiter
+		standalones   int        the number of standalone nodes
+		seeds         bool       write the fleet files of the clusters as seed mongos to discover them from
+		down_rate     float      the share of the nodes that do not listen at all
+	'''
+	fleet_dir = os.path.join(out_dir, 'fleet')
+	if not os.path.isdir(fleet_dir):
+		os.makedirs(fleet_dir)
+	rnd = random.Random(1)
+	seed = [0]
+
+	def node(ip, port, role):
+		n = sim.add(Node(ip, port, role, seed[0]))
+		seed[0] += 1
+		n.down = rnd.random() < down_rate
+		return n
+
+	def write(name, inventory):
+		with open(os.path.join(fleet_dir, name), 'w') as f:
+			json.dump(inventory, f, indent=1)
+
+	for i in range(clusters):
+		inventory = cluster(i, shards, members, 127)
+		mongos = [node(m['ip'], m['port'], 'mongos') for m in inventory['mongos']]
+		config = ReplicaSet('configrs', [node(m['ip'], m['port'], 'mongod') for m in inventory['config']])
+		shard_sets = [ReplicaSet(s['name'], [node(m['ip'], m['port'], 'arbiter' if m['role'] == 'arbiter' else 'mongod')
+			for m in s['members']]) for s in inventory['shard']]
+		SimulatedCluster(mongos, config, shard_sets)
+		if seeds:
+			write('cluster%04d.json' % i, {'seeds': [m.name for m in mongos]})
+		else:
+			write('cluster%04d.json' % i, inventory)
+		if i == 0:
+			with open(os.path.join(out_dir, 'cluster.json'), 'w') as f:
+				json.dump(inventory, f, indent=1)
+	for i in range(repls):
+		# every member on its own ip, as the collectors send each one to its own repl_<ip> host
+		addresses = [i * repl_members + m for m in range(repl_members)]
+		inventory = {'name': 'repl%d' % i, 'members': [
+			{'ip': '127.%d.%d.%d' % (200 + k // 62500, k // 250 % 250, k % 250 + 1), 'port': 27017,
+				'role': 'arbiter' if m == repl_members - 1 else 'not arbiter'} for m, k in enumerate(addresses)]}
+		ReplicaSet(inventory['name'], [node(m['ip'], m['port'], 'arbiter' if m['role'] == 'arbiter' else 'mongod')
+			for m in inventory['members']])
+		write('repl%04d.json' % i, inventory)
+		if i == 0:
+			with open(os.path.join(out_dir, 'repl.json'), 'w') as f:
+				json.dump(inventory, f, indent=1)
+	for i in range(standalones):
+		ip = '127.%d.%d.%d' % (240 + i // 62500, i // 250 % 250, i % 250 + 1)
+		node(ip, 27017, 'mongod')
+		write('standalone%04d.json' % i, {'ip': ip, 'port': 27017})
+
+
+def raiseFileLimit():
+	'''Allow as many open files as the hard limit, every node listens on a socket and holds the collector's connections.'''
+	soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+	if soft < hard:
+		resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+	return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return the simulation options.'''
+	options = {
+		'out_dir': '/tmp/mongodb_simulator', 'clusters': 10, 'shards': 3, 'members': 3, 'repls': 10,
+		'repl_members': 3, 'standalones': 10, 'seeds': False, 'down_rate': 0.0, 'user': '', 'pwd': '',
+		'latency': 0.0, 'jitter': 0.0, 'fail_rate': 0.0, 'hang_rate': 0.0, 'trapper_port': 10051,
+		'record': '', 'duration': 0.0
+	}
+	try:
+		opts, args = getopt.getopt(argv, "ho:c:s:m:r:n:a:Sx:u:d:L:J:f:g:p:w:t:", ["help"])
+	except getopt.GetoptError:
+		print('invalid option\nplease use python simulator.py --help for more information\n')
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			print('usage:\n  python simulator.py [-o <out_dir>] [-c <clusters> -s <shards> -m <members>] [-r <repls> -n <repl_members>] [-a <standalones>] [-S] [-x <down_rate>] [-u <mongodb_user> -d <mongodb_password>] [-L <latency_ms>] [-J <jitter_ms>] [-f <fail_rate>] [-g <hang_rate>] [-p <trapper_port>] [-w <record_file>] [-t <seconds>]\n')
+			print('  fakes the nodes of clusters, replica sets and standalone nodes on 127.0.0.0/8 and a zabbix trapper on 127.0.0.1,')
+			print('  and writes their inventories to <out_dir> (default: /tmp/mongodb_simulator): fleet/*.json, cluster.json and repl.json')
+			print('  -S writes the clusters of the fleet as {"seeds": [...]} so they are discovered from their mongos')
+			print('  -x is the share of the nodes that are down, -f of the requests answered by closing the connection, -g of the requests never answered')
+			print('  -u and -d make every node but the arbiters require SCRAM-SHA-1 authentication')
+			print('  -w appends every value received by the trapper to a file as JSON lines, -t stops after the given seconds, default: until Ctrl+C')
+			sys.exit()
+		elif opt == '-o':
+			options['out_dir'] = arg
+		elif opt == '-c':
+			options['clusters'] = int(arg)
+		elif opt == '-s':
+			options['shards'] = int(arg)
+		elif opt == '-m':
+			options['members'] = int(arg)
+		elif opt == '-r':
+			options['repls'] = int(arg)
+		elif opt == '-n':
+			options['repl_members'] = int(arg)
+		elif opt == '-a':
+			options['standalones'] = int(arg)
+		elif opt == '-S':
+			options['seeds'] = True
+		elif opt == '-x':
+			options['down_rate'] = float(arg)
+		elif opt == '-u':
+			options['user'] = arg
+		elif opt == '-d':
+			options['pwd'] = arg
+		elif opt == '-L':
+			options['latency'] = float(arg) / 1000
+		elif opt == '-J':
+			options['jitter'] = float(arg) / 1000
+		elif opt == '-f':
+			options['fail_rate'] = float(arg)
+		elif opt == '-g':
+			options['hang_rate'] = float(arg)
+		elif opt == '-p':
+			options['trapper_port'] = int(arg)
+		elif opt == '-w':
+			options['record'] = arg
+		elif opt == '-t':
+			options['duration'] = float(arg)
+	return options
+
+
+def main(argv):
+	o = parseArg(argv)
+	faults = Faults(o['latency'], o['jitter'], o['fail_rate'], o['hang_rate'])
+	credentials = Credentials(o['user'], o['pwd']) if o['user'] else None
+	sim = Simulator(faults, credentials)
+	generate(sim, o['out_dir'], o['clusters'], o['shards'], o['members'], o['repls'], o['repl_members'],
+		o['standalones'], o['seeds'], o['down_rate'])
+	limit = raiseFileLimit()
+	if limit < 3 * len(sim.nodes) + 100:
+		print('warning: %d open files allowed for %d nodes, raise ulimit -n' % (limit, len(sim.nodes)))
+
+	trapper = Trapper(o['record'])
+	loop = asyncio.new_event_loop()
+	asyncio.set_event_loop(loop)
+	loop.run_until_complete(sim.listen(loop))
+	loop.run_until_complete(asyncio.start_server(trapper.serve, '127.0.0.1', o['trapper_port'], backlog=128))
+	print('%d nodes (%d down) listening, trapper on 127.0.0.1:%d, inventories in %s' % (
+		len(sim.nodes), sum(1 for n in sim.nodes if n.down), o['trapper_port'], o['out_dir']))
+	print('e.g. python "monitoring for Fleet/mongodb_fleet.py" -z 127.0.0.1:%d -f %s -w 64 -i 60' % (
+		o['trapper_port'], os.path.join(o['out_dir'], 'fleet')))
+
+	started = time.time()
+
+	async def report():
+		while not o['duration'] or time.time() - started < o['duration']:
+			await asyncio.sleep(10)
+			print('%s  nodes: %s  injected: %s  trapper: %s' % (time.strftime('%H:%M:%S'),
+				dict(sim.requests.most_common(4)), dict(sim.injected), trapper.stats()))
+
+	try:
+		loop.run_until_complete(report())
+	except KeyboardInterrupt:
+		pass
+	print('requests:', dict(sim.requests))
+	print('trapper:', trapper.stats())
+	print('values per key:', dict(trapper.keys.most_common(20)))
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,10 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: __init__.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 10:50
+'
+'Shared code for the standalone, replica set and sharded cluster collectors.
+'''
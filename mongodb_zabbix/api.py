@@ -0,0 +1,173 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: api.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:21
+'
+'''
+
+import itertools
+import json
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from mongodb_zabbix import instrument
+
+
+# the seconds to connect to the zabbix web server and to wait for its reply,
+# which for configuration.import of a big template can take a while
+default_timeout = (5, 60)
+
+# the retries of a call whose connection failed, or of a read-only call that got 502/503 from a proxy
+default_retries = 3
+
+# the replies of a proxy in front of the web server on which the read-only calls are retried
+retry_statuses = (502, 503)
+
+# the seconds before the first retry of a read-only call, doubled for every further one
+retry_backoff = 0.5
+
+# the connections kept open to the web server
+pool_size = 4
+
+# the methods called without the authentication token
+anonymous_methods = ('user.login', 'apiinfo.version')
+
+
+class ApiError(Exception):
+	'''An error returned by the zabbix api, with the method that failed.'''
+
+	def __init__(self, method, error):
+		Exception.__init__(self, '%s: %s' % (method, error))
+		self.method = method
+		self.error = error
+
+
+def apiUrl(zabbix_server):
+	'''Return the url of the api of a zabbix server given by ip, ip:port or url.'''
+	if zabbix_server.startswith(('http://', 'https://')):
+		return zabbix_server
+	return "http://" + zabbix_server + "/zabbix/api_jsonrpc.php"
+
+
+def parseTimeout(value):
+	'''Parse '<seconds>' or '<connect>,<read>' into the (connect, read) timeout of requests.'''
+	timeouts = [float(t) for t in value.split(',')]
+	if len(timeouts) == 1:
+		return (timeouts[0], timeouts[0])
+	if len(timeouts) == 2:
+		return tuple(timeouts)
+	raise ValueError('expected 1 or 2 timeouts, got ' + value)
+
+
+def retryPolicy(retries):
+	'''Retry the connections that fail, which never reach the web server, and nothing else.
+
+	Every call is a POST, and a 502/503 of a proxy may come after zabbix applied
+	it, so the replies are left to ZabbixAPI.request(), which only retries the
+	calls that change nothing.
+	'''
+	# the default methods of Retry leave out POST, and neither read errors nor replies are retried
+	return Retry(total=retries, connect=retries, read=0, status=0, backoff_factor=retry_backoff, raise_on_status=False)
+
+
+def readOnly(method):
+	'''Tell whether a method changes nothing in zabbix, e.g. 'host.get', so calling it twice is harmless.'''
+	return method.endswith('.get') or method == 'apiinfo.version'
+
+
+class ZabbixAPI(object):
+	'''A client of the zabbix json-rpc api, shared by the provisioning scripts.
+
+	All the calls go through one requests.Session, so they reuse a few
+	keep-alive connections instead of opening one per call, and send the
+	compact JSON of the payload with the headers of the session. The
+	authentication token of login() is added to every call, and renewed once
+	when zabbix reports the session expired. The latency of every method is
+	recorded, see latency().
+	'''
+
+	def __init__(self, zabbix_server, timeout=default_timeout, retries=default_retries):
+		'''
+		Args:
+			zabbix_server  string   the ip of zabbix server, ip:port, or the url of its api
+			timeout        tuple    the (connect, read) timeout of a call in seconds
+			retries        int      the retries of a call whose connection failed, or of a read-only one that got 502/503
+		'''
+		self.url = apiUrl(zabbix_server)
+		self.timeout = timeout
+		self.retries = retries
+		self.session = requests.Session()
+		self.session.headers.update({'Content-Type': 'application/json-rpc'})
+		adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retryPolicy(retries))
+		self.session.mount('http://', adapter)
+		self.session.mount('https://', adapter)
+		self.auth = None
+		self.credentials = None
+		self.ids = itertools.count(1)
+		self.stats = instrument.Stats()
+
+	def request(self, method, params):
+		'''Call a method and return the decoded reply, with its 'result' or its 'error'.
+
+		A read-only method that gets 502/503 from a proxy is called again, up to
+		self.retries times; any other call is made once, as zabbix may have applied
+		it before the proxy failed.
+		'''
+		payload = {'jsonrpc': '2.0', 'method': method, 'params': params, 'id': next(self.ids)}
+		if method not in anonymous_methods:
+			payload['auth'] = self.auth
+		data = json.dumps(payload, separators=(',', ':'))
+		retries = self.retries if readOnly(method) else 0
+		with self.stats.timer(method):
+			for attempt in range(retries + 1):
+				reply = self.session.post(self.url, data=data, timeout=self.timeout)
+				if reply.status_code not in retry_statuses or attempt == retries:
+					break
+				time.sleep(retry_backoff * 2 ** attempt)
+			return reply.json()
+
+	def call(self, method, params):
+		'''Call a method and return its result.
+
+		Raises:
+			ApiError if zabbix returned an error
+		'''
+		res = self.request(method, params)
+		if 'error' in res and self.credentials is not None and method not in anonymous_methods and 're-login' in str(res['error']):
+			self.login(*self.credentials)
+			res = self.request(method, params)
+		if 'error' in res:
+			raise ApiError(method, res['error'])
+		return res['result']
+
+	def login(self, user, pwd):
+		'''Authenticate by the given username and password and return the authentication token.
+
+		Raises:
+			ApiError if the authentication failed
+		'''
+		self.auth = self.call('user.login', {'user': user, 'password': pwd})
+		self.credentials = (user, pwd)
+		return self.auth
+
+	def latency(self):
+		'''Return method -> (calls, mean seconds, max seconds).'''
+		with self.stats.lock:
+			return dict((method, (t[0], t[1] / t[0], t[2])) for method, t in self.stats.timings.items())
+
+	def printLatency(self):
+		'''Print the calls and latency of every method, the slowest in total first.'''
+		latency = self.latency()
+		for method in sorted(latency, key=lambda m: -latency[m][0] * latency[m][1]):
+			calls, mean, slowest = latency[method]
+			print('%s: %d calls, mean %.3f s, max %.3f s' % (method, calls, mean, slowest))
+
+	def close(self):
+		'''Close the connections of the session.'''
+		self.session.close()
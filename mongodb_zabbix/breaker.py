@@ -0,0 +1,194 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: breaker.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 20:30
+'
+'''
+
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
+
+
+# the consecutive failures after which a node is only probed
+max_failures = 3
+
+# the seconds between two probes of a down node, doubled after every failed probe up to max_backoff
+base_backoff = 60
+max_backoff = 900
+
+# the connect and server selection timeout of a probe in seconds
+probe_timeout = 1
+
+# entries not updated for this long are dropped when the state is saved
+max_entry_age = 86400
+
+
+def probe(ip, port, timeout=None):
+	'''Tell whether a node answers ismaster, the cheap check of a down node.
+
+	The probe uses a throwaway client with a short timeout and no credentials,
+	ismaster needs none, so it costs one round trip instead of the handshake,
+	authentication and full timeouts of a poll.
+	'''
+	timeout_ms = int((probe_timeout if timeout is None else timeout) * 1000)
+	client = MongoClient(ip, port, connectTimeoutMS=timeout_ms, serverSelectionTimeoutMS=timeout_ms,
+		socketTimeoutMS=timeout_ms, connect=False)
+	try:
+		client.admin.command('ismaster')
+		return True
+	except ConnectionFailure:
+		return False
+	finally:
+		client.close()
+
+
+class Breaker(object):
+	'''A circuit breaker per node, so a down node does not cost the full timeouts every cycle.
+
+	A node is polled normally until it fails max_failures times in a row. From
+	then on it is not polled but probed with a short ismaster, first after
+	base_backoff seconds and then after twice as long following every failed
+	probe, up to max_backoff. A successful probe closes the breaker and the node
+	is polled right away, in the same cycle.
+	'''
+
+	def __init__(self):
+		# 'ip:port' -> {'failures', 'backoff', 'next_probe', 'updated'}
+		self.nodes = {}
+		# the nodes whose state this process changed, they override the state file
+		self.polled = set()
+		self.lock = threading.Lock()
+		self.skipped = 0
+		self.probes = 0
+
+	def allow(self, ip, port):
+		'''Tell whether a node may be polled now, probing it if it is down and due.
+
+		Args:
+			ip    string   the ip of mongo server
+			port  int      the port of mongo server
+
+		Returns:
+			True to poll the node, False to report it as down without polling it
+		'''
+		name = ip + ':' + str(port)
+		now = time.time()
+		with self.lock:
+			node = self.nodes.get(name)
+			if node is None or node['failures'] < max_failures:
+				return True
+			if now < node['next_probe']:
+				self.skipped += 1
+				return False
+			self.probes += 1
+		if probe(ip, port):
+			self.success(ip, port)
+			return True
+		self.failure(ip, port)
+		return False
+
+	def success(self, ip, port):
+		'''Close the breaker of a node that answered.'''
+		name = ip + ':' + str(port)
+		with self.lock:
+			self.nodes.pop(name, None)
+			self.polled.add(name)
+
+	def failure(self, ip, port):
+		'''Count a failed poll or probe, and open the breaker or back off further.'''
+		name = ip + ':' + str(port)
+		now = time.time()
+		with self.lock:
+			node = self.nodes.setdefault(name, {'failures': 0, 'backoff': 0, 'next_probe': 0})
+			self.polled.add(name)
+			node['failures'] += 1
+			node['updated'] = now
+			if node['failures'] >= max_failures:
+				node['backoff'] = min(max_backoff, node['backoff'] * 2 or base_backoff)
+				node['next_probe'] = now + node['backoff']
+
+	def stats(self):
+		'''Return the number of open breakers, and the polls skipped and probes run by this process.'''
+		with self.lock:
+			return {
+				'open': sum(1 for node in self.nodes.values() if node['failures'] >= max_failures),
+				'skipped': self.skipped,
+				'probes': self.probes
+			}
+
+	def load(self, path):
+		'''Load the nodes saved in the state file, if it exists.'''
+		try:
+			with open(path, 'r') as f:
+				fcntl.flock(f, fcntl.LOCK_SH)
+				nodes = json.load(f)
+		except (IOError, OSError, ValueError):
+			return
+		with self.lock:
+			for k, v in nodes.items():
+				self.nodes.setdefault(k, v)
+
+	def save(self, path, now):
+		'''Replace the state file with the nodes of this process.
+
+		Other collectors may share the file, so it is locked and re-read, and the
+		nodes this process has not polled are kept as they are.
+
+		Args:
+			path   string   the path of the state file
+			now    float    the current time, entries older than max_entry_age are dropped
+		'''
+		with self.lock:
+			nodes = dict(self.nodes)
+			polled = set(self.polled)
+		with open(path + '.lock', 'a') as lock_file:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+			try:
+				with open(path, 'r') as f:
+					for k, v in json.load(f).items():
+						if k not in polled:
+							nodes[k] = v
+			except (IOError, OSError, ValueError):
+				pass
+			nodes = dict((k, v) for k, v in nodes.items() if now - v.get('updated', 0) < max_entry_age)
+			tmp = path + '.tmp'
+			with open(tmp, 'w') as f:
+				json.dump(nodes, f)
+			os.rename(tmp, path)
+
+
+def defaultStatePath(script):
+	'''Return the default state file of a collector script, e.g. /tmp/mongodb_sh_auth.breaker.'''
+	name = os.path.splitext(os.path.basename(script))[0]
+	return os.path.join(tempfile.gettempdir(), name + '.breaker')
+
+
+# the breaker state shared by all the nodes polled by this process
+state = Breaker()
+state_path = ''
+
+
+def openState(path):
+	'''Use the given state file, so that open breakers survive between crontab runs.'''
+	global state_path
+	state_path = path
+	state.load(path)
+
+
+def saveState():
+	'''Save the shared state to its file, if one was opened.'''
+	if state_path:
+		try:
+			state.save(state_path, time.time())
+		except (IOError, OSError) as e:
+			print('failed to save the breaker state', state_path, e)
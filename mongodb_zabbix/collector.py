@@ -0,0 +1,144 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: collector.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 23:55
+'
+'''
+
+from pymongo.errors import ConnectionFailure
+from pymongo.errors import OperationFailure
+
+from mongodb_zabbix import breaker
+from mongodb_zabbix import connection
+from mongodb_zabbix import instrument
+from mongodb_zabbix import rates
+from mongodb_zabbix.metrics import itemKey
+from mongodb_zabbix.sender import clockNow
+
+
+def getServerStatus(ip, port, query, user='', pwd=''):
+	'''Get the serverStatus of the mongos or mongod instance.
+
+	Try to get the information of mongodb server by command.
+	You can refer to MongoDB manual for more details about serverStatus command.
+
+	Args:
+		ip    string        the server ip that the mongos or mongod instance is located
+		port  int           the port that is used by the mongos or mongod instance
+		query StatusQuery   the serverStatus fields to be read
+		user  string        the user of mongodb, '' if authentication is not needed
+		pwd   string        the password of mongodb
+
+	Returns:
+		status code    int    0/1/2
+		server_status  dict   the fields of query, keyed by dotted path(e.g. 'opcounters.insert')
+		clock          int    when the status was sampled, in nanoseconds: the middle of the round trip
+	'''
+	server_status = {}
+	start = clockNow()
+	try:
+		client = connection.get_client(ip, port, user, pwd)
+		server_status = query.run(client)
+		return 0, server_status, (start + clockNow()) // 2
+	except ConnectionFailure:
+		connection.discard(ip, port, user)
+		return 1, server_status, clockNow()
+	except OperationFailure:
+		connection.discard(ip, port, user)
+		return 2, server_status, clockNow()
+
+
+def getArbiterStatus(ip, port):
+	'''Get the status of an arbiter.
+
+	Try to get the information of mongodb server by command.
+	You can refer to MongoDB manual for more details about ismaster command.
+
+	Args:
+		ip    string   the ip of the arbiter
+		port  int      the port that is used by the arbiter
+
+	Returns:
+		status code    int    0/1
+	'''
+	try:
+		client = connection.get_client(ip, port)
+		is_master = client.admin.command('ismaster')
+		return 0
+	except ConnectionFailure:
+		connection.discard(ip, port)
+		return 1
+
+
+def process_notarbiter(ip, port, batch, hostname, metric_map, user='', pwd=''):
+	'''Get the status data from a mongod or mongos that is not an arbiter and send them to zabbix server.
+
+	This serves the standalone node, the replica set members and every component
+	of the sharded cluster alike, the metric map decides which items are sent
+	and with which key prefix. Counters are sent as per-second rates from the
+	second poll of a node on. Every value is stamped with the time the status
+	was sampled, not the time it reaches zabbix server. A node whose circuit
+	breaker is open is reported as down without being polled.
+
+	Args:
+		ip            string       the ip of mongo server
+		port          int          the port of mongo server
+		batch         ZabbixBatch  the batch that collects the values to be sent
+		hostname      string       the host name in zabbix
+		metric_map    MetricMap    the compiled metrics of the node's template
+		user          string       the user of mongodb, '' if authentication is not needed
+		pwd           string       the password of mongodb
+	'''
+	if not breaker.state.allow(ip, port):
+		batch.add(hostname, metric_map.alive_key, '0', clockNow())
+		print('Skipped the server that is down', ip, str(port))
+		return
+	status_result = getServerStatus(ip, port, metric_map.query, user, pwd)
+	clock = status_result[2]
+	if status_result[0] == 1:
+		breaker.state.failure(ip, port)
+	else:
+		breaker.state.success(ip, port)
+	if status_result[0] == 0:
+		batch.add(hostname, metric_map.alive_key, '1', clock)
+		with instrument.timer('extract'):
+			items = metric_map.items(status_result[1])
+			items.extend(rates.state.rates(hostname, metric_map.counters, status_result[1], clock / 1e9))
+		for key, value in items:
+			batch.add(hostname, key, value, clock)
+	elif status_result[0] == 1:
+		batch.add(hostname, metric_map.alive_key, '0', clock)
+		print('Cound not connect to the server', ip, str(port))
+	elif user:
+		print('\nCound not get the server status, please check your authentication', ip, str(port))
+	else:
+		print('\nCound not get the server status', ip, str(port))
+
+
+def process_arbiter(ip, port, batch, hostname, prefix):
+	'''Get the status data from an arbiter and send them to zabbix server.
+
+	Args:
+		ip            string       the ip of mongo server
+		port          int          the port of mongo server
+		batch         ZabbixBatch  the batch that collects the values to be sent
+		hostname      string       the host name in zabbix
+		prefix        string       the item key prefix, e.g. 'mongo', the name of the shard or 'shard[<name>]'
+	'''
+	alive_key = itemKey(prefix, 'alive')
+	if not breaker.state.allow(ip, port):
+		batch.add(hostname, alive_key, '0', clockNow())
+		print('Skipped the server that is down', ip, str(port))
+		return
+	status = getArbiterStatus(ip, port)
+	clock = clockNow()
+	if status == 0:
+		breaker.state.success(ip, port)
+		batch.add(hostname, alive_key, '1', clock)
+	elif status == 1:
+		breaker.state.failure(ip, port)
+		batch.add(hostname, alive_key, '0', clock)
+		print('Cound not connect to the server', ip, str(port))
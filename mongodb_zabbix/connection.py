@@ -0,0 +1,231 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: connection.py
+'@author: liyunting
+'@version: 6
+'@lastModify: 2026-10-18 12:08
+'
+'''
+
+import threading
+import time
+from collections import OrderedDict
+
+from pymongo import MongoClient
+
+
+# the default connect, server selection and command timeout of every client, in seconds
+timeout = 10
+
+# the timeouts of the clients created from now on, set by set_timeout()
+connect_timeout = timeout
+select_timeout = timeout
+command_timeout = timeout
+
+# every client holds one pooled socket for commands and one for its monitor
+sockets_per_client = 2
+
+# the sockets always allowed, and the most the clients may open however many targets there are
+base_sockets = 512
+default_max_sockets = 4096
+
+
+class ConnectionManager(object):
+	'''Keep one authenticated MongoClient per (ip, port, user) alive across polls.
+
+	A client is created on the first poll of a target and reused by the following
+	ones, so the socket is connected and authenticated once instead of running a
+	full handshake on every poll. Clients that have not been used for idle_timeout
+	seconds, or that were discarded after a failure, are closed. The number of
+	clients is capped so that the open sockets never exceed max_sockets: when the
+	cap is hit, the least recently used client is closed. A cycle polls its
+	targets round-robin, so a cap below the number of targets would always close
+	the client needed next; reserve() raises the cap to the targets of a cycle,
+	from base_sockets up to max_sockets. A fleet above max_sockets still
+	reconnects the clients over the cap on every cycle, see set_max_sockets().
+	'''
+
+	def __init__(self, idle_timeout=600, max_sockets=default_max_sockets, base_sockets=base_sockets):
+		'''
+		Args:
+			idle_timeout  float   the seconds after which an unused client is closed
+			max_sockets   int     the maximum number of sockets opened by all the clients
+			base_sockets  int     the sockets allowed before any reserve(), at most max_sockets
+		'''
+		self.idle_timeout = idle_timeout
+		self.base_clients = max(1, base_sockets // sockets_per_client)
+		self.limit_clients = max(1, max_sockets // sockets_per_client)
+		self.min_clients = min(self.base_clients, self.limit_clients)
+		self.max_clients = self.min_clients
+		# key -> [client, last used time], the least recently used first
+		self.clients = OrderedDict()
+		self.lock = threading.Lock()
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+
+	def create(self, ip, port, user, pwd):
+		'''Create a client that authenticates against the admin database by itself.'''
+		options = {
+			'connectTimeoutMS': int(connect_timeout * 1000),
+			'serverSelectionTimeoutMS': int(select_timeout * 1000),
+			'socketTimeoutMS': int(command_timeout * 1000),
+			'maxPoolSize': 1
+		}
+		if user:
+			options.update(username=user, password=pwd, authSource='admin')
+		return MongoClient(ip, port, **options)
+
+	def get(self, ip, port, user='', pwd=''):
+		'''Get the cached client of a target, creating it on a miss.
+
+		Args:
+			ip    string   the ip of mongo server
+			port  int      the port of mongo server
+			user  string   the user of mongodb, '' if authentication is not needed
+			pwd   string   the password of mongodb
+
+		Returns:
+			the MongoClient object
+		'''
+		key = (ip, port, user)
+		now = time.time()
+		closing = []
+		with self.lock:
+			entry = self.clients.get(key)
+			if entry is not None:
+				self.hits += 1
+				entry[1] = now
+				self.clients.move_to_end(key)
+			else:
+				self.misses += 1
+				entry = [self.create(ip, port, user, pwd), now]
+				self.clients[key] = entry
+			closing = self.evict(now)
+		for client in closing:
+			client.close()
+		return entry[0]
+
+	def evict(self, now):
+		'''Remove the idle clients and the ones above the cap, and return them to be closed.
+
+		Must be called with the lock held.
+		'''
+		closing = []
+		while self.clients:
+			key, (client, last_used) = next(iter(self.clients.items()))
+			if len(self.clients) <= self.max_clients and now - last_used < self.idle_timeout:
+				break
+			del self.clients[key]
+			closing.append(client)
+		self.evictions += len(closing)
+		return closing
+
+	def reserve(self, count):
+		'''Raise the cap to count clients, the targets of a cycle, within base_sockets and max_sockets.'''
+		with self.lock:
+			self.max_clients = min(max(self.min_clients, count), self.limit_clients)
+
+	def set_max_sockets(self, max_sockets):
+		'''Change the maximum number of sockets, the clients above it are closed on the next get().'''
+		with self.lock:
+			self.limit_clients = max(1, max_sockets // sockets_per_client)
+			self.min_clients = min(self.base_clients, self.limit_clients)
+			self.max_clients = min(max(self.max_clients, self.min_clients), self.limit_clients)
+
+	def discard(self, ip, port, user=''):
+		'''Close the client of a target after a failure, so the next poll starts afresh.'''
+		with self.lock:
+			entry = self.clients.pop((ip, port, user), None)
+			if entry is not None:
+				self.evictions += 1
+		if entry is not None:
+			entry[0].close()
+
+	def stats(self):
+		'''Return the hit/miss/eviction counters and the number of open clients.'''
+		with self.lock:
+			return {
+				'hits': self.hits,
+				'misses': self.misses,
+				'evictions': self.evictions,
+				'clients': len(self.clients),
+				'max_clients': self.max_clients,
+				'limit_clients': self.limit_clients
+			}
+
+	def close_all(self):
+		'''Close all the cached clients.'''
+		with self.lock:
+			clients = [entry[0] for entry in self.clients.values()]
+			self.clients.clear()
+		for client in clients:
+			client.close()
+
+
+# the connection manager shared by all the nodes polled by this process
+manager = ConnectionManager()
+
+
+def set_timeout(connect, select=None, command=None):
+	'''Set the per-node timeouts used by the clients created from now on.
+
+	They bound connecting, server selection and every command, so an
+	unreachable node costs at most connect + select instead of pymongo's 30s
+	default, and a hung one at most command.
+
+	Args:
+		connect  float   the connect timeout in seconds, and the default of the other two
+		select   float   the server selection timeout in seconds
+		command  float   the timeout of every command in seconds
+	'''
+	global connect_timeout, select_timeout, command_timeout
+	connect_timeout = connect
+	select_timeout = connect if select is None else select
+	command_timeout = connect if command is None else command
+
+
+def parseTimeout(value):
+	'''Parse the -t option of the collectors: 'seconds' or 'connect,select,command'.
+
+	Returns:
+		a list of one to three timeouts in seconds, to be passed to set_timeout()
+	'''
+	timeouts = [float(v) for v in value.split(',') if v]
+	if not 1 <= len(timeouts) <= 3:
+		raise ValueError('expected 1 to 3 timeouts, got ' + value)
+	return timeouts
+
+
+def get_client(ip, port, user='', pwd=''):
+	'''Get the MongoClient of a mongod or mongos instance from the shared manager.'''
+	return manager.get(ip, port, user, pwd)
+
+
+def reserve(count):
+	'''Make room in the shared manager for the clients of count targets, up to its max_sockets.'''
+	manager.reserve(count)
+
+
+def set_max_sockets(max_sockets):
+	'''Set the maximum number of sockets of the shared manager, the -k option of the collectors.
+
+	Keep it below ulimit -n: every client holds sockets_per_client sockets.
+	'''
+	manager.set_max_sockets(max_sockets)
+
+
+def discard(ip, port, user=''):
+	'''Close the client of a target that failed.'''
+	manager.discard(ip, port, user)
+
+
+def stats():
+	'''Return the counters of the shared manager.'''
+	return manager.stats()
+
+
+def close_all():
+	'''Close all the cached clients.'''
+	manager.close_all()
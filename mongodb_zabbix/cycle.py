@@ -0,0 +1,204 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: cycle.py
+'@author: liyunting
+'@version: 6
+'@lastModify: 2026-10-18 12:13
+'
+'''
+
+import getopt
+import os
+import sys
+import time
+
+from mongodb_zabbix import breaker
+from mongodb_zabbix import connection
+from mongodb_zabbix import instrument
+from mongodb_zabbix import partition
+from mongodb_zabbix import pool
+from mongodb_zabbix import rates
+from mongodb_zabbix import tracing
+from mongodb_zabbix.sender import ZabbixBatch
+from mongodb_zabbix.spool import Spool, defaultSpoolPath
+
+
+# the groups of shared options a collector may take besides the common ones:
+# -w and the partition options for the collectors of several nodes, -g for the
+# collectors of sharded clusters
+parallel = 'parallel'
+lld = 'lld'
+
+
+def sharedOptions(script):
+	'''Return the options shared by the collector scripts.
+
+	Every option is (name, attribute, group, argument, parse, default, usage, help):
+	the group is None for the options of every collector, the argument is the
+	name shown in the usage, None for a flag, and parse converts it. The usage
+	of the long options is given with the first one of a set, '' for the others.
+
+	Args:
+		script   string   the path of the collector script, which names its default state files
+	'''
+	return [
+		('-i', 'interval', None, '<interval>', float, 0, None,
+			'with -i the collector runs as a daemon and collects every <interval> seconds, otherwise it collects once'),
+		('-l', 'deadline', None, '<deadline>', float, 0, None,
+			'-l is the seconds a cycle may poll before it sends what it has, the nodes still polled are reported as timed out; default: <interval> with -i, otherwise ' + str(pool.default_deadline)),
+		('-w', 'workers', parallel, '<workers>', int, pool.default_workers, None,
+			'-w is the maximum number of nodes polled at the same time, default: ' + str(pool.default_workers)),
+		('-t', 'timeout', None, '<timeout>', connection.parseTimeout, [connection.timeout], None,
+			'-t is the connect, server selection and command timeout of every node in seconds, or the three of them as <connect>,<select>,<command>, default: ' + str(connection.timeout)),
+		('-k', 'max_sockets', None, '<max_sockets>', int, connection.default_max_sockets, None,
+			'-k is the maximum number of sockets kept open to the nodes, ' + str(connection.sockets_per_client) + ' per node, keep it below ulimit -n; with more nodes the ones over it connect again on every cycle, default: ' + str(connection.default_max_sockets)),
+		('-r', 'rate_file', None, '<rate_file>', str, rates.defaultStatePath(script), None,
+			'-r is the file that keeps the previous counter samples for the per-second rates, default: ' + rates.defaultStatePath(script)),
+		('-b', 'breaker_file', None, '<breaker_file>', str, breaker.defaultStatePath(script), None,
+			'-b is the file that keeps the nodes found down: after ' + str(breaker.max_failures) + ' failed polls in a row a node is only probed, every ' + str(breaker.base_backoff) + ' to ' + str(breaker.max_backoff) + ' seconds, and reported as down meanwhile, default: ' + breaker.defaultStatePath(script)),
+		('-q', 'spool_dir', None, '<spool_dir>', str, defaultSpoolPath(script), None,
+			'-q is the directory that keeps the values zabbix server could not receive until they are sent again, \'\' to drop them, default: ' + defaultSpoolPath(script)),
+		('-n', 'collector_host', None, '<collector_host>', str, '', None,
+			'-n is the zabbix host, linked to Template MongoDB Collector, that receives the poll, serverStatus, decode, extract and send timings, the values sent and failed and the cycle duration of the collector, default: not sent'),
+		('-x', 'trace_dir', None, '<trace_dir>', str, '', None,
+			'-x is the directory that receives the spans of every cycle (poll, connect, commands, decode, extract, send) as a Chrome trace, for chrome://tracing or ui.perfetto.dev, default: not traced'),
+		('-j', 'json_mode', None, None, None, False, None,
+			'-j sends the values of every node as one JSON document to its <prefix>.json item, for the *_json.xml templates whose items depend on it, default: one value per item'),
+		('-g', 'lld', lld, None, None, False, None,
+			'-g keys the items of the shard members as shard.<item>[<shard name>] and sends the low-level discovery data of every host, for the one shard template sh_shard.xml, default: <shard name>.<item> for the templates imported per shard'),
+		('--shard-index', 'shard_index', parallel, '<i>', int, None, '[--shard-index <i> --shard-count <n> | --peers <name,...> --peer <name>]',
+			'--shard-index and --shard-count split the nodes among n collectors by consistent hashing, this one polling share i (0 to n-1);'),
+		('--shard-count', 'shard_count', parallel, '<n>', int, None, '', None),
+		('--peers', 'peers', parallel, '<name,...>', str, '', '',
+			'--peers and --peer do the same with the names of all the collectors and of this one, all the nodes of a zabbix host stay on one collector'),
+		('--peer', 'peer', parallel, '<name>', str, '', '', None),
+	]
+
+
+class Options(object):
+	'''The shared options of a collector, as attributes named after them.'''
+
+	def __init__(self, **values):
+		self.__dict__.update(values)
+
+
+def parseOptions(argv, script, required='', optional='', shortopts='', longopts=(), groups=(), help=()):
+	'''Parse the command line of a collector script.
+
+	The shared options are parsed here, the script's own ones are returned for
+	the script to parse, and --help prints the usage of both.
+
+	Args:
+		argv       list     the command line arguments
+		script     string   the path of the collector script
+		required   string   the usage of the script's own required options, e.g. '-m <mongodb_ip>'
+		optional   string   the usage of the script's own optional options
+		shortopts  string   the getopt short options of the script's own options
+		longopts   list     the getopt long options of the script's own options
+		groups     tuple    the groups of shared options the script takes, parallel and lld
+		help       list     the help lines of the script's own options
+
+	Returns:
+		options   Options   the shared options, share being the Partition of the nodes polled by this collector, None for all of them
+		opts      list      the (option, argument) of the script's own options
+	'''
+	name = os.path.basename(script)
+	shared = [o for o in sharedOptions(script) if o[2] is None or o[2] in groups]
+	by_name = dict((o[0], o) for o in shared)
+	short = 'hz:' + shortopts + ''.join(o[0][1] + (':' if o[3] else '') for o in shared if not o[0].startswith('--'))
+	long = ['help'] + list(longopts) + [o[0][2:] + ('=' if o[3] else '') for o in shared if o[0].startswith('--')]
+	try:
+		opts, args = getopt.getopt(argv, short, long)
+	except getopt.GetoptError:
+		print('invalid option\nplease use python ' + name + ' --help for more information\n')
+		sys.exit(2)
+	values = dict((o[1], o[5]) for o in shared)
+	values['zabbix_server'] = ''
+	values['share'] = None
+	own = []
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			usage = ['python', name, '-z <zabbix_server_ip>'] + ([required] if required else [])
+			usage += ['[%s %s]' % (o[0], o[3]) if o[3] else '[%s]' % o[0] for o in shared if not o[0].startswith('--')]
+			usage += ([optional] if optional else []) + [o[6] for o in shared if o[6]]
+			print('usage:\n  ' + ' '.join(usage) + '\n')
+			lines = [o[7] for o in shared if o[7] and not o[0].startswith('--')] + list(help)
+			lines += [o[7] for o in shared if o[7] and o[0].startswith('--')]
+			for line in lines:
+				print('  ' + line)
+			sys.exit()
+		elif opt == '-z':
+			values['zabbix_server'] = arg
+		elif opt in by_name:
+			option = by_name[opt]
+			values[option[1]] = option[4](arg) if option[3] else True
+		else:
+			own.append((opt, arg))
+	if parallel in groups:
+		try:
+			values['share'] = partition.parsePartition(values['shard_index'], values['shard_count'], values['peers'], values['peer'])
+		except ValueError as e:
+			print('invalid input!', e)
+			print('please check and use python ' + name + ' --help for more information\n')
+			sys.exit(2)
+	else:
+		values['workers'] = pool.default_workers
+	return Options(**values), own
+
+
+def setup(options, script):
+	'''Apply the shared options before the first cycle and return the batch of the collector.
+
+	The deadline defaults to the interval of a daemon, otherwise to pool.default_deadline.
+	The traces of -x are named after the script.
+	'''
+	connection.set_timeout(*options.timeout)
+	connection.set_max_sockets(options.max_sockets)
+	tracing.openTrace(options.trace_dir, script)
+	if options.deadline <= 0:
+		options.deadline = options.interval if options.interval > 0 else pool.default_deadline
+	rates.openState(options.rate_file)
+	breaker.openState(options.breaker_file)
+	spool = Spool(options.spool_dir) if options.spool_dir else None
+	return ZabbixBatch(options.zabbix_server, spool, options.json_mode)
+
+
+def begin():
+	'''Start a cycle and its trace, and return its start time, to be passed to finish().'''
+	tracing.begin()
+	return time.time()
+
+
+def finish(batch, options, start):
+	'''End a cycle: send the batch with the collector's own items, print the state of the collector, save it and write the trace.
+
+	The spool is replayed only until the next cycle is due, start + interval
+	for a daemon, otherwise until the deadline of the cycle.
+
+	Args:
+		batch     ZabbixBatch  the batch of the collector
+		options   Options      the shared options
+		start     float        the start of the cycle, as returned by begin()
+
+	Returns:
+		the SendResult of the batch
+	'''
+	instrument.flush(batch, options.collector_host, start)
+	result = batch.send(start + (options.interval if options.interval > 0 else options.deadline))
+	print('send result:', result)
+	if batch.spool is not None:
+		print('spool:', batch.spool.stats())
+	print('connection cache:', connection.stats())
+	print('circuit breaker:', breaker.state.stats())
+	rates.saveState()
+	breaker.saveState()
+	trace = tracing.end()
+	if trace is not None:
+		print('trace:', trace)
+	return result
+
+
+def abort():
+	'''End a cycle that has nothing to send, writing its trace.'''
+	tracing.end()
@@ -0,0 +1,216 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: discovery.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 17:20
+'
+'''
+
+import datetime
+import threading
+import time
+from collections import defaultdict
+
+from pymongo.errors import ConnectionFailure
+from pymongo.errors import OperationFailure
+
+from mongodb_zabbix import connection
+from mongodb_zabbix import pool
+
+
+# a mongos that has not pinged the config servers for this long is no longer running
+mongos_max_ping_age = 600
+
+# the seconds a discovered topology is reused before the cluster is asked again
+default_ttl = 300
+
+
+def parseHost(host):
+	'''Split 'ip:port' into an inventory member, {'ip', 'port'}.'''
+	if ':' not in host:
+		return {'ip': host, 'port': 27017}
+	ip, port = host.rsplit(':', 1)
+	return {'ip': ip.strip('[]'), 'port': int(port)}
+
+
+def parseConnectionString(value):
+	'''Split a '<replica set>/<host:port>,<host:port>' string, as used by listShards and configDB.
+
+	Returns:
+		name    string   the name of the replica set, '' for a single node
+		hosts   list     the 'host:port' strings
+	'''
+	name = ''
+	if '/' in value:
+		name, value = value.split('/', 1)
+	return name, [h for h in value.split(',') if h]
+
+
+def getReplSetMembers(hosts, user='', pwd=''):
+	'''Read the members of a replica set from replSetGetConfig on the first host that answers.
+
+	Unlike the host list of listShards and configDB, the replica set config
+	holds the arbiters too.
+
+	Args:
+		hosts   list     the 'host:port' strings of the replica set
+		user    string   the user of mongodb, '' if authentication is not needed
+		pwd     string   the password of mongodb
+
+	Returns:
+		a list of inventory members, {'ip', 'port', 'role'}, or None if no host answered
+	'''
+	for host in hosts:
+		node = parseHost(host)
+		try:
+			client = connection.get_client(node['ip'], node['port'], user, pwd)
+			config = client.admin.command('replSetGetConfig')['config']
+		except (ConnectionFailure, OperationFailure):
+			connection.discard(node['ip'], node['port'], user)
+			continue
+		members = []
+		for m in config['members']:
+			member = parseHost(m['host'])
+			member['role'] = 'arbiter' if m.get('arbiterOnly') else 'not arbiter'
+			members.append(member)
+		return members
+	return None
+
+
+def getMembers(name, hosts, user='', pwd=''):
+	'''Get the members of a shard or of the config servers.
+
+	A replica set is read from its config. If none of its hosts answer, or the
+	shard is a single mongod, the listed hosts are used as they are.
+	'''
+	members = getReplSetMembers(hosts, user, pwd) if name else None
+	if members is None:
+		if name:
+			print('Cound not get the replica set config', name)
+		members = [dict(parseHost(h), role='not arbiter') for h in hosts]
+	return members
+
+
+def readSeed(seed, user='', pwd=''):
+	'''Read the shards, the config servers and the running mongos from a mongos.
+
+	Args:
+		seed    dict     the mongos, {'ip', 'port'}
+		user    string   the user of mongodb, '' if authentication is not needed
+		pwd     string   the password of mongodb
+
+	Returns:
+		shards     list     the listShards documents
+		config_db  string   the configDB connection string
+		mongos     list     the 'host:port' of the mongos that pinged recently
+	'''
+	client = connection.get_client(seed['ip'], seed['port'], user, pwd)
+	shards = client.admin.command('listShards')['shards']
+	config_db = client.admin.command('getCmdLineOpts')['parsed']['sharding']['configDB']
+	since = datetime.datetime.utcnow() - datetime.timedelta(seconds=mongos_max_ping_age)
+	mongos = [doc['_id'] for doc in client.config.mongos.find({'ping': {'$gte': since}}, {'_id': 1})]
+	return shards, config_db, mongos
+
+
+def discoverCluster(seeds, user='', pwd='', workers=pool.default_workers):
+	'''Build the cluster inventory from the first seed mongos that answers.
+
+	The config servers and all the shards are read in parallel, so discovering
+	dozens of shards takes about as long as the slowest one.
+
+	Args:
+		seeds    list     the seed mongos, {'ip', 'port'}
+		user     string   the user of mongodb, '' if authentication is not needed
+		pwd      string   the password of mongodb
+		workers  int      the maximum number of replica sets read at the same time
+
+	Returns:
+		a dict of the same structure as cluster.json, or None if no seed answered
+	'''
+	for seed in seeds:
+		try:
+			shards, config_db, mongos = readSeed(seed, user, pwd)
+			break
+		except (ConnectionFailure, OperationFailure, KeyError):
+			connection.discard(seed['ip'], seed['port'], user)
+			print('Cound not discover the cluster from the mongos', seed['ip'], str(seed['port']))
+	else:
+		return None
+
+	sets = [parseConnectionString(config_db)]
+	sets.extend(parseConnectionString(s['host']) for s in shards)
+	tasks = [(getMembers, (name, hosts, user, pwd)) for name, hosts in sets]
+	results = pool.gather(tasks, workers)
+
+	cluster = {
+		'mongos': [parseHost(m) for m in mongos] or [dict(s) for s in seeds],
+		'config': results[0] or [],
+		'shard': []
+	}
+	for s, members in zip(shards, results[1:]):
+		cluster['shard'].append({'name': s['_id'], 'members': members or []})
+	return cluster
+
+
+def clusterHosts(cluster):
+	'''Find out the components of every host of a cluster inventory.
+
+	Args:
+		cluster   dict   the structure of cluster.json, read from the file or discovered
+
+	Returns:
+		hosts      dict     ip -> the components on it(e.g. ['mongos', 'config', 'shard1 arbiter'])
+		shards     list     the names of all the shards in the cluster(e.g. ['shard0', 'shard1', 'shard2', 'shard3'])
+	'''
+	hosts = defaultdict(list)
+	shards = []
+	for mongos in cluster['mongos']:
+		hosts[mongos['ip']].append('mongos')
+	for config in cluster['config']:
+		hosts[config['ip']].append('config')
+	for shard in cluster['shard']:
+		shards.append(shard['name'])
+		for m in shard['members']:
+			hosts[m['ip']].append(shard['name'] + ' ' + m['role'])
+	return hosts, shards
+
+
+class ClusterDiscovery(object):
+	'''The topology of a sharded cluster discovered from seed mongos, cached for ttl seconds.
+
+	When a rediscovery fails the last topology is kept, so a mongos restart does
+	not stop the monitoring of the rest of the cluster.
+	'''
+
+	def __init__(self, seeds, user='', pwd='', ttl=default_ttl):
+		'''
+		Args:
+			seeds   list     the seed mongos, {'ip', 'port'}
+			user    string   the user of mongodb, '' if authentication is not needed
+			pwd     string   the password of mongodb
+			ttl     float    the seconds a discovered topology is reused
+		'''
+		self.seeds = seeds
+		self.user = user
+		self.pwd = pwd
+		self.ttl = ttl
+		self.cluster = None
+		self.expires = 0
+		self.lock = threading.Lock()
+
+	def get(self, workers=pool.default_workers):
+		'''Return the cluster inventory, discovering it again once the cached one expired.
+
+		Returns:
+			a dict of the same structure as cluster.json, or None if it was never discovered
+		'''
+		with self.lock:
+			now = time.time()
+			if self.cluster is None or now >= self.expires:
+				cluster = discoverCluster(self.seeds, self.user, self.pwd, workers)
+				if cluster is not None:
+					self.cluster = cluster
+					self.expires = now + self.ttl
+			return self.cluster
@@ -0,0 +1,146 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: instrument.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:11
+'
+'''
+
+import threading
+import time
+
+from mongodb_zabbix import tracing
+
+
+# the item key prefix of the collector's own items, see mongodb_collector.xml
+key_prefix = 'collector.'
+
+# the clock of the timers, monotonic and cheap
+now = time.perf_counter
+
+
+class Timer(object):
+	'''Time a block and record it under a name: with instrument.timer('send'): ...
+
+	While tracing is on, the block is also recorded as a span of the trace.
+	'''
+
+	__slots__ = ('stats', 'name', 'args', 'start')
+
+	def __init__(self, stats, name, args=None):
+		self.stats = stats
+		self.name = name
+		self.args = args
+
+	def __enter__(self):
+		self.start = now()
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		end = now()
+		self.stats.record(self.name, end - self.start)
+		if tracing.enabled:
+			tracing.complete(self.name, self.start, end, self.args)
+		return False
+
+
+class Stats(object):
+	'''The timings and counters of the collector's hot paths, aggregated per cycle.
+
+	A timing keeps only its count, total and maximum, so recording one costs a
+	lock and three additions whatever the number of polls. At the end of every
+	cycle they are turned into items for the collector's own zabbix host and
+	reset.
+	'''
+
+	def __init__(self):
+		# name -> [count, total seconds, max seconds]
+		self.timings = {}
+		# name -> value
+		self.counters = {}
+		self.lock = threading.Lock()
+
+	def timer(self, name, args=None):
+		'''Return a context manager that records the time spent in its block, args are shown in the trace.'''
+		return Timer(self, name, args)
+
+	def record(self, name, seconds):
+		'''Record one timing in seconds.'''
+		with self.lock:
+			timing = self.timings.get(name)
+			if timing is None:
+				self.timings[name] = [1, seconds, seconds]
+			else:
+				timing[0] += 1
+				timing[1] += seconds
+				if seconds > timing[2]:
+					timing[2] = seconds
+
+	def count(self, name, n=1):
+		'''Add n to a counter.'''
+		with self.lock:
+			self.counters[name] = self.counters.get(name, 0) + n
+
+	def reset(self):
+		'''Return the timings and counters so far and start over.'''
+		with self.lock:
+			timings, counters = self.timings, self.counters
+			self.timings = {}
+			self.counters = {}
+		return timings, counters
+
+	def items(self):
+		'''Turn the timings and counters into (item key, value string) and reset them.
+
+		A timing 'poll' gives collector.poll.count, collector.poll.avg and
+		collector.poll.max in seconds, a counter 'items.sent' gives collector.items.sent.
+		'''
+		timings, counters = self.reset()
+		items = []
+		for name, (count, total, longest) in sorted(timings.items()):
+			items.append((key_prefix + name + '.count', str(count)))
+			items.append((key_prefix + name + '.avg', '%.6f' % (total / count)))
+			items.append((key_prefix + name + '.max', '%.6f' % longest))
+		for name, value in sorted(counters.items()):
+			items.append((key_prefix + name, str(value)))
+		return items
+
+
+# the stats shared by all the threads of this process
+stats = Stats()
+
+
+def timer(name, args=None):
+	'''Time a block of the shared stats, see Stats.timer().'''
+	return stats.timer(name, args)
+
+
+def record(name, seconds):
+	stats.record(name, seconds)
+
+
+def count(name, n=1):
+	stats.count(name, n)
+
+
+def flush(batch, hostname, start):
+	'''Add the stats of the cycle to the batch for the collector's own zabbix host and reset them.
+
+	Called just before the batch of the cycle is sent, so the stats go out in
+	the same request as the values. The timings of that send show up in the
+	stats of the next cycle.
+
+	Args:
+		batch     ZabbixBatch  the batch of the collector
+		hostname  string       the zabbix host of the collector, '' to drop the stats
+		start     float        the time.time() the cycle started
+	'''
+	duration = time.time() - start
+	items = stats.items()
+	if not hostname:
+		return
+	batch.add(hostname, key_prefix + 'cycle.duration', '%.6f' % duration)
+	for key, value in items:
+		batch.add(hostname, key, value)
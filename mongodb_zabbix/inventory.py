@@ -0,0 +1,359 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: inventory.py
+'@author: liyunting
+'@version: 7
+'@lastModify: 2026-10-18 12:20
+'
+'''
+
+import json
+import os
+import threading
+import time
+
+from mongodb_zabbix import connection
+from mongodb_zabbix import discovery
+from mongodb_zabbix import instrument
+from mongodb_zabbix import pool
+from mongodb_zabbix import tracing
+from mongodb_zabbix.collector import process_notarbiter, process_arbiter
+from mongodb_zabbix.metrics import discoveredPrefix, getMetricMap, itemKey, sharded_metrics
+from mongodb_zabbix.replset import memberDefaults, process_replset
+from mongodb_zabbix.sender import clockNow
+
+
+# the prefix of the hosts created by create_host_*.py for each deployment
+standalone_prefix = 'mongo_'
+repl_prefix = 'repl_'
+sharded_prefix = 'sh_'
+
+# the item key prefix of the shard members in discovery mode, and the keys of the
+# low-level discovery rules of sh_shard.xml: one for every member, and one for the
+# members that are not arbiters, which have the serverStatus items
+shard_prefix = 'shard'
+shard_discovery_key = 'shard.discovery'
+shard_metrics_discovery_key = 'shard.metrics.discovery'
+
+# the seconds after which unchanged discovery data is sent again
+discovery_interval = 3600
+
+# zabbix host -> (the discovery data last sent, when), kept for the life of the process
+discovery_sent = {}
+discovery_lock = threading.Lock()
+
+
+def standaloneTargets(ip, port, batch, user='', pwd=''):
+	'''Expand a standalone node into its targets.
+
+	A target is a (hostname, prefix, function, args) tuple: one poll, the zabbix
+	host it sends its values to and the item key prefix of the polled node.
+
+	Args:
+		ip      string       the ip of mongo server
+		port    int          the port of mongo server
+		batch   ZabbixBatch  the batch that collects the values to be sent
+		user    string       the user of mongodb, '' if authentication is not needed
+		pwd     string       the password of mongodb
+
+	Returns:
+		a list of targets
+	'''
+	hostname = standalone_prefix + ip
+	return [(hostname, 'mongo', process_notarbiter, (ip, port, batch, hostname, getMetricMap('mongo'), user, pwd))]
+
+
+def replTargets(repl, batch, user='', pwd=''):
+	'''Expand a replica set, as described by repl.json, into its targets.
+
+	Every data bearing member is polled for its serverStatus, and the set as a
+	whole once for replSetGetStatus, which also covers the arbiters. The
+	replSetGetStatus target is attributed to the first member's host, with no
+	prefix as it is not the poll of a single node.
+
+	Returns:
+		a list of (hostname, prefix, function, args) targets
+	'''
+	members = repl['members']
+	targets = []
+	if members:
+		targets.append((repl_prefix + members[0]['ip'], None, process_replset, (repl['name'], members, batch, repl_prefix, 'mongo', user, pwd)))
+	for m in members:
+		if m['role'] == 'not arbiter':
+			hostname = repl_prefix + m['ip']
+			targets.append((hostname, 'mongo', process_notarbiter, (m['ip'], m['port'], batch, hostname, getMetricMap('mongo'), user, pwd)))
+	return targets
+
+
+def clusterTargets(cluster, batch, user='', pwd='', lld=False):
+	'''Expand a sharded cluster, as described by cluster.json or discovered, into its targets.
+
+	The items of a shard member are keyed by the name of its shard, e.g.
+	'shard1.alive', for the template imported for every shard. With lld they are
+	keyed 'shard.alive[shard1]' instead, for the item prototypes of the one
+	shard template, see shardDiscovery().
+
+	Returns:
+		a list of (hostname, prefix, function, args) targets
+	'''
+	targets = []
+	for mongos in cluster['mongos']:
+		hostname = sharded_prefix + mongos['ip']
+		targets.append((hostname, 'mongos', process_notarbiter, (mongos['ip'], mongos['port'], batch, hostname, getMetricMap('mongos', sharded_metrics), user, pwd)))
+	for config in cluster['config']:
+		hostname = sharded_prefix + config['ip']
+		targets.append((hostname, 'config', process_notarbiter, (config['ip'], config['port'], batch, hostname, getMetricMap('config', sharded_metrics), user, pwd)))
+	for shard in cluster['shard']:
+		name = discoveredPrefix(shard_prefix, shard['name']) if lld else shard['name']
+		for m in shard['members']:
+			hostname = sharded_prefix + m['ip']
+			if m['role'] == 'not arbiter':
+				targets.append((hostname, name, process_notarbiter, (m['ip'], m['port'], batch, hostname, getMetricMap(name, sharded_metrics), user, pwd)))
+			if m['role'] == 'arbiter':
+				targets.append((hostname, name, process_arbiter, (m['ip'], m['port'], batch, hostname, name)))
+	return targets
+
+
+def targetKey(target):
+	'''Name a target: (hostname, prefix, 'ip:port'), or (hostname, function name, replica set name) without a prefix.'''
+	hostname, prefix, fn, args = target
+	if prefix is None:
+		return (hostname, fn.__name__, args[0])
+	return (hostname, prefix, '%s:%s' % (args[0], args[1]))
+
+
+def targetDefaults(target):
+	'''List the items a target sends, with the value json mode sends for those it yields none for.
+
+	Returns:
+		a list of (hostname, [(item key, value)]), see ZabbixBatch.expect()
+	'''
+	hostname, prefix, fn, args = target
+	if fn is process_replset:
+		return memberDefaults(args[1], args[3], args[4])
+	if fn is process_notarbiter:
+		return [(hostname, args[4].defaults + [(itemKey(prefix, 'timeout'), '0')])]
+	if prefix is not None:
+		return [(hostname, [(itemKey(prefix, 'alive'), '0'), (itemKey(prefix, 'timeout'), '0')])]
+	return []
+
+
+def pollTargets(targets, batch, deadline=None, workers=pool.default_workers):
+	'''Poll targets in parallel until the deadline and record which ones timed out.
+
+	Every target with a prefix gets '<prefix>.timeout': 1 if its poll did not
+	finish before the deadline or was still running from an earlier cycle, 0
+	otherwise. The values the late targets add once they finish are sent with
+	the next cycle of a daemon. In json mode, the items of every target are
+	handed to the batch first, so that the documents of the nodes that were late
+	or down still have every field, see targetDefaults().
+
+	Args:
+		targets   list         (hostname, prefix, function, args) targets
+		batch     ZabbixBatch  the batch that collects the values to be sent
+		deadline  float        the time.time() by which polling must be done, None for no limit
+		workers   int          the maximum number of targets polled at the same time
+
+	Returns:
+		the number of targets that timed out
+	'''
+	if batch.json_mode:
+		for t in targets:
+			for hostname, defaults in targetDefaults(t):
+				batch.expect(hostname, defaults)
+	# every target keeps its client until the next cycle
+	connection.reserve(len(targets))
+	late = pool.pollUntil([(targetKey(t), t[2], t[3]) for t in targets], deadline, workers)
+	instrument.count('targets', len(targets))
+	instrument.count('timeouts', len(late))
+	clock = clockNow()
+	for t in targets:
+		hostname, prefix = t[0], t[1]
+		key = targetKey(t)
+		timed_out = key in late
+		if timed_out:
+			print('Timed out polling', *key)
+		if prefix is not None:
+			batch.add(hostname, itemKey(prefix, 'timeout'), '1' if timed_out else '0', clock)
+	return len(late)
+
+
+def shardDiscovery(targets, batch, now=None):
+	'''Add the low-level discovery data of the shard members among targets.
+
+	Every zabbix host gets one row per shard member on it, {"{#SHARD}": "shard1",
+	"{#ROLE}": "not arbiter", "{#PORT}": "27001"}, sent to both discovery rules
+	of sh_shard.xml, which create the items of the members from its prototypes.
+	The data is built from the targets, so a collector only sends that of the
+	hosts it polls, and is only sent again when it changed or discovery_interval
+	seconds passed.
+
+	Args:
+		targets   list         (hostname, prefix, function, args) targets, of clusterTargets() with lld
+		batch     ZabbixBatch  the batch that collects the values to be sent
+		now       float        the current time, default: time.time()
+
+	Returns:
+		the number of hosts whose discovery data was added
+	'''
+	if now is None:
+		now = time.time()
+	rows = {}
+	for hostname, prefix, fn, args in targets:
+		if prefix is None or not prefix.startswith(shard_prefix + '['):
+			continue
+		rows.setdefault(hostname, []).append({
+			'{#SHARD}': prefix[len(shard_prefix) + 1:-1],
+			'{#ROLE}': 'arbiter' if fn is process_arbiter else 'not arbiter',
+			'{#PORT}': str(args[1])
+		})
+	added = 0
+	clock = clockNow()
+	for hostname, data in rows.items():
+		value = json.dumps({'data': data}, separators=(',', ':'), sort_keys=True)
+		with discovery_lock:
+			sent = discovery_sent.get(hostname)
+			if sent is not None and sent[0] == value and now - sent[1] < discovery_interval:
+				continue
+			discovery_sent[hostname] = (value, now)
+		batch.add(hostname, shard_discovery_key, value, clock)
+		batch.add(hostname, shard_metrics_discovery_key, value, clock)
+		added += 1
+	return added
+
+
+def inventoryType(inventory):
+	'''Tell the deployment an inventory describes.
+
+	Returns:
+		'sharded' for cluster.json or a list of seed mongos, 'repl' for repl.json,
+		'standalone' for a single {'ip', 'port'}, '' otherwise
+	'''
+	if 'shard' in inventory or 'seeds' in inventory:
+		return 'sharded'
+	if 'members' in inventory:
+		return 'repl'
+	if 'ip' in inventory and 'port' in inventory:
+		return 'standalone'
+	return ''
+
+
+class Fleet(object):
+	'''The deployments described by a directory of inventory files, polled by one process.
+
+	Every *.json file of the directory is one standalone node ({"ip", "port"}),
+	one replica set (repl.json) or one sharded cluster (cluster.json, or
+	{"seeds": ["ip:port", ...]} to discover it from its mongos). A file may set
+	"user" and "password" to override the default credentials. All the targets
+	share one worker pool, connection cache, rate state and batch, so a new
+	cluster only adds its nodes, not another process. The directory is read
+	again before every cycle, see load().
+	'''
+
+	def __init__(self, path, user='', pwd='', ttl=discovery.default_ttl, lld=False):
+		'''
+		Args:
+			path    string   the directory of the inventory files
+			user    string   the default user of mongodb, '' if authentication is not needed
+			pwd     string   the default password of mongodb
+			ttl     float    the seconds a discovered cluster topology is reused
+			lld     bool     key the shard members for the low-level discovery of sh_shard.xml
+		'''
+		self.path = path
+		self.user = user
+		self.pwd = pwd
+		self.ttl = ttl
+		self.lld = lld
+		# (file name, type, inventory, ClusterDiscovery or None)
+		self.inventories = []
+		# file name -> ((mtime, size), inventory entry or None)
+		self.files = {}
+		self.loaded = False
+		self.load()
+
+	def load(self):
+		'''Read the inventory files of the directory that were added or changed since the last load.
+
+		Called before every cycle, so a daemon picks up the files added,
+		changed or removed meanwhile. A file whose modification time and size
+		are unchanged is not read again and keeps its discovered topology. A
+		file that can not be parsed, e.g. while it is being written, keeps its
+		previous inventory until the next cycle.
+		'''
+		files = {}
+		for name in sorted(os.listdir(self.path)):
+			if not name.endswith('.json'):
+				continue
+			try:
+				st = os.stat(os.path.join(self.path, name))
+			except OSError:
+				continue
+			stamp = (st.st_mtime_ns, st.st_size)
+			known = self.files.get(name)
+			if known is not None and known[0] == stamp:
+				files[name] = known
+				continue
+			try:
+				entry = self.read(name)
+			except (IOError, OSError, ValueError) as e:
+				print('Cound not read the inventory', name, e)
+				files[name] = (None, known[1] if known is not None else None)
+				continue
+			if self.loaded:
+				print('inventory', 'changed:' if known is not None else 'added:', name)
+			files[name] = (stamp, entry)
+		for name in self.files:
+			if name not in files:
+				print('inventory removed:', name)
+		self.files = files
+		self.loaded = True
+		self.inventories = [files[name][1] for name in sorted(files) if files[name][1] is not None]
+
+	def read(self, name):
+		'''Read one inventory file and return its (file name, type, inventory, ClusterDiscovery or None), None if unknown.'''
+		with open(os.path.join(self.path, name), 'r') as f:
+			inventory = json.load(f)
+		kind = inventoryType(inventory)
+		if kind == '':
+			print('unknown inventory, skipped:', name)
+			return None
+		topology = None
+		if 'seeds' in inventory:
+			seeds = [discovery.parseHost(h) for h in inventory['seeds']]
+			user, pwd = self.credentials(inventory)
+			topology = discovery.ClusterDiscovery(seeds, user, pwd, self.ttl)
+		return (name, kind, inventory, topology)
+
+	def credentials(self, inventory):
+		'''Return the user and password of an inventory, the fleet's by default.'''
+		return inventory.get('user', self.user), inventory.get('password', self.pwd)
+
+	def targets(self, batch, workers=pool.default_workers):
+		'''Expand all the inventories into their targets.
+
+		Args:
+			batch     ZabbixBatch  the batch that collects the values to be sent
+			workers   int          the maximum number of replica sets discovered at the same time
+
+		Returns:
+			a list of (hostname, prefix, function, args) targets
+		'''
+		targets = []
+		for name, kind, inventory, topology in self.inventories:
+			user, pwd = self.credentials(inventory)
+			if kind == 'standalone':
+				targets.extend(standaloneTargets(inventory['ip'], inventory['port'], batch, user, pwd))
+			elif kind == 'repl':
+				targets.extend(replTargets(inventory, batch, user, pwd))
+			else:
+				if topology is not None:
+					with tracing.span('discover', {'inventory': name}):
+						cluster = topology.get(workers)
+				else:
+					cluster = inventory
+				if cluster is None:
+					print('Cound not discover the sharded cluster', name)
+					continue
+				targets.extend(clusterTargets(cluster, batch, user, pwd, self.lld))
+		return targets
@@ -0,0 +1,133 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: metrics.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 12:19
+'
+'''
+
+import threading
+
+from mongodb_zabbix.status import StatusQuery
+
+
+# value type name -> function turning the value into the string sent to zabbix server,
+# matching the value_type of the item in the templates (3: numeric unsigned, 0: float, 1: character)
+value_types = {
+	'uint': lambda v: str(int(v)),
+	'float': lambda v: '%.4f' % v,
+	'str': str
+}
+
+# value type name -> the value sent in json mode for an item the node has no value for, see defaults
+default_values = {
+	'uint': '0',
+	'float': '0',
+	'str': ''
+}
+
+# the serverStatus fields sent to zabbix server, one row per item. A counter is a
+# cumulative total that is sent as a per-second rate computed by the rates module:
+#  document path              item key suffix     value type  transform  counter
+metric_table = [
+	('connections.current',     'conn.current',     'uint',     None,      False),
+	('connections.available',   'conn.available',   'uint',     None,      False),
+	('mem.resident',            'mem.resident',     'uint',     None,      False),
+	('network.bytesIn',         'network.in',       'float',    None,      True),
+	('network.bytesOut',        'network.out',      'float',    None,      True),
+	('opcounters.delete',       'op.delete',        'float',    None,      True),
+	('opcounters.getmore',      'op.getmore',       'float',    None,      True),
+	('opcounters.insert',       'op.insert',        'float',    None,      True),
+	('opcounters.query',        'op.query',         'float',    None,      True),
+	('opcounters.update',       'op.update',        'float',    None,      True),
+	('extra_info.page_faults',  'page_faults',      'uint',     None,      False),
+	('extra_info.page_faults',  'page_faults.rate', 'float',    None,      True),
+	('uptime',                  'uptime',           'uint',     None,      False),
+	('version',                 'version',          'str',      None,      False),
+]
+
+# the item key suffixes of each template
+mongod_metrics = tuple(row[1] for row in metric_table)
+sharded_metrics = tuple(s for s in mongod_metrics if s not in ('conn.available', 'mem.resident', 'page_faults', 'page_faults.rate'))
+
+
+def itemKey(prefix, suffix):
+	'''Build the item key of a suffix under a prefix: ('shard1', 'alive') -> 'shard1.alive'.
+
+	A prefix with a parameter, as built by discoveredPrefix(), moves it after the
+	suffix: ('shard[shard1]', 'alive') -> 'shard.alive[shard1]', the key of an
+	item created from the prototypes of a low-level discovery rule.
+	'''
+	if prefix.endswith(']'):
+		name, param = prefix[:-1].split('[', 1)
+		return '%s.%s[%s]' % (name, suffix, param)
+	return prefix + '.' + suffix
+
+
+def discoveredPrefix(prefix, param):
+	'''Build the prefix of the items discovered for param, e.g. ('shard', 'shard1') -> 'shard[shard1]'.'''
+	return '%s[%s]' % (prefix, param)
+
+
+def compileRow(path, key, value_type, transform):
+	'''Compose the transform and the value type of a row into one function.'''
+	convert = value_types[value_type]
+	if transform is None:
+		return path, key, convert
+	return path, key, lambda v: convert(transform(v))
+
+
+class MetricMap(object):
+	'''The metric table compiled for one item key prefix.
+
+	The serverStatus query, the full item keys and the value conversions are all
+	built once, so a poll is a tight loop over precomputed (path, key, convert)
+	tuples with no key concatenation or nested lookups. The counters are kept
+	apart since their values go through the rate state before being sent. The
+	defaults are what json mode sends for the items a poll yields no value for.
+	'''
+
+	def __init__(self, prefix, suffixes=mongod_metrics):
+		'''
+		Args:
+			prefix    string   the item key prefix, e.g. 'mongo', 'mongos', 'config', 'shard1' or 'shard[shard1]'
+			suffixes  tuple    the item key suffixes to send, default: all the rows
+		'''
+		rows = [row for row in metric_table if row[1] in suffixes]
+		self.prefix = prefix
+		self.alive_key = itemKey(prefix, 'alive')
+		self.query = StatusQuery([row[0] for row in rows])
+		self.getters = [compileRow(path, itemKey(prefix, suffix), value_type, transform)
+			for path, suffix, value_type, transform, counter in rows if not counter]
+		self.counters = [compileRow(path, itemKey(prefix, suffix), value_type, transform)
+			for path, suffix, value_type, transform, counter in rows if counter]
+		self.defaults = [(self.alive_key, '0')] + [(itemKey(prefix, row[1]), default_values[row[2]]) for row in rows]
+
+	def items(self, status):
+		'''Turn the fields read by self.query into (item key, value) tuples.
+
+		Args:
+			status   dict   dotted path -> value, as returned by self.query.run()
+
+		Returns:
+			a list of (key, value string) of the rows that are not counters,
+			fields missing from status are skipped
+		'''
+		return [(key, convert(status[path])) for path, key, convert in self.getters if path in status]
+
+
+# the compiled metric maps, keyed by (prefix, suffixes)
+metric_maps = {}
+metric_maps_lock = threading.Lock()
+
+
+def getMetricMap(prefix, suffixes=mongod_metrics):
+	'''Get the metric map of a prefix, compiling it on first use.'''
+	key = (prefix, suffixes)
+	metric_map = metric_maps.get(key)
+	if metric_map is None:
+		with metric_maps_lock:
+			metric_map = metric_maps.setdefault(key, MetricMap(prefix, suffixes))
+	return metric_map
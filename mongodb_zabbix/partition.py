@@ -0,0 +1,119 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: partition.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:13
+'
+'''
+
+import bisect
+import hashlib
+import struct
+
+
+# the points every collector gets on the ring, more points spread the targets more evenly
+default_vnodes = 160
+
+
+def hashKey(key):
+	'''Hash a string to a 64 bit point of the ring, the same on every machine and python version.'''
+	return struct.unpack('>Q', hashlib.md5(key.encode('utf-8')).digest()[:8])[0]
+
+
+class HashRing(object):
+	'''A consistent hash ring that assigns keys to collectors.
+
+	Every collector is placed on the ring at vnodes points and a key belongs to
+	the collector of the first point following the key's hash. Adding a
+	collector to N others only takes over about 1/(N+1) of the keys, and removing
+	one only moves its own keys.
+	'''
+
+	def __init__(self, peers, vnodes=default_vnodes):
+		'''
+		Args:
+			peers    list   the names of all the collectors, e.g. ['0', '1', '2'] or ['collector-a', 'collector-b']
+			vnodes   int    the points of every collector on the ring
+		'''
+		points = []
+		for peer in peers:
+			for i in range(vnodes):
+				points.append((hashKey('%s#%d' % (peer, i)), peer))
+		points.sort()
+		self.peers = list(peers)
+		self.points = [p[0] for p in points]
+		self.owners = [p[1] for p in points]
+
+	def owner(self, key):
+		'''Return the collector that a key belongs to.'''
+		i = bisect.bisect(self.points, hashKey(key))
+		if i == len(self.points):
+			i = 0
+		return self.owners[i]
+
+
+class Partition(object):
+	'''The share of the targets polled by one collector out of several.
+
+	Targets are assigned by their zabbix host name, so all the components that
+	send to the same host (e.g. the mongos, config server and shard members on
+	one sh_<ip> host) are polled by the same collector.
+	'''
+
+	def __init__(self, peers, me, vnodes=default_vnodes):
+		'''
+		Args:
+			peers    list     the names of all the collectors
+			me       string   the name of this collector, one of peers
+			vnodes   int      the points of every collector on the ring
+		'''
+		if me not in peers:
+			raise ValueError('%s is not one of the collectors %s' % (me, ','.join(peers)))
+		self.ring = HashRing(peers, vnodes)
+		self.me = me
+
+	def owns(self, hostname):
+		'''Tell whether this collector polls the targets of a zabbix host.'''
+		return self.ring.owner(hostname) == self.me
+
+	def select(self, targets):
+		'''Keep the (hostname, prefix, function, args) targets of this collector.'''
+		return [t for t in targets if self.owns(t[0])]
+
+
+def indexPartition(index, count, vnodes=default_vnodes):
+	'''Build the partition of collector index out of count collectors named '0' to 'count - 1'.'''
+	if count < 1 or not 0 <= index < count:
+		raise ValueError('the shard index must be between 0 and %d' % (count - 1))
+	return Partition([str(i) for i in range(count)], str(index), vnodes)
+
+
+def parsePartition(index, count, peers, me):
+	'''Build the partition from the command line options of a collector.
+
+	Args:
+		index   int      --shard-index, None if not given
+		count   int      --shard-count, None if not given
+		peers   string   --peers, the comma separated names of all the collectors, '' if not given
+		me      string   --peer, the name of this collector
+
+	Returns:
+		a Partition, or None to poll all the targets
+
+	Raises:
+		ValueError if only one option of a pair is given, or both pairs: each
+		collector would poll the targets of the others without a word
+	'''
+	if (index is None) != (count is None):
+		raise ValueError('--shard-index and --shard-count must be given together')
+	if bool(peers) != bool(me):
+		raise ValueError('--peers and --peer must be given together')
+	if peers and count is not None:
+		raise ValueError('give either --shard-index and --shard-count or --peers and --peer')
+	if peers:
+		return Partition([p for p in peers.split(',') if p], me)
+	if count is not None:
+		return indexPartition(index, count)
+	return None
@@ -0,0 +1,133 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: pool.py
+'@author: liyunting
+'@version: 5
+'@lastModify: 2026-10-18 12:12
+'
+'''
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from mongodb_zabbix import instrument
+from mongodb_zabbix import tracing
+
+
+# the default number of nodes polled at the same time
+default_workers = 8
+
+# the seconds a cycle run once, e.g. by crontab every minute, may poll before it sends what it has
+default_deadline = 50
+
+# the worker pools kept alive across cycles, keyed by their size
+executors = {}
+
+# the keys of the tasks of pollUntil() that are still running, maybe from an earlier cycle
+running = set()
+running_lock = threading.Lock()
+
+
+def get_executor(workers):
+	'''Get the worker pool of the given size, creating it on first use.'''
+	executor = executors.get(workers)
+	if executor is None:
+		executor = ThreadPoolExecutor(max_workers=workers)
+		executors[workers] = executor
+	return executor
+
+
+def gather(tasks, workers=default_workers):
+	'''Run tasks in parallel on a bounded worker pool and return their results.
+
+	Args:
+		tasks    list   (function, args) tuples
+		workers  int    the maximum number of tasks running at the same time
+
+	Returns:
+		the list of the results in the order of tasks, None for a task that raised
+	'''
+	executor = get_executor(max(1, workers))
+	futures = [executor.submit(fn, *args) for fn, args in tasks]
+	results = []
+	for future in futures:
+		try:
+			results.append(future.result())
+		except Exception:
+			# one broken node must not abort the cycle
+			traceback.print_exc()
+			results.append(None)
+	return results
+
+
+def runKeyed(key, fn, args):
+	'''Run a task of pollUntil(), time it and mark its key as no longer running.'''
+	try:
+		with instrument.timer('poll', {'target': ' '.join(str(k) for k in key)} if tracing.enabled else None):
+			fn(*args)
+	except Exception:
+		# one broken node must not abort the cycle
+		traceback.print_exc()
+	finally:
+		with running_lock:
+			running.discard(key)
+
+
+def pollUntil(tasks, deadline=None, workers=default_workers):
+	'''Poll nodes in parallel until they are all done or the deadline has passed.
+
+	The tasks still running at the deadline are left to finish in the background
+	and the ones not started yet are cancelled, so the cycle can flush what it
+	has. A task whose key is still running from an earlier cycle is not started
+	again, so a hung node is never polled twice at the same time.
+
+	Args:
+		tasks     list    (key, function, args) tuples, the key naming the polled target
+		deadline  float   the time.time() by which the cycle must be done, None for no limit
+		workers   int     the maximum number of tasks running at the same time
+
+	Returns:
+		the set of the keys that did not finish in time, including the ones not started
+	'''
+	executor = get_executor(max(1, workers))
+	futures = {}
+	late = set()
+	with running_lock:
+		for key, fn, args in tasks:
+			if key in running:
+				late.add(key)
+				continue
+			running.add(key)
+			futures[executor.submit(runKeyed, key, fn, args)] = key
+	timeout = None if deadline is None else max(0, deadline - time.time())
+	done, pending = wait(futures, timeout)
+	for future in pending:
+		key = futures[future]
+		if future.cancel():
+			with running_lock:
+				running.discard(key)
+		late.add(key)
+	return late
+
+
+def shutdown():
+	'''Stop all the worker pools without waiting for the polls still running.
+
+	The polls pollUntil() left behind at the deadline may hang until their
+	timeouts, waiting for them would make the run last as long as the slowest.
+
+	Returns:
+		the number of polls still running
+	'''
+	for executor in executors.values():
+		try:
+			executor.shutdown(wait=False, cancel_futures=True)
+		except TypeError:
+			# Python before 3.9
+			executor.shutdown(wait=False)
+	executors.clear()
+	with running_lock:
+		return len(running)
@@ -0,0 +1,491 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: provision.py
+'@author: liyunting
+'@version: 4
+'@lastModify: 2026-10-18 12:20
+'
+'''
+
+import os
+import time
+
+from mongodb_zabbix import inventory
+from mongodb_zabbix.api import ApiError
+from mongodb_zabbix.discovery import clusterHosts
+
+
+# the host groups of each deployment, as created by create_host_*.py
+standalone_group = 'Mongodb Standalone'
+repl_group = 'Mongodb Repl '
+sharded_group = 'Mongodb Sh Cluster'
+
+# template name -> its file, relative to the root of the repository and without the .xml extension
+template_files = {
+	'Template DB MongoDB': os.path.join('monitoring for Standalone', 'mongo_standalone'),
+	'Template MongoDB Repl Arbiter': os.path.join('monitoring for Replica Set', 'mongodb_repl_arbiter'),
+	'Template MongoDB Repl Notarbiter': os.path.join('monitoring for Replica Set', 'mongodb_repl_notarbiter'),
+	'Template MongoDB Sh Mongos': os.path.join('monitoring for Sharded Cluster', 'sh_mongos'),
+	'Template MongoDB Sh Config': os.path.join('monitoring for Sharded Cluster', 'sh_config'),
+	'Template MongoDB Sh Shard': os.path.join('monitoring for Sharded Cluster', 'sh_shard'),
+	'Template MongoDB Sh Shard Notarbiter': os.path.join('monitoring for Sharded Cluster', 'sh_shard_na'),
+	'Template MongoDB Sh Shard Arbiter': os.path.join('monitoring for Sharded Cluster', 'sh_shard_a'),
+}
+
+# the templates of other hosts, never linked or unlinked by a reconcile
+unmanaged_templates = ('Template MongoDB Collector',)
+
+# the items sent in one array call: the hosts to create, update or delete, and
+# the hosts a mass call links templates to or adds to host groups
+default_chunk = 100
+default_mass_chunk = 500
+
+# the zabbix agent interface every host is created with
+agent_interface = {'type': 1, 'main': 1, 'useip': 1, 'dns': '', 'port': '10050'}
+
+# the configuration.import rules of create_host_*.py
+import_rules = {
+	'applications': {'createMissing': True, 'deleteMissing': False},
+	'templates': {'createMissing': True, 'updateExisting': True},
+	'screens': {'createMissing': True, 'updateExisting': True},
+	'valueMaps': {'createMissing': True, 'updateExisting': False},
+	'graphs': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+	'triggers': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+	'items': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True},
+	'discoveryRules': {'createMissing': True, 'updateExisting': True, 'deleteMissing': True}
+}
+
+
+def managedTemplate(name):
+	'''Tell whether a template is one of the node templates a reconcile links and unlinks, per shard ones included.'''
+	if name in unmanaged_templates:
+		return False
+	return name == 'Template DB MongoDB' or name.startswith('Template MongoDB ')
+
+
+def shardTemplateName(shard, role):
+	'''Return the name of the template imported for one shard and role, as create_host_sh.py does.'''
+	return 'Template MongoDB Sh %s %s' % (shard.capitalize(), 'Arbiter' if role == 'arbiter' else 'Notarbiter')
+
+
+def attempt(call, method, items, build):
+	'''Make one array call of items, returning (the result, None) or (None, the error).'''
+	try:
+		return call(method, build([params for label, params in items])), None
+	except ApiError as e:
+		return None, e.error
+
+
+def itemIds(method, items, result):
+	'''Report a successful array call and map the label of every item to the id it returned.'''
+	if len(items) == 1:
+		print('%s: %s successfully' % (method, items[0][0]))
+	else:
+		print('%s: %d items successfully' % (method, len(items)))
+	returned = []
+	if isinstance(result, dict):
+		returned = next(iter(result.values()), [])
+	if len(returned) != len(items):
+		returned = [None] * len(items)
+	return dict((label, i) for (label, params), i in zip(items, returned))
+
+
+def callItems(call, method, items, failures, build=list):
+	'''Call a method with the params of many items as one array, retrying without the ones that fail.
+
+	Zabbix makes an array call in one transaction, so one bad item fails them
+	all. The items whose label the error quotes, e.g. 'Host with the same name
+	"sh_10.0.86.206" already exists.', are reported and the others retried;
+	when the error quotes none, the items are retried in halves, down to the
+	one at fault. When both halves fail with the error of the whole, the error
+	is not about an item, e.g. missing permissions or an expired session, and
+	all the items are reported at once instead of being called one by one.
+
+	Args:
+		call       function   call(method, params), e.g. ZabbixAPI.call
+		method     string     the api method, e.g. 'host.create'
+		items      list       (label, params) of every item, e.g. (hostname, the host to create)
+		failures   list       receives the (label, error) of the items that failed
+		build      function   turns the list of the params of the items into the params of the call, default: the list
+
+	Returns:
+		label -> the id the call returned for the item, None when it returns no id per item
+	'''
+	if not items:
+		return {}
+	result, error = attempt(call, method, items, build)
+	if error is None:
+		return itemIds(method, items, result)
+	return retryItems(call, method, items, failures, build, error)
+
+
+def retryItems(call, method, items, failures, build, error):
+	'''Report the items at fault for the error of an array call and call the others again, see callItems().'''
+	if len(items) == 1:
+		failures.append((items[0][0], error))
+		print('error in %s: %s' % (method, items[0][0]))
+		print(error)
+		return {}
+	quoted = [item for item in items if '"%s"' % item[0] in str(error)]
+	if quoted:
+		for label, params in quoted:
+			failures.append((label, error))
+			print('error in %s: %s' % (method, label))
+			print(error)
+		return callItems(call, method, [item for item in items if item not in quoted], failures, build)
+	half = len(items) // 2
+	parts = [items[:half], items[half:]]
+	outcomes = [attempt(call, method, part, build) for part in parts]
+	if all(e == error for result, e in outcomes):
+		for label, params in items:
+			failures.append((label, error))
+		print('error in %s: all %d items' % (method, len(items)))
+		print(error)
+		return {}
+	ids = {}
+	for part, (result, e) in zip(parts, outcomes):
+		if e is None:
+			ids.update(itemIds(method, part, result))
+		else:
+			ids.update(retryItems(call, method, part, failures, build, e))
+	return ids
+
+
+def callChunks(call, method, items, chunk, failures, build=list):
+	'''Call a method for many items in array calls of up to chunk items, see callItems().'''
+	ids = {}
+	for start in range(0, len(items), chunk):
+		ids.update(callItems(call, method, items[start:start + chunk], failures, build))
+	return ids
+
+
+def byTarget(pairs):
+	'''Turn (hostname, names) pairs into name -> the hostnames, for the mass calls of one template or group.'''
+	targets = {}
+	for hostname, names in pairs:
+		for name in names:
+			targets.setdefault(name, []).append(hostname)
+	return targets
+
+
+class Desired(object):
+	'''The hosts, host groups and templates that a set of inventories needs in zabbix.'''
+
+	def __init__(self, root, json_mode=False, lld=False):
+		'''
+		Args:
+			root        string   the root of the repository, where the template files are
+			json_mode   bool     use the json mode templates, see mongodb_zabbix/templates.py
+			lld         bool     use the one shard template with low-level discovery, sh_shard.xml
+		'''
+		self.root = root
+		self.suffix = '_json' if json_mode else ''
+		self.lld = lld
+		# hostname -> {'ip', 'groups': set of names, 'templates': set of names}
+		self.hosts = {}
+		# template name -> (the file it is imported from, the shard it is customized for or None)
+		self.templates = {}
+
+	def addHost(self, hostname, ip, group, template):
+		'''Add a host, or one more group and template of a host added before.'''
+		host = self.hosts.setdefault(hostname, {'ip': ip, 'groups': set(), 'templates': set()})
+		host['groups'].add(group)
+		host['templates'].add(template)
+
+	def addTemplate(self, name, base, shard=None):
+		'''Add a template, imported from the file of the template named base.'''
+		path = os.path.join(self.root, template_files[base] + self.suffix + '.xml')
+		self.templates[name] = (path, shard)
+		return name
+
+	def addStandalone(self, standalone):
+		'''Add the host of a standalone node, {'ip', 'port'}.'''
+		template = self.addTemplate('Template DB MongoDB', 'Template DB MongoDB')
+		self.addHost(inventory.standalone_prefix + standalone['ip'], standalone['ip'], standalone_group, template)
+
+	def addRepl(self, repl):
+		'''Add the hosts of a replica set, as described by repl.json.'''
+		for m in repl['members']:
+			name = 'Template MongoDB Repl Arbiter' if m['role'] == 'arbiter' else 'Template MongoDB Repl Notarbiter'
+			template = self.addTemplate(name, name)
+			self.addHost(inventory.repl_prefix + m['ip'], m['ip'], repl_group + repl['name'], template)
+
+	def addCluster(self, cluster):
+		'''Add the hosts of a sharded cluster, as described by cluster.json or discovered.'''
+		hosts, shards = clusterHosts(cluster)
+		for ip, components in hosts.items():
+			for component in components:
+				if component == 'mongos':
+					template = self.addTemplate('Template MongoDB Sh Mongos', 'Template MongoDB Sh Mongos')
+				elif component == 'config':
+					template = self.addTemplate('Template MongoDB Sh Config', 'Template MongoDB Sh Config')
+				elif self.lld:
+					template = self.addTemplate('Template MongoDB Sh Shard', 'Template MongoDB Sh Shard')
+				else:
+					shard, role = component.split(' ', 1)
+					base = 'Template MongoDB Sh Shard Arbiter' if role == 'arbiter' else 'Template MongoDB Sh Shard Notarbiter'
+					template = self.addTemplate(shardTemplateName(shard, role), base, shard)
+				self.addHost(inventory.sharded_prefix + ip, ip, sharded_group, template)
+
+	def add(self, kind, inv):
+		'''Add the hosts of an inventory of the given inventory.inventoryType().'''
+		if kind == 'standalone':
+			self.addStandalone(inv)
+		elif kind == 'repl':
+			self.addRepl(inv)
+		else:
+			self.addCluster(inv)
+
+	def groups(self):
+		'''Return the names of all the host groups.'''
+		return sorted(set(g for host in self.hosts.values() for g in host['groups']))
+
+	def templateSource(self, name):
+		'''Return the export to import for a template, customized for its shard as create_host_sh.py does.'''
+		path, shard = self.templates[name]
+		with open(path, 'r') as f:
+			content = f.read()
+		if shard is not None:
+			content = content.replace('shard', shard).replace('Shard', shard.capitalize())
+		return content
+
+
+class Existing(object):
+	'''What zabbix already has of the desired state, fetched in a few bulk get calls.'''
+
+	def __init__(self):
+		# host group name -> groupid
+		self.groups = {}
+		# template name -> templateid
+		self.templates = {}
+		# hostname -> {'hostid', 'interface': the main agent interface or None, 'groups': {name: groupid}, 'templates': {name: templateid}}
+		self.hosts = {}
+		self.calls = 0
+
+	def fetch(self, call, desired):
+		'''Read the host groups, templates and hosts of the desired state.
+
+		The hosts are those named in the desired state and all the hosts in its
+		host groups, so the ones no inventory describes anymore can be deleted.
+		'''
+		groups = call('hostgroup.get', {'output': ['groupid', 'name'], 'filter': {'name': desired.groups()}})
+		self.groups = dict((g['name'], g['groupid']) for g in groups)
+		templates = call('template.get', {'output': ['templateid', 'host'], 'filter': {'host': sorted(desired.templates)}})
+		self.templates = dict((t['host'], t['templateid']) for t in templates)
+		self.calls += 2
+		params = {
+			'output': ['hostid', 'host'],
+			'selectInterfaces': ['interfaceid', 'ip', 'type', 'main'],
+			'selectGroups': ['groupid', 'name'],
+			'selectParentTemplates': ['templateid', 'host']
+		}
+		hosts = call('host.get', dict(params, filter={'host': sorted(desired.hosts)}))
+		self.calls += 1
+		if self.groups:
+			hosts.extend(call('host.get', dict(params, groupids=sorted(self.groups.values()))))
+			self.calls += 1
+		for h in hosts:
+			interface = None
+			for i in h['interfaces']:
+				if str(i['type']) == '1' and str(i['main']) == '1':
+					interface = i
+			self.hosts[h['host']] = {
+				'hostid': h['hostid'],
+				'interface': interface,
+				'groups': dict((g['name'], g['groupid']) for g in h['groups']),
+				'templates': dict((t['host'], t['templateid']) for t in h['parentTemplates'])
+			}
+
+
+class Plan(object):
+	'''The calls that bring zabbix to the desired state, computed by diff().'''
+
+	def __init__(self):
+		# host group names to create
+		self.groups = []
+		# template names to import
+		self.imports = []
+		# hostnames to create
+		self.creates = []
+		# (hostname, interface or None, ip): the main agent interfaces to update, or create when None
+		self.interfaces = []
+		# (hostname, group names) to add to existing hosts
+		self.group_adds = []
+		# (hostname, template names) to link to existing hosts
+		self.links = []
+		# (hostname, template names) to unlink and clear from existing hosts
+		self.unlinks = []
+		# hostnames to delete
+		self.deletes = []
+
+	def size(self):
+		'''Return the number of changes planned.'''
+		return (len(self.groups) + len(self.imports) + len(self.creates) + len(self.interfaces) +
+			len(self.group_adds) + len(self.links) + len(self.unlinks) + len(self.deletes))
+
+	def describe(self, desired):
+		'''Return the plan as printable lines.'''
+		lines = []
+		for name in self.groups:
+			lines.append('create hostgroup: %s' % name)
+		for name in self.imports:
+			lines.append('import template: %s (%s)' % (name, os.path.relpath(desired.templates[name][0], desired.root)))
+		for hostname in self.creates:
+			host = desired.hosts[hostname]
+			lines.append('create host: %s ip: %s groups: %s templates: %s' % (hostname, host['ip'],
+				', '.join(sorted(host['groups'])), ', '.join(sorted(host['templates']))))
+		for hostname, interface, ip in self.interfaces:
+			if interface is None:
+				lines.append('create interface: %s ip: %s' % (hostname, ip))
+			else:
+				lines.append('update interface: %s ip: %s -> %s' % (hostname, interface['ip'], ip))
+		for hostname, groups in self.group_adds:
+			lines.append('add hostgroups: %s: %s' % (hostname, ', '.join(groups)))
+		for hostname, templates in self.links:
+			lines.append('link templates: %s: %s' % (hostname, ', '.join(templates)))
+		for hostname, templates in self.unlinks:
+			lines.append('unlink templates: %s: %s' % (hostname, ', '.join(templates)))
+		for hostname in self.deletes:
+			lines.append('delete host: %s' % hostname)
+		return lines
+
+
+def diff(desired, existing, prune=False, reimport=False):
+	'''Compute the plan that brings zabbix from the existing to the desired state.
+
+	Groups and templates are only added. Hosts are created, their agent
+	interface, groups and templates updated; with prune the node templates no
+	inventory needs anymore are unlinked and cleared, and the hosts in the
+	desired host groups that no inventory describes, named with one of the
+	host name prefixes of the collectors, are deleted.
+
+	Args:
+		desired    Desired    the state described by the inventories
+		existing   Existing   the state fetched from zabbix
+		prune      bool       unlink and delete what is not desired anymore
+		reimport   bool       import all the templates again, to update them
+
+	Returns:
+		a Plan
+	'''
+	plan = Plan()
+	plan.groups = [g for g in desired.groups() if g not in existing.groups]
+	plan.imports = sorted(t for t in desired.templates if reimport or t not in existing.templates)
+	for hostname in sorted(desired.hosts):
+		want = desired.hosts[hostname]
+		have = existing.hosts.get(hostname)
+		if have is None:
+			plan.creates.append(hostname)
+			continue
+		if have['interface'] is None or have['interface']['ip'] != want['ip']:
+			plan.interfaces.append((hostname, have['interface'], want['ip']))
+		groups = sorted(want['groups'] - set(have['groups']))
+		if groups:
+			plan.group_adds.append((hostname, groups))
+		templates = sorted(want['templates'] - set(have['templates']))
+		if templates:
+			plan.links.append((hostname, templates))
+		stale = sorted(t for t in have['templates'] if managedTemplate(t) and t not in want['templates'])
+		if prune and stale:
+			plan.unlinks.append((hostname, stale))
+	if prune:
+		prefixes = (inventory.standalone_prefix, inventory.repl_prefix, inventory.sharded_prefix)
+		plan.deletes = sorted(h for h in existing.hosts if h not in desired.hosts and h.startswith(prefixes))
+	return plan
+
+
+def apply(call, plan, desired, existing, chunk=default_chunk, mass_chunk=default_mass_chunk):
+	'''Make the calls of a plan as array and mass calls, reporting every failure.
+
+	Hosts are created, updated and deleted chunk at a time, and templates are
+	linked to, or host groups added to, mass_chunk hosts at a time. A failed
+	item is reported and the rest of the plan carried on with, except that the
+	hosts are not created when a host group or template they need is missing.
+
+	Args:
+		call         function   call(method, params), e.g. ZabbixAPI.call
+		plan         Plan       the plan computed by diff()
+		desired      Desired    the state described by the inventories
+		existing     Existing   the state fetched from zabbix, updated with the ids of the new groups and templates
+		chunk        int        the items of one array call
+		mass_chunk   int        the hosts of one mass call
+
+	Returns:
+		the number of failed items
+	'''
+	failures = []
+	existing.groups.update(callChunks(call, 'hostgroup.create', [(n, {'name': n}) for n in plan.groups], chunk, failures))
+	# configuration.import takes one export at a time
+	for name in plan.imports:
+		params = {'format': 'xml', 'rules': import_rules, 'source': desired.templateSource(name)}
+		callItems(call, 'configuration.import', [(name, params)], failures, lambda p: p[0])
+	if plan.imports:
+		templates = call('template.get', {'output': ['templateid', 'host'], 'filter': {'host': plan.imports}})
+		existing.templates.update((t['host'], t['templateid']) for t in templates)
+
+	creates = []
+	for hostname in plan.creates:
+		host = desired.hosts[hostname]
+		missing = [n for n in host['groups'] if n not in existing.groups] + [n for n in host['templates'] if n not in existing.templates]
+		if missing:
+			failures.append((hostname, 'missing: ' + ', '.join(sorted(missing))))
+			print('can not create host:', hostname, 'missing:', ', '.join(sorted(missing)))
+			continue
+		creates.append((hostname, {
+			'host': hostname,
+			'interfaces': [dict(agent_interface, ip=host['ip'])],
+			'groups': [{'groupid': existing.groups[n]} for n in sorted(host['groups'])],
+			'templates': [{'templateid': existing.templates[n]} for n in sorted(host['templates'])]
+		}))
+	callChunks(call, 'host.create', creates, chunk, failures)
+
+	interface_creates = [(h, dict(agent_interface, hostid=existing.hosts[h]['hostid'], ip=ip)) for h, interface, ip in plan.interfaces if interface is None]
+	interface_updates = [(h, {'interfaceid': interface['interfaceid'], 'ip': ip}) for h, interface, ip in plan.interfaces if interface is not None]
+	callChunks(call, 'hostinterface.create', interface_creates, chunk, failures)
+	callChunks(call, 'hostinterface.update', interface_updates, chunk, failures)
+
+	for name, hostnames in sorted(byTarget(plan.group_adds).items()):
+		if name not in existing.groups:
+			continue
+		group = {'groupid': existing.groups[name]}
+		callChunks(call, 'host.massadd', [(h, {'hostid': existing.hosts[h]['hostid']}) for h in hostnames], mass_chunk, failures,
+			lambda hosts: {'hosts': hosts, 'groups': [group]})
+	for name, hostnames in sorted(byTarget(plan.links).items()):
+		if name not in existing.templates:
+			continue
+		template = {'templateid': existing.templates[name]}
+		callChunks(call, 'template.massadd', [(h, {'hostid': existing.hosts[h]['hostid']}) for h in hostnames], mass_chunk, failures,
+			lambda hosts: {'templates': [template], 'hosts': hosts})
+	for name, hostnames in sorted(byTarget(plan.unlinks).items()):
+		templateid = existing.hosts[hostnames[0]]['templates'][name]
+		callChunks(call, 'host.massremove', [(h, existing.hosts[h]['hostid']) for h in hostnames], mass_chunk, failures,
+			lambda hostids: {'hostids': hostids, 'templateids_clear': [templateid]})
+	callChunks(call, 'host.delete', [(h, existing.hosts[h]['hostid']) for h in plan.deletes], chunk, failures)
+	return len(failures)
+
+
+def reconcile(call, desired, prune=False, reimport=False, dry_run=False, chunk=default_chunk, mass_chunk=default_mass_chunk):
+	'''Fetch the existing state, print the plan to reach the desired one and, unless dry_run, apply it.
+
+	Returns:
+		(the Plan, the number of failed items)
+	'''
+	start = time.time()
+	existing = Existing()
+	existing.fetch(call, desired)
+	plan = diff(desired, existing, prune, reimport)
+	print('desired: %d hosts, %d hostgroups, %d templates; existing: %d hosts; fetched in %d calls, %.3f seconds' %
+		(len(desired.hosts), len(desired.groups()), len(desired.templates), len(existing.hosts), existing.calls, time.time() - start))
+	for line in plan.describe(desired):
+		print(('would ' if dry_run else '') + line)
+	if plan.size() == 0:
+		print('nothing to do')
+		return plan, 0
+	if dry_run:
+		print('%d changes planned, none made (dry run)' % plan.size())
+		return plan, 0
+	start = time.time()
+	failed = apply(call, plan, desired, existing, chunk, mass_chunk)
+	print('%d changes applied, %d failed, %.3f seconds' % (plan.size(), failed, time.time() - start))
+	return plan, failed
@@ -0,0 +1,188 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: rates.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 16:10
+'
+'''
+
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+
+# the state file: magic, record count, then per record the key length, the key
+# ('<host>\0<item key>') and the last sample (clock, value, uptime)
+state_magic = b'MZR1'
+state_header = struct.Struct('<4sI')
+record_header = struct.Struct('<H')
+record_body = struct.Struct('<dqd')
+
+# samples older than this are dropped when the state is saved
+max_sample_age = 86400
+
+
+class RateState(object):
+	'''The previous sample of every cumulative counter, used to turn totals into per-second rates.
+
+	Samples are kept per (host, item key). A counter reset, i.e. a restart of
+	the mongod or mongos seen as a smaller uptime or a smaller counter, yields no
+	rate for that poll; the next poll computes it from the new baseline.
+	'''
+
+	def __init__(self):
+		# (host, key) -> (clock, value, uptime)
+		self.samples = {}
+		self.lock = threading.Lock()
+
+	def rate(self, host, key, clock, value, uptime):
+		'''Record a sample and return the per-second rate since the previous one.
+
+		Args:
+			host    string   the host name in zabbix
+			key     string   the item key
+			clock   float    the time the sample was taken
+			value   int      the counter value
+			uptime  float    the uptime of the mongod or mongos when sampled
+
+		Returns:
+			the rate as a float, or None for the first sample or after a reset
+		'''
+		value = int(value)
+		uptime = float(uptime)
+		with self.lock:
+			previous = self.samples.get((host, key))
+			self.samples[(host, key)] = (clock, value, uptime)
+		if previous is None:
+			return None
+		last_clock, last_value, last_uptime = previous
+		if uptime < last_uptime or value < last_value or clock <= last_clock:
+			return None
+		return (value - last_value) / (clock - last_clock)
+
+	def rates(self, host, counters, status, clock):
+		'''Compute the rates of a node's counters.
+
+		Args:
+			host      string   the host name in zabbix
+			counters  list     (path, item key, convert) tuples of the counters
+			status    dict     dotted path -> value, must hold 'uptime'
+			clock     float    the time status was sampled
+
+		Returns:
+			a list of (item key, value string)
+		'''
+		uptime = status.get('uptime')
+		if uptime is None:
+			return []
+		items = []
+		for path, key, convert in counters:
+			if path in status:
+				value = self.rate(host, key, clock, status[path], uptime)
+				if value is not None:
+					items.append((key, convert(value)))
+		return items
+
+	def load(self, path):
+		'''Load the samples saved in the state file, if it exists.'''
+		try:
+			with open(path, 'rb') as f:
+				fcntl.flock(f, fcntl.LOCK_SH)
+				samples = readState(f)
+		except (IOError, OSError, ValueError, struct.error):
+			return
+		with self.lock:
+			for k, v in samples.items():
+				self.samples.setdefault(k, v)
+
+	def save(self, path, now):
+		'''Merge the samples into the state file.
+
+		Other collectors may share the file, so it is locked, re-read and merged
+		with the newer of each sample before it is replaced.
+
+		Args:
+			path   string   the path of the state file
+			now    float    the current time, samples older than max_sample_age are dropped
+		'''
+		with self.lock:
+			samples = dict(self.samples)
+		with open(path + '.lock', 'a') as lock_file:
+			fcntl.flock(lock_file, fcntl.LOCK_EX)
+			try:
+				with open(path, 'rb') as f:
+					for k, v in readState(f).items():
+						if k not in samples or samples[k][0] < v[0]:
+							samples[k] = v
+			except (IOError, OSError, ValueError, struct.error):
+				pass
+			samples = dict((k, v) for k, v in samples.items() if now - v[0] < max_sample_age)
+			tmp = path + '.tmp'
+			with open(tmp, 'wb') as f:
+				writeState(f, samples)
+			os.rename(tmp, path)
+
+
+def readState(f):
+	'''Read the samples of a state file through a memory map.'''
+	size = os.fstat(f.fileno()).st_size
+	if size == 0:
+		return {}
+	samples = {}
+	with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as data:
+		magic, count = state_header.unpack_from(data, 0)
+		if magic != state_magic:
+			raise ValueError('not a rate state file')
+		offset = state_header.size
+		for i in range(count):
+			length = record_header.unpack_from(data, offset)[0]
+			offset += record_header.size
+			host, key = data[offset:offset + length].decode('utf-8').split('\0', 1)
+			offset += length
+			samples[(host, key)] = record_body.unpack_from(data, offset)
+			offset += record_body.size
+	return samples
+
+
+def writeState(f, samples):
+	'''Write the samples in the state file format.'''
+	chunks = [state_header.pack(state_magic, len(samples))]
+	for (host, key), (clock, value, uptime) in samples.items():
+		name = (host + '\0' + key).encode('utf-8')
+		chunks.append(record_header.pack(len(name)))
+		chunks.append(name)
+		chunks.append(record_body.pack(clock, value, uptime))
+	f.write(b''.join(chunks))
+
+
+def defaultStatePath(script):
+	'''Return the default state file of a collector script, e.g. /tmp/mongodb_sh_auth.rates.'''
+	name = os.path.splitext(os.path.basename(script))[0]
+	return os.path.join(tempfile.gettempdir(), name + '.rates')
+
+
+# the rate state shared by all the nodes polled by this process
+state = RateState()
+state_path = ''
+
+
+def openState(path):
+	'''Use the given state file, so that rates survive between crontab runs.'''
+	global state_path
+	state_path = path
+	state.load(path)
+
+
+def saveState():
+	'''Save the shared state to its file, if one was opened.'''
+	if state_path:
+		try:
+			state.save(state_path, time.time())
+		except (IOError, OSError) as e:
+			print('failed to save the rate state', state_path, e)
@@ -0,0 +1,246 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: replset.py
+'@author: liyunting
+'@version: 4
+'@lastModify: 2026-10-18 12:19
+'
+'''
+
+import socket
+import threading
+import time
+
+from pymongo.errors import ConnectionFailure
+from pymongo.errors import OperationFailure
+
+from mongodb_zabbix import breaker
+from mongodb_zabbix import connection
+from mongodb_zabbix.collector import process_arbiter
+from mongodb_zabbix.sender import clockNow
+
+
+# the member state of replSetGetStatus that marks the primary
+primary_state = 1
+
+# replica set name -> 'ip:port' of the primary seen last, asked first on the next poll
+primaries = {}
+primaries_lock = threading.Lock()
+
+# the seconds the addresses a member's host name resolves to are reused
+resolve_ttl = 3600
+
+# host name -> (the set of its addresses, when resolved)
+resolved = {}
+resolved_lock = threading.Lock()
+
+
+def memberName(member):
+	'''Return the 'ip:port' name of an inventory member, as found in replSetGetStatus.'''
+	return member['ip'] + ':' + str(member['port'])
+
+
+def candidates(set_name, members):
+	'''Order the members to ask for the status: the last known primary first, then
+	the other data bearing members. Arbiters hold no users, so they are not asked.'''
+	with primaries_lock:
+		primary = primaries.get(set_name)
+	ordered = [m for m in members if m['role'] != 'arbiter']
+	ordered.sort(key=lambda m: memberName(m) != primary)
+	return ordered
+
+
+def getReplSetStatus(set_name, members, user='', pwd=''):
+	'''Run replSetGetStatus on the first member that answers, skipping the ones whose breaker is open.
+
+	Args:
+		set_name  string   the name of the replica set
+		members   list     the members of the inventory, {'ip', 'port', 'role'}
+		user      string   the user of mongodb, '' if authentication is not needed
+		pwd       string   the password of mongodb
+
+	Returns:
+		reply     dict   the replSetGetStatus reply, or None if no member answered
+		clock     int    when the reply was sampled, in nanoseconds: the middle of the round trip
+		answered  dict   the inventory member that answered, None if none did
+	'''
+	for m in candidates(set_name, members):
+		if not breaker.state.allow(m['ip'], m['port']):
+			continue
+		start = clockNow()
+		try:
+			client = connection.get_client(m['ip'], m['port'], user, pwd)
+			reply = client.admin.command('replSetGetStatus')
+		except ConnectionFailure:
+			breaker.state.failure(m['ip'], m['port'])
+			connection.discard(m['ip'], m['port'], user)
+			continue
+		except OperationFailure:
+			connection.discard(m['ip'], m['port'], user)
+			continue
+		breaker.state.success(m['ip'], m['port'])
+		for member in reply.get('members', []):
+			if member.get('state') == primary_state:
+				with primaries_lock:
+					primaries[set_name] = member['name']
+		return reply, (start + clockNow()) // 2, m
+	return None, clockNow(), None
+
+
+def memberStatus(reply):
+	'''Derive the health, state, lag and heartbeat latency of every member.
+
+	The lag is how far the optime of a member is behind the primary's, or behind
+	the newest optime while there is no primary. The member that answered has no
+	heartbeat to itself, so it has no ping.
+
+	Args:
+		reply   dict   the replSetGetStatus reply
+
+	Returns:
+		a dict: 'host:port' -> {'health', 'state', 'lag', 'ping'}, with lag left
+		out for arbiters and unhealthy members and ping left out for the answering one
+	'''
+	members = reply.get('members', [])
+	optimes = [m['optimeDate'] for m in members
+		if m.get('health') and m.get('optimeDate') is not None]
+	primary = [m['optimeDate'] for m in members
+		if m.get('state') == primary_state and m.get('optimeDate') is not None]
+	newest = primary[0] if primary else (max(optimes) if optimes else None)
+	status = {}
+	for m in members:
+		values = {
+			'health': int(m.get('health', 0)),
+			'state': int(m.get('state', 0))
+		}
+		if newest is not None and m.get('health') and m.get('optimeDate') is not None:
+			values['lag'] = max(0.0, (newest - m['optimeDate']).total_seconds())
+		if 'pingMs' in m:
+			values['ping'] = int(m['pingMs'])
+		status[m['name']] = values
+	return status
+
+
+def resolve(host):
+	'''Return the set of the addresses of a host name, empty if it can not be resolved.'''
+	now = time.time()
+	with resolved_lock:
+		entry = resolved.get(host)
+	if entry is not None and now - entry[1] < resolve_ttl:
+		return entry[0]
+	try:
+		addresses = set(info[4][0] for info in socket.getaddrinfo(host, None, 0, socket.SOCK_STREAM))
+	except (socket.error, UnicodeError):
+		addresses = set()
+	with resolved_lock:
+		resolved[host] = (addresses, now)
+	return addresses
+
+
+def matchMembers(reply, members, answered):
+	'''Find the member of replSetGetStatus of every inventory member.
+
+	A member is matched by its 'ip:port' name, else, for the member that
+	answered, by the self flag of the reply, else by resolving the host name
+	the set is configured with, so that sets configured by host names match
+	the ips of the inventory.
+
+	Args:
+		reply     dict   the replSetGetStatus reply
+		members   list   the members of the inventory, {'ip', 'port', 'role'}
+		answered  dict   the inventory member that answered
+
+	Returns:
+		a dict: the 'ip:port' name of an inventory member -> the name of its
+		member in the reply, for the members that were found
+	'''
+	names = [m['name'] for m in reply.get('members', [])]
+	found = dict((memberName(m), memberName(m)) for m in members if memberName(m) in names)
+	missing = [m for m in members if memberName(m) not in found]
+	if not missing:
+		return found
+	taken = set(found.values())
+	if answered is not None and memberName(answered) not in found:
+		for m in reply.get('members', []):
+			if m.get('self') and m['name'] not in taken:
+				found[memberName(answered)] = m['name']
+				taken.add(m['name'])
+				break
+	for name in names:
+		if name in taken or ':' not in name:
+			continue
+		host, port = name.rsplit(':', 1)
+		for m in missing:
+			if memberName(m) not in found and str(m['port']) == port and m['ip'] in resolve(host.strip('[]')):
+				found[memberName(m)] = name
+				taken.add(name)
+				break
+	return found
+
+
+def memberDefaults(members, hostname_first, prefix):
+	'''List the items process_replset() sends for every member, with the value json mode sends when it has none.
+
+	A member's lag or ping can be left out of replSetGetStatus and no member is
+	reported at all when no member answers; the document of the member then
+	takes 0 for them, and an arbiter's alive is 0.
+
+	Args:
+		members         list     the members of the inventory, {'ip', 'port', 'role'}
+		hostname_first  string   the prefix of the host names in zabbix
+		prefix          string   the item key prefix, e.g. 'mongo'
+
+	Returns:
+		a list of (hostname, [(item key, value)]), see ZabbixBatch.expect()
+	'''
+	defaults = []
+	for m in members:
+		if m['role'] == 'arbiter':
+			names = ('alive', 'repl.health', 'repl.state', 'repl.ping')
+		else:
+			names = ('repl.health', 'repl.state', 'repl.ping', 'repl.lag')
+		defaults.append((hostname_first + m['ip'], [(prefix + '.' + name, '0') for name in names]))
+	return defaults
+
+
+def process_replset(set_name, members, batch, hostname_first, prefix, user='', pwd=''):
+	'''Get the replication status of all the members from one replSetGetStatus and send them to zabbix server.
+
+	This replaces a connection to every member for its liveness: the arbiter's
+	alive item is taken from the set's view of it, and it is only probed directly
+	when no member of the set answers or it is not found in the reply.
+
+	Args:
+		set_name        string       the name of the replica set
+		members         list         the members of the inventory, {'ip', 'port', 'role'}
+		batch           ZabbixBatch  the batch that collects the values to be sent
+		hostname_first  string       the prefix of the host names in zabbix
+		prefix          string       the item key prefix, e.g. 'mongo'
+		user            string       the user of mongodb, '' if authentication is not needed
+		pwd             string       the password of mongodb
+	'''
+	reply, clock, answered = getReplSetStatus(set_name, members, user, pwd)
+	if reply is None:
+		print('Cound not get the replica set status', set_name)
+		for m in members:
+			if m['role'] == 'arbiter':
+				process_arbiter(m['ip'], m['port'], batch, hostname_first + m['ip'], prefix)
+		return
+	status = memberStatus(reply)
+	found = matchMembers(reply, members, answered)
+	for m in members:
+		hostname = hostname_first + m['ip']
+		values = status.get(found.get(memberName(m)))
+		if values is None:
+			print('Member not found in the replica set status', memberName(m))
+			if m['role'] == 'arbiter':
+				process_arbiter(m['ip'], m['port'], batch, hostname, prefix)
+			continue
+		if m['role'] == 'arbiter':
+			batch.add(hostname, prefix + '.alive', str(values['health']), clock)
+		for name in ('health', 'state', 'ping'):
+			if name in values:
+				batch.add(hostname, prefix + '.repl.' + name, str(values[name]), clock)
+		if 'lag' in values:
+			batch.add(hostname, prefix + '.repl.lag', '%.4f' % values['lag'], clock)
@@ -0,0 +1,127 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: scheduler.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 12:12
+'
+'''
+
+import fcntl
+import hashlib
+import os
+import signal
+import sys
+import tempfile
+import time
+import traceback
+
+from mongodb_zabbix import connection
+from mongodb_zabbix import pool
+
+
+# set by SIGTERM/SIGINT to leave the loop after the current cycle
+stopping = []
+
+
+def stop(signum, frame):
+	stopping.append(signum)
+
+
+def lockPath(argv):
+	'''Return the lock file of a collector invocation, e.g. /tmp/mongodb_sh_auth.1a2b3c4d.lock.
+
+	The same script with the same arguments polls the same targets, so it gets
+	the same lock file, while collectors of other inventories do not conflict.
+	'''
+	name = os.path.splitext(os.path.basename(argv[0]))[0]
+	digest = hashlib.md5('\0'.join(argv[1:]).encode('utf-8')).hexdigest()[:8]
+	return os.path.join(tempfile.gettempdir(), '%s.%s.lock' % (name, digest))
+
+
+def lock(argv):
+	'''Take the lock of a collector invocation without waiting.
+
+	Returns:
+		the open lock file, held until it is closed or the process exits, or None
+		if another process still holds it
+	'''
+	f = open(lockPath(argv), 'a')
+	try:
+		fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+	except (IOError, OSError):
+		f.close()
+		return None
+	return f
+
+
+def leave(status=0):
+	'''Stop the worker pools and close the clients before the process exits.
+
+	The interpreter joins the threads of the worker pools at exit, so while
+	polls hung past the deadline are still running the process exits at once
+	instead, with the given status.
+	'''
+	hung = pool.shutdown()
+	connection.close_all()
+	if hung:
+		print('exiting without waiting for', hung, 'polls still running')
+		sys.stdout.flush()
+		sys.stderr.flush()
+		os._exit(status)
+
+
+def run(cycle, interval, *args):
+	'''Run a collection cycle once, or periodically as a daemon.
+
+	With interval 0 the cycle runs once, which is what the crontab invocation
+	expects. Otherwise cycles start every interval seconds on a fixed schedule
+	until the process receives SIGTERM or SIGINT. A cycle that overruns its slot
+	skips the missed ticks instead of starting the next cycles back to back.
+	The MongoClient objects cached by the connection module live as long as the
+	process, so the daemon connects and authenticates only once per node.
+	Only one process runs per script and arguments: when the previous crontab
+	run is still polling, this one leaves without polling the same nodes again.
+
+	Args:
+		cycle     function   the collection cycle
+		interval  float      the seconds between two cycles, 0 to run once
+		args      list       the arguments passed to cycle
+	'''
+	# kept open, and so locked, until run() returns
+	held = lock(sys.argv)
+	if held is None:
+		print('A previous cycle is still running, skipped:', lockPath(sys.argv))
+		return
+
+	if interval <= 0:
+		try:
+			cycle(*args)
+		except Exception:
+			traceback.print_exc()
+			leave(1)
+			sys.exit(1)
+		leave()
+		return
+
+	signal.signal(signal.SIGTERM, stop)
+	signal.signal(signal.SIGINT, stop)
+	next_time = time.time()
+	try:
+		while not stopping:
+			try:
+				cycle(*args)
+			except Exception:
+				# a broken cycle must not kill the daemon
+				traceback.print_exc()
+			next_time += interval
+			now = time.time()
+			if next_time < now:
+				next_time += ((now - next_time) // interval + 1) * interval
+			remaining = next_time - time.time()
+			while not stopping and remaining > 0:
+				time.sleep(min(1.0, remaining))
+				remaining = next_time - time.time()
+	finally:
+		leave()
@@ -0,0 +1,374 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: sender.py
+'@author: liyunting
+'@version: 11
+'@lastModify: 2026-10-18 12:20
+'
+'''
+
+import json
+import re
+import socket
+import struct
+import threading
+import time
+from collections import OrderedDict
+
+from mongodb_zabbix import instrument
+
+
+# the header of every zabbix sender protocol packet: 'ZBXD', flags 0x01, little-endian data length
+zbx_header = b'ZBXD\x01'
+zbx_header_size = len(zbx_header) + 8
+
+# the current time in nanoseconds, time.time_ns() is only there from python 3.7 on
+time_ns = getattr(time, 'time_ns', lambda: int(time.time() * 1000000000))
+
+# the info string that zabbix server replies with for every request
+info_pattern = re.compile(r'processed:\s*(\d+);\s*failed:\s*(\d+);\s*total:\s*(\d+);\s*seconds spent:\s*([\d.]+)')
+
+# the key suffix of the master item that receives all the values of a node in json mode, see templates.py
+json_suffix = '.json'
+
+# the key suffix of the low-level discovery rules, their data is never packed
+discovery_suffix = '.discovery'
+
+# the values written as JSON numbers, the others are written as strings
+number_pattern = re.compile(r'-?\d+(\.\d+)?$')
+
+
+class SendResult(object):
+	'''The structured reply of zabbix server to one or several sender requests.
+
+	Attributes:
+		processed     int     the number of values accepted by zabbix server
+		failed        int     the number of values rejected or never delivered
+		total         int     the number of values that were sent
+		seconds_spent float   the time spent by zabbix server processing the values
+		latency       float   the wall time spent on sending, in seconds
+		delivered     bool    False if zabbix server could not be reached for some of the values
+		undelivered   list    the (host, key, value, clock) tuples that did not reach zabbix server
+	'''
+
+	def __init__(self, processed=0, failed=0, total=0, seconds_spent=0.0, latency=0.0, delivered=True):
+		self.processed = processed
+		self.failed = failed
+		self.total = total
+		self.seconds_spent = seconds_spent
+		self.latency = latency
+		self.delivered = delivered
+		self.undelivered = []
+
+	def merge(self, other):
+		'''Add the counters of another result to this one.'''
+		self.processed += other.processed
+		self.failed += other.failed
+		self.total += other.total
+		self.seconds_spent += other.seconds_spent
+		self.latency += other.latency
+		self.delivered = self.delivered and other.delivered
+		self.undelivered.extend(other.undelivered)
+
+	def __str__(self):
+		return 'processed: %d; failed: %d; total: %d; seconds spent: %.6f; latency: %.6f' % (
+			self.processed, self.failed, self.total, self.seconds_spent, self.latency)
+
+
+def parseInfo(info, total):
+	'''Parse the info string in the reply of zabbix server.
+
+	Args:
+		info    string   e.g. 'processed: 14; failed: 0; total: 14; seconds spent: 0.000305'
+		total   int      the number of values in the request
+
+	Returns:
+		a SendResult, whose values are all counted as failed if the info can not be parsed
+	'''
+	m = info_pattern.search(info or '')
+	if m is None:
+		return SendResult(0, total, total)
+	return SendResult(int(m.group(1)), int(m.group(2)), int(m.group(3)), float(m.group(4)))
+
+
+def clockNow():
+	'''Return the current time as integer nanoseconds since the epoch, the clock of every value.'''
+	return time_ns()
+
+
+def itemData(host, key, value, clock):
+	'''Build the sender protocol entry of a value, stamped with the time it was collected.
+
+	Args:
+		host    string   the hostname in zabbix
+		key     string   the key of the item
+		value   string   the value
+		clock   int      the time the value was collected, in nanoseconds since the epoch
+	'''
+	seconds, ns = divmod(int(clock), 1000000000)
+	return {'host': host, 'key': key, 'value': value, 'clock': seconds, 'ns': ns}
+
+
+def jsonValue(value):
+	'''Write a value as JSON, unquoted if it is a number.'''
+	if number_pattern.match(value):
+		return value
+	return json.dumps(value)
+
+
+def packJson(items, skip=(), defaults=()):
+	'''Pack the values of every host and key prefix into one JSON document.
+
+	The values of 'mongo.conn.current' and 'mongo.alive' of a host become the
+	fields 'conn.current' and 'alive' of one value of its 'mongo.json' item, from
+	which the dependent items of the json templates extract them. The document
+	is stamped with the clock of its first value. A value of a field the
+	document already has is a later sample, e.g. a node that finished after the
+	deadline of the previous cycle and was polled again, so it starts another
+	document of the host and prefix, with its own clock, instead of replacing
+	the earlier value. The data of the low-level discovery rules,
+	'<prefix>.discovery', is left as it is. The spool keeps packed values, so
+	replayed values are never packed again.
+
+	A dependent item whose field is missing from the document turns not
+	supported, as the JSONPath step of zabbix 4.0 can not fall back on a value,
+	so the fields of a document that got no value take theirs from defaults.
+	Defaults alone add no document.
+
+	Args:
+		items     list    (host, key, value, clock) tuples
+		skip      tuple   the key prefixes to be sent as they are, e.g. ('collector.',)
+		defaults  list    (host, [(key, value)]) of the values of the fields that got none
+
+	Returns:
+		the packed (host, key, value, clock) tuples, in the order their first value was added
+	'''
+	# (host, prefix) -> its documents, the last one taking the new values
+	groups = {}
+	# every (host, key, fields, clock) document in the order it was started
+	documents = []
+	packed = []
+	for host, key, value, clock in items:
+		prefix, dot, field = key.partition('.')
+		if not dot or key.startswith(skip) or key.endswith(discovery_suffix):
+			packed.append((host, key, value, clock))
+			continue
+		group = groups.get((host, prefix))
+		if group is None:
+			group = groups[(host, prefix)] = []
+		if not group or field in group[-1][2]:
+			group.append((host, prefix + json_suffix, OrderedDict(), clock))
+			documents.append(group[-1])
+		group[-1][2][field] = value
+	for host, pairs in defaults:
+		for key, value in pairs:
+			prefix, dot, field = key.partition('.')
+			for document in groups.get((host, prefix), ()):
+				document[2].setdefault(field, value)
+	for host, key, fields, clock in documents:
+		value = '{' + ','.join(json.dumps(k) + ':' + jsonValue(v) for k, v in fields.items()) + '}'
+		packed.append((host, key, value, clock))
+	return packed
+
+
+def requestData(data):
+	'''Build a sender request. Its own clock lets zabbix server correct the value
+	clocks for the difference between the collector's clock and its own.'''
+	seconds, ns = divmod(clockNow(), 1000000000)
+	return {'request': 'sender data', 'data': data, 'clock': seconds, 'ns': ns}
+
+
+def pack(payload):
+	'''Pack a dict into a zabbix sender protocol packet.'''
+	data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+	return zbx_header + struct.pack('<Q', len(data)) + data
+
+
+def recv_exact(sock, size):
+	'''Read exactly size bytes from the socket.'''
+	chunks = []
+	while size > 0:
+		chunk = sock.recv(size)
+		if not chunk:
+			raise socket.error('connection closed by zabbix server')
+		chunks.append(chunk)
+		size -= len(chunk)
+	return b''.join(chunks)
+
+
+def unpack(sock):
+	'''Read a zabbix sender protocol packet from the socket and return the decoded dict.'''
+	header = recv_exact(sock, zbx_header_size)
+	if header[:4] != b'ZBXD':
+		raise socket.error('invalid reply header from zabbix server')
+	length = struct.unpack('<Q', header[5:])[0]
+	return json.loads(recv_exact(sock, length).decode('utf-8'))
+
+
+class ZabbixSender(object):
+	'''A client of the zabbix trapper that speaks the sender protocol in process.
+
+	It replaces forking the zabbix_sender binary: values are sent as JSON over a
+	TCP connection to the trapper port, 'chunk_size' values per request, the same
+	as zabbix_sender does.
+	'''
+
+	def __init__(self, zabbix_server, port=10051, timeout=10, chunk_size=250):
+		'''
+		Args:
+			zabbix_server string   the ip of zabbix server, optionally followed by ':port'
+			port          int      the trapper port of zabbix server, default: 10051
+			timeout       float    the socket timeout in seconds
+			chunk_size    int      the maximum number of values in one request
+		'''
+		if ':' in zabbix_server:
+			zabbix_server, port = zabbix_server.rsplit(':', 1)
+		self.zabbix_server = zabbix_server
+		self.port = int(port)
+		self.timeout = timeout
+		self.chunk_size = chunk_size
+
+	def send_chunk(self, data):
+		'''Send one request holding the given values.
+
+		Args:
+			data   list   the values as built by itemData()
+
+		Returns:
+			a SendResult, not delivered if zabbix server could not be reached
+		'''
+		start = time.time()
+		try:
+			sock = socket.create_connection((self.zabbix_server, self.port), self.timeout)
+			try:
+				sock.sendall(pack(requestData(data)))
+				reply = unpack(sock)
+			finally:
+				sock.close()
+		except (socket.error, ValueError) as e:
+			print('failed to send to zabbix server', self.zabbix_server, str(self.port), e)
+			result = SendResult(0, len(data), len(data), delivered=False)
+		else:
+			if reply.get('response') == 'success':
+				result = parseInfo(reply.get('info'), len(data))
+			else:
+				print('zabbix server refused the data:', reply.get('info'))
+				result = SendResult(0, len(data), len(data))
+		result.latency = time.time() - start
+		return result
+
+	def send(self, items):
+		'''Send values to zabbix server.
+
+		Args:
+			items   list   (host, key, value, clock) tuples
+
+		Once a request does not reach zabbix server, the following ones are
+		not tried: each would wait for the timeout too.
+
+		Returns:
+			a SendResult summing up all the requests, with the values of the
+			request that did not reach zabbix server and of all the following
+			ones in undelivered
+		'''
+		result = SendResult()
+		for i in range(0, len(items), self.chunk_size):
+			chunk = items[i:i + self.chunk_size]
+			chunk_result = self.send_chunk([itemData(*item) for item in chunk])
+			if not chunk_result.delivered:
+				rest = items[i + len(chunk):]
+				chunk_result.merge(SendResult(0, len(rest), len(rest), delivered=False))
+				chunk_result.undelivered = items[i:]
+				result.merge(chunk_result)
+				break
+			result.merge(chunk_result)
+		return result
+
+
+class ZabbixBatch(object):
+	'''Collect the values of a whole cycle and send them in as few requests as possible.
+
+	Values are added by add() as (host, key, value, clock) and are shipped by
+	send() through a ZabbixSender. With a spool, the values that can not reach
+	zabbix server are kept on disk and replayed once it accepts data again. In
+	json mode, the values of every node are packed into one JSON value of its
+	'<prefix>.json' master item, see packJson().
+	'''
+
+	def __init__(self, zabbix_server, spool=None, json_mode=False):
+		'''
+		Args:
+			zabbix_server string   the ip of zabbix server, optionally followed by ':port'
+			spool         Spool    where the undelivered values are kept, None to drop them
+			json_mode     bool     send one JSON value per node instead of one value per item
+		'''
+		self.sender = ZabbixSender(zabbix_server)
+		self.spool = spool
+		self.json_mode = json_mode
+		self.items = []
+		# (host, [(key, value)]) of the values the nodes' documents default to in json mode
+		self.defaults = []
+		# nodes polled in parallel add values from several threads
+		self.lock = threading.Lock()
+
+	def add(self, zabbix_host, item_key, item_value, clock=None):
+		'''Add a value to the batch.
+
+		Args:
+			zabbix_host   string   the hostname in zabbix
+			item_key      string   the key of a certain zabbix item
+			item_value    string   the value to be send to zabbix server
+			clock         int      the time the value was sampled in nanoseconds, default: now
+		'''
+		if clock is None:
+			clock = clockNow()
+		with self.lock:
+			self.items.append((zabbix_host, item_key, item_value, clock))
+
+	def expect(self, zabbix_host, defaults):
+		'''Give the values sent in json mode for the items of a host that get none in this batch.
+
+		Args:
+			zabbix_host   string   the hostname in zabbix
+			defaults      list     (item key, value) of the items the templates of the host read
+		'''
+		if not self.json_mode:
+			return
+		with self.lock:
+			self.defaults.append((zabbix_host, defaults))
+
+	def __len__(self):
+		return len(self.items)
+
+	def send(self, deadline=None):
+		'''Send all the values in the batch and empty it.
+
+		The undelivered values go to the spool. When everything was delivered,
+		the spooled values are replayed after the new ones, until the deadline.
+		The replay is timed as 'replay', apart from 'send'.
+
+		Args:
+			deadline   float   the time.time() by which the replay must stop, None for no limit
+
+		Returns:
+			a SendResult, including the replayed values
+		'''
+		with self.lock:
+			items = self.items
+			self.items = []
+			defaults = self.defaults
+			self.defaults = []
+		if self.json_mode:
+			# the collector's own items are linked to Template MongoDB Collector, which has no master item
+			items = packJson(items, (instrument.key_prefix,), defaults)
+		with instrument.timer('send'):
+			result = self.sender.send(items)
+			if self.spool is not None and not result.delivered:
+				self.spool.append(result.undelivered, self.sender.chunk_size)
+		if self.spool is not None and result.delivered:
+			with instrument.timer('replay'):
+				result.merge(self.spool.replay(self.sender, deadline))
+		instrument.count('items.sent', result.processed)
+		instrument.count('items.failed', result.failed)
+		return result
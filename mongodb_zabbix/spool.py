@@ -0,0 +1,184 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: spool.py
+'@author: liyunting
+'@version: 2
+'@lastModify: 2026-10-18 12:10
+'
+'''
+
+import fcntl
+import json
+import os
+import tempfile
+import time
+
+from mongodb_zabbix.sender import SendResult
+from mongodb_zabbix.sender import itemData
+
+
+# the suffix of the segment files and of the file holding how far a segment was replayed
+segment_suffix = '.spool'
+position_suffix = '.pos'
+
+
+class Spool(object):
+	'''An append-only, size-capped directory of the values zabbix server did not receive.
+
+	Every undelivered request is appended as one JSON line of [host, key, value,
+	clock] to the newest segment file, so the values keep the time they were
+	collected. When the segments exceed max_bytes, the oldest ones are dropped.
+	Once zabbix server accepts data again the segments are replayed oldest first,
+	one request per line, at most max_rate values per second and max_replay
+	values per cycle, so a long outage does not swamp the trapper afterwards.
+	A replay also stops at the deadline it is given, the end of the cycle, and
+	goes on with the next cycle.
+	'''
+
+	def __init__(self, path, max_bytes=64 * 1024 * 1024, segment_bytes=1024 * 1024, max_rate=2000, max_replay=10000):
+		'''
+		Args:
+			path           string   the spool directory, created if needed
+			max_bytes      int      the maximum size of all the segments
+			segment_bytes  int      the size after which a new segment is started
+			max_rate       float    the maximum number of values replayed per second
+			max_replay     int      the maximum number of values replayed per cycle
+		'''
+		self.path = path
+		self.max_bytes = max_bytes
+		self.segment_bytes = segment_bytes
+		self.max_rate = max_rate
+		self.max_replay = max_replay
+		self.spooled = 0
+		self.replayed = 0
+		self.dropped = 0
+		if not os.path.isdir(path):
+			os.makedirs(path)
+
+	def segments(self):
+		'''Return the segment files, the oldest first.'''
+		names = sorted(n for n in os.listdir(self.path) if n.endswith(segment_suffix))
+		return [os.path.join(self.path, n) for n in names]
+
+	def lock(self):
+		'''Open and lock the lock file of the spool, other collectors may share the directory.'''
+		f = open(os.path.join(self.path, 'lock'), 'a')
+		fcntl.flock(f, fcntl.LOCK_EX)
+		return f
+
+	def append(self, items, chunk_size):
+		'''Append undelivered values.
+
+		Args:
+			items       list   (host, key, value, clock) tuples
+			chunk_size  int    the number of values written per line, i.e. per replayed request
+		'''
+		if not items:
+			return
+		lines = []
+		for i in range(0, len(items), chunk_size):
+			chunk = [list(item) for item in items[i:i + chunk_size]]
+			lines.append(json.dumps(chunk, separators=(',', ':')) + '\n')
+		data = ''.join(lines).encode('utf-8')
+		with self.lock():
+			segments = self.segments()
+			if segments and os.path.getsize(segments[-1]) < self.segment_bytes:
+				segment = segments[-1]
+			else:
+				segment = os.path.join(self.path, '%020d%s' % (int(time.time() * 1000000), segment_suffix))
+				segments.append(segment)
+			with open(segment, 'ab') as f:
+				f.write(data)
+			self.spooled += len(items)
+			self.trim(segments)
+
+	def trim(self, segments):
+		'''Drop the oldest segments while the spool is above max_bytes. Must be called with the lock held.'''
+		sizes = [os.path.getsize(s) for s in segments]
+		total = sum(sizes)
+		while len(segments) > 1 and total > self.max_bytes:
+			segment = segments.pop(0)
+			total -= sizes.pop(0)
+			with open(segment, 'rb') as f:
+				self.dropped += sum(len(json.loads(line)) for line in f if line.strip())
+			self.remove(segment)
+			print('spool is full, dropped', segment)
+
+	def remove(self, segment):
+		os.remove(segment)
+		if os.path.exists(segment + position_suffix):
+			os.remove(segment + position_suffix)
+
+	def replay(self, sender, deadline=None):
+		'''Send the spooled values again, oldest first, until the spool is empty,
+		max_replay values were sent, the deadline is reached or zabbix server can
+		not be reached.
+
+		Args:
+			sender     ZabbixSender   the sender of the collector
+			deadline   float          the time.time() by which the replay must stop, None for no limit
+
+		Returns:
+			a SendResult of the replayed values
+		'''
+		result = SendResult()
+		start = time.time()
+		sent = 0
+		with self.lock():
+			for segment in self.segments():
+				position = readPosition(segment)
+				with open(segment, 'rb') as f:
+					f.seek(position)
+					for line in f:
+						if sent >= self.max_replay or (deadline is not None and time.time() >= deadline):
+							writePosition(segment, position)
+							return result
+						chunk = json.loads(line.decode('utf-8')) if line.strip() else []
+						if chunk:
+							r = sender.send_chunk([itemData(h, k, v, c) for h, k, v, c in chunk])
+							result.merge(r)
+							if not r.delivered:
+								writePosition(segment, position)
+								return result
+							sent += len(chunk)
+							self.replayed += len(chunk)
+						position += len(line)
+						# keep below max_rate values per second
+						delay = sent / float(self.max_rate) - (time.time() - start)
+						if delay > 0:
+							if deadline is not None and time.time() + delay >= deadline:
+								writePosition(segment, position)
+								return result
+							time.sleep(delay)
+				self.remove(segment)
+		return result
+
+	def stats(self):
+		'''Return the number of values spooled, replayed and dropped by this process, and the spool size.'''
+		return {
+			'spooled': self.spooled,
+			'replayed': self.replayed,
+			'dropped': self.dropped,
+			'bytes': sum(os.path.getsize(s) for s in self.segments())
+		}
+
+
+def readPosition(segment):
+	'''Return the offset up to which a segment was replayed.'''
+	try:
+		with open(segment + position_suffix, 'r') as f:
+			return int(f.read() or 0)
+	except (IOError, OSError, ValueError):
+		return 0
+
+
+def writePosition(segment, position):
+	with open(segment + position_suffix, 'w') as f:
+		f.write(str(position))
+
+
+def defaultSpoolPath(script):
+	'''Return the default spool directory of a collector script, e.g. /tmp/mongodb_sh_auth.spool.'''
+	name = os.path.splitext(os.path.basename(script))[0]
+	return os.path.join(tempfile.gettempdir(), name + segment_suffix)
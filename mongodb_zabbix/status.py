@@ -0,0 +1,118 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: status.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 12:09
+'
+'''
+
+from collections import OrderedDict
+
+import bson
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from bson.son import SON
+
+from mongodb_zabbix import instrument
+
+
+# have the driver hand back the reply as undecoded BSON bytes
+raw_options = CodecOptions(document_class=RawBSONDocument)
+
+# the serverStatus sections that can be excluded by '<section>: 0' on MongoDB 4.0
+optional_sections = ('asserts', 'connections', 'extra_info', 'globalLock', 'locks',
+	'logicalSessionRecordCache', 'mem', 'metrics', 'network', 'opLatencies', 'opcounters',
+	'opcountersRepl', 'repl', 'security', 'sharding', 'shardingStatistics', 'storageEngine',
+	'tcmalloc', 'transactions', 'transportSecurity', 'wiredTiger')
+
+def compilePaths(paths):
+	'''Split dotted paths into the field names to look up.
+
+	Args:
+		paths   list   dotted paths, e.g. ['connections.current', 'uptime']
+
+	Returns:
+		a list of (path, field names) tuples
+	'''
+	return [(path, path.split('.')) for path in paths]
+
+
+def serverStatusCommand(paths):
+	'''Build the serverStatus command that leaves out every optional section not in paths.
+
+	Args:
+		paths   list   dotted paths of the fields to be read
+
+	Returns:
+		the command document
+	'''
+	roots = set(path.split('.')[0] for path in paths)
+	command = SON([('serverStatus', 1)])
+	for section in optional_sections:
+		if section not in roots:
+			command[section] = 0
+	return command
+
+
+def extract(raw, keys):
+	'''Decode a BSON document and pick the compiled paths out of it.
+
+	The reply of the trimmed serverStatus is about 1 KB, which the C extension
+	of bson decodes faster than the fields could be scanned for in Python.
+
+	Args:
+		raw    bytes or RawBSONDocument   the BSON document, e.g. the serverStatus reply
+		keys   list                       the paths compiled by compilePaths()
+
+	Returns:
+		a dict: dotted path -> value, missing paths are left out
+	'''
+	if isinstance(raw, RawBSONDocument):
+		raw = raw.raw
+	doc = bson.BSON(raw).decode()
+	values = {}
+	for path, names in keys:
+		value = doc
+		try:
+			for name in names:
+				value = value[name]
+		except (KeyError, TypeError):
+			continue
+		values[path] = value
+	return values
+
+
+class StatusQuery(object):
+	'''A serverStatus query that reads only the given fields.
+
+	The command leaves out every optional section the fields do not live in, so
+	the tens of KB of wiredTiger, metrics and locks are neither serialized by
+	the server nor decoded by the collector. The reply is kept as raw BSON until
+	the decode timer, so that serverstatus times the command alone.
+	'''
+
+	def __init__(self, paths):
+		'''
+		Args:
+			paths   list   dotted paths of the fields to be read, e.g. ['opcounters.insert']
+		'''
+		# several items may read the same field
+		self.paths = list(OrderedDict.fromkeys(paths))
+		self.command = serverStatusCommand(self.paths)
+		self.keys = compilePaths(self.paths)
+
+	def run(self, client):
+		'''Run the query.
+
+		Args:
+			client  MongoClient   the client of the mongod or mongos instance
+
+		Returns:
+			a dict: dotted path -> value
+		'''
+		with instrument.timer('serverstatus'):
+			raw = client.admin.command(self.command, codec_options=raw_options)
+		with instrument.timer('decode'):
+			return extract(raw, self.keys)
@@ -0,0 +1,166 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: templates.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 12:19
+'
+'''
+
+import os
+import re
+import textwrap
+
+from mongodb_zabbix.sender import json_suffix
+
+
+# the node templates shipped with the collectors, relative to the root of the repository
+node_templates = [
+	os.path.join('monitoring for Standalone', 'mongo_standalone.xml'),
+	os.path.join('monitoring for Replica Set', 'mongodb_repl_arbiter.xml'),
+	os.path.join('monitoring for Replica Set', 'mongodb_repl_notarbiter.xml'),
+	os.path.join('monitoring for Sharded Cluster', 'sh_config.xml'),
+	os.path.join('monitoring for Sharded Cluster', 'sh_mongos.xml'),
+	os.path.join('monitoring for Sharded Cluster', 'sh_shard.xml'),
+	os.path.join('monitoring for Sharded Cluster', 'sh_shard_a.xml'),
+	os.path.join('monitoring for Sharded Cluster', 'sh_shard_na.xml'),
+]
+
+# an item or item prototype of a template export, the graph items included: its indentation, tag and body
+item_pattern = re.compile(r'( *)<(item|item_prototype)>\n(.*?)\n\1</\2>', re.S)
+
+# the items of a template, empty or not, where the master items of the prototypes go
+items_pattern = re.compile(r'^( *)(<items/>|<items>)$', re.M)
+
+# the zabbix 4.0 item types, value types and preprocessing steps used below
+trapper_type = '<type>2</type>'
+dependent_type = '<type>18</type>'
+text_value_type = '4'
+jsonpath_step = '12'
+
+
+def jsonPath(field):
+	'''Return the JSONPath of a field of the master item, e.g. $['conn.current'].'''
+	return "$['%s']" % field.replace("'", "\\'")
+
+
+def replaceTag(body, tag, content):
+	'''Replace an element of an item, written as <tag>...</tag> or <tag/>, with the given content.'''
+	pattern = re.compile(r'<%s>.*?</%s>|<%s/>' % (tag, tag, tag), re.S)
+	if content is None or content == '':
+		element = '<%s/>' % tag
+	else:
+		element = '<%s>%s</%s>' % (tag, content, tag)
+	return pattern.sub(lambda m: element, body, count=1)
+
+
+def dependentItem(indent, body, prefix, field):
+	'''Turn the body of a trapper item into a dependent item of the master item of its prefix.'''
+	inner = indent + '    '
+	step = ('\n%s    <step>\n%s        <type>%s</type>\n%s        <params>%s</params>\n%s    </step>' %
+		(inner, inner, jsonpath_step, inner, jsonPath(field), inner))
+	body = body.replace(trapper_type, dependent_type, 1)
+	if '<preprocessing/>' in body:
+		body = body.replace('<preprocessing/>', '<preprocessing>' + step + '\n' + inner + '</preprocessing>', 1)
+	else:
+		body = body.replace('<preprocessing>', '<preprocessing>' + step, 1)
+	master = '<master_item>\n%s    <key>%s</key>\n%s</master_item>' % (inner, prefix + json_suffix, inner)
+	return replaceTag(body, 'master_item', None).replace('<master_item/>', master, 1)
+
+
+def masterItem(body, prefix):
+	'''Build the master item of a prefix from the body of one of its trapper items.'''
+	body = replaceTag(body, 'name', prefix.capitalize() + ' values of the node (JSON)')
+	body = replaceTag(body, 'key', prefix + json_suffix)
+	# the values are kept by the dependent items only
+	body = replaceTag(body, 'history', '0')
+	body = replaceTag(body, 'trends', '0')
+	body = replaceTag(body, 'value_type', text_value_type)
+	body = replaceTag(body, 'units', None)
+	body = replaceTag(body, 'description', 'all the values of the node in one JSON document, sent by the collector with -j. Every field the dependent items read is there: a value the node did not yield is 0, empty for text')
+	body = re.sub(r'<applications>.*?</applications>', '<applications/>', body, count=1, flags=re.S)
+	body = re.sub(r'\n *<application_prototypes(/>|>.*?</application_prototypes>)', '', body, count=1, flags=re.S)
+	body = replaceTag(body, 'valuemap', None)
+	body = re.sub(r'<preprocessing>.*?</preprocessing>', '<preprocessing/>', body, count=1, flags=re.S)
+	return body
+
+
+def dependentTemplate(xml):
+	'''Convert a template export into its json mode counterpart.
+
+	Every trapper item '<prefix>.<field>' becomes an item depending on a new
+	trapper item '<prefix>.json', extracting the field with JSONPath. The keys,
+	names, units, value maps and triggers stay the same, as does the template
+	name, so importing it over the original switches the linked hosts to json
+	mode in place. Item prototypes, e.g. 'shard.alive[{#SHARD}]', depend the
+	same way on a regular master item, added to the items of the template, and
+	extract the field 'alive[{#SHARD}]' of the discovered member.
+
+	Args:
+		xml   string   the zabbix 4.0 template export
+
+	Returns:
+		the converted export
+	'''
+	# the prefixes whose master item was added, in front of their first item
+	masters = set()
+	# the master items of the prototypes, unindented
+	prototype_masters = []
+
+	def convert(m):
+		indent, tag, body = m.group(1), m.group(2), m.group(3)
+		if trapper_type not in body:
+			return m.group(0)
+		key = re.search(r'<key>(.*?)</key>', body).group(1)
+		prefix, dot, field = key.partition('.')
+		if not dot or key == prefix + json_suffix:
+			return m.group(0)
+		item = '%s<%s>\n%s\n%s</%s>' % (indent, tag, dependentItem(indent, body, prefix, field), indent, tag)
+		if prefix in masters:
+			return item
+		masters.add(prefix)
+		if tag == 'item':
+			return '%s<item>\n%s\n%s</item>\n' % (indent, masterItem(body, prefix), indent) + item
+		prototype_masters.append('<item>\n%s\n</item>' % textwrap.indent(textwrap.dedent(masterItem(body, prefix)), '    '))
+		return item
+
+	xml = item_pattern.sub(convert, xml)
+	if not prototype_masters:
+		return xml
+
+	def addMasters(m):
+		indent = m.group(1)
+		items = '\n'.join(textwrap.indent(item, indent + '    ') for item in prototype_masters)
+		if m.group(2) == '<items/>':
+			return '%s<items>\n%s\n%s</items>' % (indent, items, indent)
+		return '%s<items>\n%s' % (indent, items)
+
+	return items_pattern.sub(addMasters, xml, count=1)
+
+
+def jsonTemplatePath(path):
+	'''Return the path of the json mode counterpart of a template, e.g. mongo_standalone_json.xml.'''
+	root, ext = os.path.splitext(path)
+	return root + '_json' + ext
+
+
+def generate(root):
+	'''Write the json mode counterpart of every node template next to it.
+
+	Args:
+		root   string   the root of the repository
+
+	Returns:
+		the paths written
+	'''
+	written = []
+	for name in node_templates:
+		path = os.path.join(root, name)
+		with open(path, 'r') as f:
+			xml = f.read()
+		target = jsonTemplatePath(path)
+		with open(target, 'w') as f:
+			f.write(dependentTemplate(xml))
+		written.append(target)
+	return written
@@ -0,0 +1,240 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: tracing.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 21:50
+'
+'''
+
+import json
+import os
+import threading
+import time
+
+from pymongo import monitoring
+
+
+# set by openTrace(), every span helper returns at once while it is False
+enabled = False
+
+# the directory the traces are written to, and the prefix of their file names
+trace_dir = ''
+trace_name = ''
+
+# the traces kept per collector script, the oldest are removed
+max_files = 100
+
+# the clock of the spans, the same as the timers of instrument
+now = time.perf_counter
+
+# the spans of the current cycle, as Chrome trace events
+events = []
+events_lock = threading.Lock()
+# thread id -> thread name, for the thread_name metadata of the trace
+threads = {}
+cycle_start = [0.0]
+
+
+class Span(object):
+	'''Record the time spent in a block as a span of the trace: with tracing.span('discover'): ...'''
+
+	__slots__ = ('name', 'args', 'start')
+
+	def __init__(self, name, args):
+		self.name = name
+		self.args = args
+
+	def __enter__(self):
+		self.start = now()
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		args = self.args
+		if exc_type is not None:
+			args = dict(args or {}, error=exc_type.__name__)
+		complete(self.name, self.start, now(), args)
+		return False
+
+
+class NoSpan(object):
+	'''The span returned while tracing is off, it records nothing.'''
+
+	__slots__ = ()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, exc_type, exc_value, tb):
+		return False
+
+
+no_span = NoSpan()
+
+
+def span(name, args=None):
+	'''Return a context manager that records its block as a span, or does nothing while tracing is off.'''
+	if not enabled:
+		return no_span
+	return Span(name, args)
+
+
+def complete(name, start, end, args=None):
+	'''Record a span of the calling thread that already ended.
+
+	Args:
+		name    string   the name of the span, e.g. 'poll' or 'command serverStatus'
+		start   float    when it started, by now()
+		end     float    when it ended, by now()
+		args    dict     the details shown with the span, e.g. {'target': 'sh_10.0.0.1 mongos'}
+	'''
+	if not enabled:
+		return
+	thread = threading.current_thread()
+	event = {
+		'name': name,
+		'ph': 'X',
+		'ts': round(start * 1000000, 3),
+		'dur': round((end - start) * 1000000, 3),
+		'pid': os.getpid(),
+		'tid': thread.ident
+	}
+	if args:
+		event['args'] = args
+	with events_lock:
+		events.append(event)
+		threads.setdefault(thread.ident, thread.name)
+
+
+class ConnectionTracer(monitoring.ConnectionPoolListener):
+	'''Record the connect span of every new connection: TCP connect, handshake and authentication.
+
+	Pool events are published by the thread that checks the connection out, so
+	the span lands on the poll that paid for it.
+	'''
+
+	def __init__(self):
+		self.local = threading.local()
+
+	def pending(self):
+		if not hasattr(self.local, 'created'):
+			self.local.created = {}
+		return self.local.created
+
+	def connection_created(self, event):
+		self.pending()[(event.address, event.connection_id)] = now()
+
+	def connection_ready(self, event):
+		start = self.pending().pop((event.address, event.connection_id), None)
+		if start is not None:
+			complete('connect', start, now(), {'address': '%s:%d' % event.address})
+
+	def connection_closed(self, event):
+		start = self.pending().pop((event.address, event.connection_id), None)
+		if start is not None:
+			complete('connect', start, now(), {'address': '%s:%d' % event.address, 'error': event.reason})
+
+	def pool_created(self, event):
+		pass
+
+	def pool_cleared(self, event):
+		pass
+
+	def pool_closed(self, event):
+		pass
+
+	def connection_check_out_started(self, event):
+		pass
+
+	def connection_check_out_failed(self, event):
+		pass
+
+	def connection_checked_out(self, event):
+		pass
+
+	def connection_checked_in(self, event):
+		pass
+
+
+class CommandTracer(monitoring.CommandListener):
+	'''Record a span for every command, the authentication commands of a new connection included.'''
+
+	def finish(self, event, error=None):
+		end = now()
+		args = {'address': '%s:%d' % event.connection_id}
+		if error is not None:
+			args['error'] = error
+		complete('command ' + event.command_name, end - event.duration_micros / 1000000.0, end, args)
+
+	def started(self, event):
+		pass
+
+	def succeeded(self, event):
+		self.finish(event)
+
+	def failed(self, event):
+		self.finish(event, str(event.failure.get('errmsg', 'failed')))
+
+
+def openTrace(path, script):
+	'''Turn tracing on, writing one trace per cycle into a directory.
+
+	Must be called before the first MongoClient is created, as the pymongo
+	listeners only apply to the clients created after them.
+
+	Args:
+		path    string   the directory of the traces, created if needed, '' to leave tracing off
+		script  string   the collector script, its name prefixes the trace files
+	'''
+	global enabled, trace_dir, trace_name
+	if not path:
+		return
+	if not os.path.isdir(path):
+		os.makedirs(path)
+	trace_dir = path
+	trace_name = os.path.splitext(os.path.basename(script))[0]
+	monitoring.register(ConnectionTracer())
+	monitoring.register(CommandTracer())
+	enabled = True
+
+
+def begin():
+	'''Start the trace of a cycle.'''
+	if not enabled:
+		return
+	with events_lock:
+		del events[:]
+	cycle_start[0] = now()
+
+
+def end():
+	'''End the trace of a cycle and write it as a Chrome trace, to be opened in chrome://tracing or Perfetto.
+
+	Returns:
+		the path of the trace file, None while tracing is off
+	'''
+	if not enabled:
+		return None
+	complete('cycle', cycle_start[0], now())
+	with events_lock:
+		spans = list(events)
+		names = dict(threads)
+		del events[:]
+	metadata = [{'name': 'process_name', 'ph': 'M', 'pid': os.getpid(), 'args': {'name': trace_name}}]
+	for tid, name in names.items():
+		metadata.append({'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}})
+	wall = time.time()
+	stamp = time.strftime('%Y%m%d-%H%M%S', time.localtime(wall)) + '.%03d' % (wall * 1000 % 1000)
+	path = os.path.join(trace_dir, '%s.%s.json' % (trace_name, stamp))
+	with open(path, 'w') as f:
+		json.dump({'traceEvents': metadata + spans, 'displayTimeUnit': 'ms'}, f)
+	prune()
+	return path
+
+
+def prune():
+	'''Remove the oldest traces of the script beyond max_files.'''
+	names = sorted(n for n in os.listdir(trace_dir) if n.startswith(trace_name + '.') and n.endswith('.json'))
+	for name in names[:-max_files]:
+		os.remove(os.path.join(trace_dir, name))
@@ -0,0 +1,45 @@
+#!/usr/bin/python36
+#-*- coding: utf-8 -*-
+
+'''
+'@file: make_json_templates.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 23:40
+'
+'''
+
+import sys, getopt
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import templates
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return the root of the repository.'''
+	root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+	try:
+		opts, args = getopt.getopt(argv,"hr:",["help"])
+	except getopt.GetoptError:
+		print('invalid option\nplease use python make_json_templates.py --help for more information\n')
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			print('usage:\n  python make_json_templates.py [-r <repository_root>]\n')
+			print('  writes the json mode counterpart of every node template next to it, e.g. mongo_standalone_json.xml,')
+			print('  whose items depend on one <prefix>.json master item filled by the collectors run with -j')
+			sys.exit()
+		elif opt == '-r':
+			root = arg
+	return root
+
+
+def main(argv):
+	root = parseArg(argv)
+	for path in templates.generate(root):
+		print('written:', os.path.relpath(path, root))
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
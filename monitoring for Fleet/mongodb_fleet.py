@@ -0,0 +1,93 @@
+#!/usr/bin/python36
+#-*- coding: utf-8 -*-
+
+'''
+'@file: mongodb_fleet.py
+'@author: liyunting
+'@version: 4
+'@lastModify: 2026-10-18 12:13
+'
+'''
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import cycle
+from mongodb_zabbix import discovery
+from mongodb_zabbix import inventory
+from mongodb_zabbix.scheduler import run
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return arguments.
+
+	Args:
+		argv   string  command line arguments
+
+	Returns:
+		options        Options the options shared by the collectors, see mongodb_zabbix/cycle.py
+		fleet_dir      string  the directory of the inventory files
+		user           string  the default user of mongodb, '' if authentication is not needed
+		pwd            string  the default password of mongodb
+		ttl            float   the seconds a discovered topology is reused
+	'''
+	fleet_dir = ''
+	user = ''
+	pwd = ''
+	ttl = discovery.default_ttl
+	options, opts = cycle.parseOptions(argv, __file__, '-f <inventory_dir> [-u <mongodb_user> -d <mongodb_password>]', '[-e <ttl>]', 'f:u:d:e:',
+		groups=(cycle.parallel, cycle.lld), help=[
+			'-f is a directory of standalone ({"ip", "port"}), repl.json and cluster.json files, all collected by this process',
+			'-u and -d are the default credentials, a file may override them with "user" and "password"',
+			'-e is the seconds a cluster discovered from its "seeds" is reused, default: ' + str(discovery.default_ttl)
+		])
+	for opt, arg in opts:
+		if opt == '-f':
+			fleet_dir = arg
+		elif opt == '-u':
+			user = arg
+		elif opt == '-d':
+			pwd = arg
+		elif opt == '-e':
+			ttl = float(arg)
+	return options, fleet_dir, user, pwd, ttl
+
+
+def collect(batch, options, fleet):
+	'''Run one collection cycle: get the status of every node of every inventory and send them to zabbix server.
+
+	The nodes of all the deployments are polled in parallel by at most
+	options.workers threads, and all their values go out in one batch. The
+	inventory files added, changed or removed since the last cycle are taken
+	into account. With options.share, only the nodes of the zabbix hosts that
+	fall to this collector are polled.
+	Polling stops options.deadline seconds after the cycle started: what was
+	collected by then is sent, and the nodes still polled are reported as timed out.
+	'''
+	start = cycle.begin()
+	fleet.load()
+	targets = fleet.targets(batch, options.workers)
+	if options.share is not None:
+		targets = options.share.select(targets)
+	inventory.shardDiscovery(targets, batch)
+	late = inventory.pollTargets(targets, batch, start + options.deadline, options.workers)
+	print('targets:', len(targets), 'timed out:', late)
+	cycle.finish(batch, options, start)
+
+
+# the main method
+def main(argv):
+	options, fleet_dir, user, pwd, ttl = parseArg(argv)
+	if options.zabbix_server == '' or fleet_dir == '' or bool(user) != bool(pwd):
+		print('invalid input!\nplease check and use python mongodb_fleet.py --help for more information\n')
+		sys.exit(2)
+
+	batch = cycle.setup(options, __file__)
+
+	fleet = inventory.Fleet(fleet_dir, user, pwd, ttl, options.lld)
+	run(collect, options.interval, batch, options, fleet)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
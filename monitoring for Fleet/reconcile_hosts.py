@@ -0,0 +1,184 @@
+#!/usr/bin/python36
+#-*- coding: utf-8 -*-
+
+'''
+'@file: reconcile_hosts.py
+'@author: liyunting
+'@version: 4
+'@lastModify: 2026-10-18 12:21
+'
+'''
+
+import sys, getopt
+import json
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import api
+from mongodb_zabbix import discovery
+from mongodb_zabbix import inventory
+from mongodb_zabbix import provision
+
+
+def parseArg(argv):
+	'''Parse python command line arguments and return arguments.
+
+	Args:
+		argv   string  command line arguments
+
+	Returns:
+		zabbix_server  string  the ip of zabbix server
+		zabbix_user    string  the user of zabbix, default: Admin
+		zabbix_pwd     string  password for user, default: zabbix
+		fleet_dir      string  the directory of the inventory files, '' for inventory_file
+		inventory_file string  one repl.json, cluster.json or standalone inventory file
+		mongo_user     string  the default user of mongodb, to discover the clusters given by seeds
+		mongo_pwd      string  the default password of mongodb
+		dry_run        bool    only print the plan
+		prune          bool    unlink the templates and delete the hosts no inventory needs anymore
+		reimport       bool    import all the templates again, not only the missing ones
+		json_mode      bool    use the json mode templates, see mongodb_zabbix/templates.py
+		lld            bool    use the one shard template with low-level discovery, sh_shard.xml
+		chunk          int     the hosts created, updated or deleted by one array call
+		mass_chunk     int     the hosts of one template.massadd, host.massadd or host.massremove call
+		timeout        tuple   the (connect, read) timeout of an api call in seconds
+		retries        int     the retries of an api call whose connection failed
+	'''
+	zabbix_user = 'Admin'
+	zabbix_pwd = 'zabbix'
+	zabbix_server = ''
+	fleet_dir = ''
+	inventory_file = ''
+	mongo_user = ''
+	mongo_pwd = ''
+	dry_run = False
+	prune = False
+	reimport = False
+	json_mode = False
+	lld = False
+	chunk = provision.default_chunk
+	mass_chunk = provision.default_mass_chunk
+	timeout = api.default_timeout
+	retries = api.default_retries
+	try:
+		opts, args = getopt.getopt(argv,"hz:u:p:f:c:nijgk:K:t:r:",["help", "delete", "mongodb-user=", "mongodb-password="])
+	except getopt.GetoptError:
+		print('invalid option\nplease use python reconcile_hosts.py --help for more information\n')
+		sys.exit(2)
+	for opt, arg in opts:
+		if opt in ('-h', '--help'):
+			print('usage:\n  python reconcile_hosts.py -z <zabbix_server_ip> [-u <zabbix_user> -p <zabbix_password>] (-f <inventory_dir> | -c <inventory_file>) [-n] [--delete] [-i] [-j] [-g] [-k <chunk>] [-K <mass_chunk>] [-t <timeout>] [-r <retries>] [--mongodb-user <user> --mongodb-password <password>]\n')
+			print('  brings the zabbix host groups, templates and hosts to what the inventories describe, making only the calls needed,')
+			print('  so it can be run again after every change of the inventories')
+			print('  if no user and password input, then user:Admin and password:zabbix will be used by default')
+			print('  -f is a directory of inventory files as read by mongodb_fleet.py, -c one repl.json, cluster.json or {"ip", "port"} file')
+			print('  -n only prints the plan, without changing anything')
+			print('  --delete also unlinks the node templates a host does not need anymore, clearing their items, and deletes the hosts')
+			print('  of the host groups of the inventories that no inventory describes anymore; use it with all the inventories of these groups')
+			print('  -i imports all the templates again, to update them after a change, default: only the missing ones')
+			print('  -j uses the *_json.xml templates, for the collectors run with -j')
+			print('  -g uses the one shard template sh_shard.xml, for the collectors run with -g')
+			print('  -k is the number of hosts created, updated or deleted by one array call, default: ' + str(provision.default_chunk))
+			print('  -K is the number of hosts one template.massadd, host.massadd or host.massremove call links or unlinks, default: ' + str(provision.default_mass_chunk))
+			print('  an item that fails is reported and the other items of its call are retried without it')
+			print('  -t is the timeout of an api call in seconds, <seconds> or <connect>,<read>, default: %g,%g' % api.default_timeout)
+			print('  -r is the number of times an api call whose connection failed, or a read-only one that got 502/503 from a proxy, is retried, default: ' + str(api.default_retries))
+			print('  --mongodb-user and --mongodb-password are the default credentials to discover the clusters given by seeds')
+			sys.exit()
+		elif opt == '-z':
+			zabbix_server = arg
+		elif opt == '-u':
+			zabbix_user = arg
+		elif opt == '-p':
+			zabbix_pwd = arg
+		elif opt == '-f':
+			fleet_dir = arg
+		elif opt == '-c':
+			inventory_file = arg
+		elif opt == '-n':
+			dry_run = True
+		elif opt == '--delete':
+			prune = True
+		elif opt == '-i':
+			reimport = True
+		elif opt == '-j':
+			json_mode = True
+		elif opt == '-g':
+			lld = True
+		elif opt == '-k':
+			chunk = int(arg)
+		elif opt == '-K':
+			mass_chunk = int(arg)
+		elif opt == '-t':
+			timeout = api.parseTimeout(arg)
+		elif opt == '-r':
+			retries = int(arg)
+		elif opt == '--mongodb-user':
+			mongo_user = arg
+		elif opt == '--mongodb-password':
+			mongo_pwd = arg
+	return zabbix_server, zabbix_user, zabbix_pwd, fleet_dir, inventory_file, mongo_user, mongo_pwd, dry_run, prune, reimport, json_mode, lld, chunk, mass_chunk, timeout, retries
+
+
+def readInventories(fleet_dir, inventory_file, mongo_user, mongo_pwd):
+	'''Read the inventories to reconcile, discovering the clusters given by seeds.
+
+	Returns:
+		a list of (name, type, inventory), None if an inventory could not be read
+	'''
+	if fleet_dir != '':
+		fleet = inventory.Fleet(fleet_dir, mongo_user, mongo_pwd).inventories
+	else:
+		with open(inventory_file, 'r') as f:
+			inv = json.load(f)
+		kind = inventory.inventoryType(inv)
+		if kind == '':
+			print('unknown inventory:', inventory_file)
+			return None
+		topology = None
+		if 'seeds' in inv:
+			seeds = [discovery.parseHost(h) for h in inv['seeds']]
+			topology = discovery.ClusterDiscovery(seeds, inv.get('user', mongo_user), inv.get('password', mongo_pwd))
+		fleet = [(os.path.basename(inventory_file), kind, inv, topology)]
+	inventories = []
+	for name, kind, inv, topology in fleet:
+		if topology is not None:
+			inv = topology.get()
+			if inv is None:
+				# deleting the hosts of a cluster that could not be discovered would be wrong
+				print('Cound not discover the sharded cluster', name)
+				return None
+		inventories.append((name, kind, inv))
+	return inventories
+
+
+def main(argv):
+	zabbix_server, user, pwd, fleet_dir, inventory_file, mongo_user, mongo_pwd, dry_run, prune, reimport, json_mode, lld, chunk, mass_chunk, timeout, retries = parseArg(argv)
+	if zabbix_server == '' or (fleet_dir == '') == (inventory_file == ''):
+		print('invalid input!\nplease check and use python reconcile_hosts.py --help for more information\n')
+		sys.exit(2)
+
+	inventories = readInventories(fleet_dir, inventory_file, mongo_user, mongo_pwd)
+	if inventories is None:
+		sys.exit(1)
+	root = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+	desired = provision.Desired(root, json_mode, lld)
+	for name, kind, inv in inventories:
+		desired.add(kind, inv)
+
+	zabbix = api.ZabbixAPI(zabbix_server, timeout, retries)
+	try:
+		zabbix.login(user, pwd)
+	except api.ApiError as e:
+		print(e.error)
+		print('\nzabbix server authentication failed\n')
+		sys.exit(1)
+	plan, failed = provision.reconcile(zabbix.call, desired, prune, reimport, dry_run, chunk, mass_chunk)
+	zabbix.printLatency()
+	zabbix.close()
+	if failed:
+		sys.exit(1)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -4,88 +4,55 @@
 '''
 '@file: create_host_repl.py
 '@author: liyunting
-'@version: 1
-'@lastModify: 2019-02-19 15:39
+'@version: 4
+'@lastModify: 2026-10-18 12:21
 '
 '''
 
 import json
 import sys
 import getopt
-import requests
+import os
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import api
+from mongodb_zabbix import provision
 
-def zabbix_call(payload, zabbix_server):
-	'''Call zabbix web api by json-rpc.
 
-	Args:
-		payload        dict    the parameter to be passed  
-		zabbix_server  string  the ip of zabbix server 
-
-	Returns:
-		the request response object  
-	'''
-	url = "http://" + zabbix_server + "/zabbix/api_jsonrpc.php"
-	headers = {'content-type': 'application/json'}
-	response = requests.post(url, data=json.dumps(payload), headers=headers).json()
-	return response
-
-
-def zabbix_auth(user, pwd, zabbix_server):
+def zabbix_auth(zabbix, user, pwd):
 	'''Connect to zabbix server and authenticate by the given username and password.
 
 	Args:
-		user           string   the zabbix server username
-		pwd            string   the zabbix server password
-		zabbix_server  string   the ip of zabbix server
+		zabbix         ZabbixAPI  the client of the zabbix server
+		user           string     the zabbix server username
+		pwd            string     the zabbix server password
 
 	Returns:
 		the authentication token
 	'''
 	auth = ''
-	payload = {
-	    "method": "user.login",
-	    "params": {
-	    	"user": user,
-	    	"password": pwd
-	    },
-	    "jsonrpc": "2.0",
-	    "id": 1,
-	    "auth": None
-	}
-	res = zabbix_call(payload, zabbix_server) 
-	if 'result' in res :
-		auth = res['result']
-	else:
-		print(res['error'])
+	try:
+		auth = zabbix.login(user, pwd)
+	except api.ApiError as e:
+		print(e.error)
 	return auth
 
 
-def zabbix_create_group(auth, groupname, zabbix_server):
+def zabbix_create_group(zabbix, groupname):
 	'''Connect to zabbix server and create host group.
 
 	If the host group exists, it will be failed. And if it does not exist, then create it and return
 	the id of the host group.
 
 	Args:
-		auth           string   your authentication token
-		groupname      string   the name of the hostgroup
-		zabbix_server  string   the ip of zabbix server
+		zabbix         ZabbixAPI  the client of the zabbix server
+		groupname      string     the name of the hostgroup
 
 	Returns:
 		the host group id
 	'''
 	host_group_id = ''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "hostgroup.create",
-		"params": {
-		    "name": groupname
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("hostgroup.create", {"name": groupname})
 	if 'result' in res :
 		host_group_id = res['result']['groupids'][0]
 		print('create hostgroup:', groupname, 'successfully')
@@ -95,60 +62,20 @@ def zabbix_create_group(auth, groupname, zabbix_server):
 	return host_group_id
 
 
-def zabbix_import_template(auth, filepath, zabbix_server):
+def zabbix_import_template(zabbix, filepath):
 	'''Connect to zabbix server and import the MongoDB template.
 
 	Args:
-		auth          string   your authentication token
-		filepath      string   the whole path of the xml file(e.g. '/root/liyunting/example.xml')
-		zabbix_server string   the ip of zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		filepath      string     the whole path of the xml file(e.g. '/root/liyunting/example.xml')
 	'''
 	with open(filepath,'r') as f:
 		content = f.read()
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "configuration.import",
-		"params": {
-			"format": "xml",
-			"rules": {
-				"applications": {
-						"createMissing": True,
-						"deleteMissing": False
-				},
-				"templates": {
-					"createMissing": True,
-					"updateExisting": True
-				},
-				"screens": {
-					"createMissing": True,
-					"updateExisting": True
-				},
-				"valueMaps": {
-					"createMissing": True,
-					"updateExisting": False
-				},
-				"graphs": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				},
-				"triggers": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				},
-				"items": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				}
-			},
-			"source": content
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("configuration.import", {
+		"format": "xml",
+		"rules": provision.import_rules,
+		"source": content
+	})
 	if 'result' in res :
 		if res['result']:
 			print('template import successfully')
@@ -157,33 +84,25 @@ def zabbix_import_template(auth, filepath, zabbix_server):
 		print(res['error'])
 
 
-def zabbix_get_template(auth, templatename, zabbix_server):
+def zabbix_get_template(zabbix, templatename):
 	'''Connect to zabbix server and get the id of the template.
 
 	Args:
-		auth          string   your authentication token
-		templatename  string   the name of the template
-		zabbix_server string   the ip of zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		templatename  string     the name of the template
 
 	Returns:
 		the template id
 	'''
 	template_id = ''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "template.get",
-		"params": {
-		    "output": "extend",
-		    "filter": {
-		        "host": [
-		            templatename
-		        ]
-		    }
-		},
-		"auth": auth,
-		"id": 1
+	res = zabbix.request("template.get", {
+		"output": "extend",
+		"filter": {
+			"host": [
+				templatename
+			]
 		}
-	res = zabbix_call(payload, zabbix_server)
+	})
 	if 'result' in res :
 		template_id = res['result'][0]['templateid']
 	else:
@@ -191,54 +110,31 @@ def zabbix_get_template(auth, templatename, zabbix_server):
 	return template_id
 
 
-def zabbix_create_host(auth, hostname, hostip, host_group_id, template_id, zabbix_server):
-	'''Create host and link template.
+def zabbix_create_hosts(zabbix, hosts, host_group_id, chunk=provision.default_chunk):
+	'''Create hosts and link their templates, chunk hosts per host.create call.
+
+	A host that can not be created, e.g. because it already exists, is reported
+	and the other hosts of its call are created without it.
 
 	Args:
-		auth          string    your authentication token
-		hostname      string    the name of the host to be created
-		hostip        string    the ip of the host to be created
+		zabbix        ZabbixAPI the client of the zabbix server
+		hosts         list      the (name, ip, template id) of the hosts to be created
 		host_group_id string    the id of host group
-		template_id   string    the id of template
-		zabbix_server string    the ip of zabbix server
+		chunk         int       the hosts of one call
+
+	Returns:
+		host name -> the id of the host, for the hosts created
 	'''
-	host_id = ''
-	payload = {
-	    "jsonrpc": "2.0",
-	    "method": "host.create",
-	    "params": {
-	        "host": hostname,
-	        "interfaces": [
-	            {
-	                "type": 1,
-	                "main": 1,
-	                "useip": 1,
-	                "ip": hostip,
-	                "dns": "",
-	                "port": "10050"
-	            }
-	        ],
-	        "groups": [
-	            {
-	                "groupid": host_group_id
-	            }
-	        ],
-	        "templates": [
-	            {
-	                "templateid": template_id
-	            }
-	        ]		        
-	    },
-	    "auth": auth,
-	    "id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
-	if 'result' in res :
-		host_id = res['result']['hostids'][0]
-		print("create host:", hostname , "successfully")
-	else:
-		print('error in creating host:', hostname)
-		print(res['error'])
+	items = [(hostname, {
+		"host": hostname,
+		"interfaces": [dict(provision.agent_interface, ip=hostip)],
+		"groups": [{"groupid": host_group_id}],
+		"templates": [{"templateid": template_id}]
+	}) for hostname, hostip, template_id in hosts]
+	failures = []
+	host_ids = provision.callChunks(zabbix.call, 'host.create', items, chunk, failures)
+	print("create hosts:", len(host_ids), "successfully,", len(failures), "failed")
+	return host_ids
 
 
 def parseArg(argv):
@@ -251,19 +147,31 @@ def parseArg(argv):
 		zabbix_server  string  the ip of zabbix server
 		zabbix_user    string  the user of zabbix, default: Admin
 		zabbix_pwd     string  password for user, default: zabbix
+		json_mode      bool    import the json mode templates, see mongodb_zabbix/templates.py
+		chunk          int     the hosts created by one host.create call
+		timeout        tuple   the (connect, read) timeout of an api call in seconds
+		retries        int     the retries of an api call whose connection failed
 	'''
 	zabbix_user = 'Admin'
 	zabbix_pwd = 'zabbix'
 	zabbix_server = ''
+	json_mode = False
+	chunk = provision.default_chunk
+	timeout = api.default_timeout
+	retries = api.default_retries
 	try:
-		opts, args = getopt.getopt(argv,"hz:u:p:",["help"])
+		opts, args = getopt.getopt(argv,"hz:u:p:jk:t:r:",["help"])
 	except getopt.GetoptError:
 		print('invalid option\nplease use python create_host_repl.py --help for more information\n')
 		sys.exit(2)
 	for opt, arg in opts:
 		if opt in ('-h', '--help'):
-			print('usage:\n  python create_host_repl.py -z <zabbix_server_ip> -u <zabbix_user> -p <zabbix_password>\n')
+			print('usage:\n  python create_host_repl.py -z <zabbix_server_ip> -u <zabbix_user> -p <zabbix_password> [-j] [-k <chunk>] [-t <timeout>] [-r <retries>]\n')
 			print('  if no user and password input, then user:Admin and password:zabbix will be used by default')
+			print('  -j imports the *_json.xml templates, whose items depend on one <prefix>.json item, for the collectors run with -j')
+			print('  -k is the number of hosts created by one host.create call, default: ' + str(provision.default_chunk))
+			print('  -t is the timeout of an api call in seconds, <seconds> or <connect>,<read>, default: %g,%g' % api.default_timeout)
+			print('  -r is the number of times an api call whose connection failed, or a read-only one that got 502/503 from a proxy, is retried, default: ' + str(api.default_retries))
 			sys.exit()
 		elif opt == '-z':
 			zabbix_server = arg
@@ -271,26 +179,36 @@ def parseArg(argv):
 			zabbix_user = arg
 		elif opt == '-p':
 			zabbix_pwd = arg
-	return zabbix_server, zabbix_user, zabbix_pwd
+		elif opt == '-j':
+			json_mode = True
+		elif opt == '-k':
+			chunk = int(arg)
+		elif opt == '-t':
+			timeout = api.parseTimeout(arg)
+		elif opt == '-r':
+			retries = int(arg)
+	return zabbix_server, zabbix_user, zabbix_pwd, json_mode, chunk, timeout, retries
 
 
 # the main method
 def main(argv):
-	zabbix_server, user, pwd = parseArg(argv)
+	zabbix_server, user, pwd, json_mode, chunk, timeout, retries = parseArg(argv)
 	if zabbix_server == '':
 		print('invalid input!\nplease check and use python create_host_repl.py --help for more information\n')
 		sys.exit(2)
 
-	auth = zabbix_auth(user, pwd, zabbix_server)
+	zabbix = api.ZabbixAPI(zabbix_server, timeout, retries)
+	auth = zabbix_auth(zabbix, user, pwd)
 	if auth == '':
 		print('\nzabbix server authentication failed\n')
 		sys.exit()
 
 	#import template
-	zabbix_import_template(auth, './mongodb_repl_arbiter.xml', zabbix_server)
-	zabbix_import_template(auth, './mongodb_repl_notarbiter.xml', zabbix_server)
-	arbiter_template_id = zabbix_get_template(auth, 'Template MongoDB Repl Arbiter', zabbix_server)	
-	notarbiter_template_id = zabbix_get_template(auth, 'Template MongoDB Repl Notarbiter', zabbix_server)
+	suffix = '_json' if json_mode else ''
+	zabbix_import_template(zabbix, './mongodb_repl_arbiter' + suffix + '.xml')
+	zabbix_import_template(zabbix, './mongodb_repl_notarbiter' + suffix + '.xml')
+	arbiter_template_id = zabbix_get_template(zabbix, 'Template MongoDB Repl Arbiter')	
+	notarbiter_template_id = zabbix_get_template(zabbix, 'Template MongoDB Repl Notarbiter')
 
 	#read the json file
 	with open('./repl.json', 'r') as f:
@@ -299,21 +217,20 @@ def main(argv):
 	name = repl['name']
 
 	#create host group 
-	group_id = zabbix_create_group(auth, 'Mongodb Repl ' + name, zabbix_server)
+	group_id = zabbix_create_group(zabbix, 'Mongodb Repl ' + name)
 	hostname_first = 'repl_'
 
 
 	if group_id != '' and arbiter_template_id != '' and notarbiter_template_id != '':
+		hosts = []
 		for m in members:
-			mongo_ip = m['ip']
-			role = m['role']
-			hostname = hostname_first + m['ip']
-			if role == 'not arbiter':
-				zabbix_create_host(auth, hostname, mongo_ip, group_id, notarbiter_template_id, zabbix_server)
-			if role == 'arbiter':
-				zabbix_create_host(auth, hostname, mongo_ip, group_id, arbiter_template_id, zabbix_server)
+			template_id = arbiter_template_id if m['role'] == 'arbiter' else notarbiter_template_id
+			hosts.append((hostname_first + m['ip'], m['ip'], template_id))
+		zabbix_create_hosts(zabbix, hosts, group_id, chunk)
 	else:
 		print("can not complete creating all the hosts in your replica set, please check and try again")
+	zabbix.printLatency()
+	zabbix.close()
 
 
 
@@ -4,74 +4,19 @@
 '''
 '@file: mongodb_repl_auth.py
 '@author: liyunting
-'@version: 1
-'@lastModify: 2019-02-14 15:33
+'@version: 3
+'@lastModify: 2026-10-18 22:10
 '
 '''
 
-
 import json
-import sys, getopt
-import subprocess
-from pymongo import *
-from pymongo.errors import ConnectionFailure
-from pymongo.errors import OperationFailure
-
-
-#the prefix of hosts that are created
-hostname_first = 'repl_'
-
-
-def getServerStatus(ip, port, user, pwd):
-	'''Get the serverStatus of the mongod instance.
-
-	Try to get the information of mongodb server by command.
-	You can refer to MongoDB manual for more details about serverStatus command.
-
-	Args:
-		ip    string   the server ip that the mongod instance is located
-		port  int      the port that is used by the mongod instance
-		user  string   the user of mongodb
-		pwd   string   the password of mongodb
-
-	Returns:
-		status code    int    0/1/2
-		server_status  dict   the status result
-	'''
-	server_status = {}
-	try:
-		client = MongoClient(ip, port)
-		db = client.admin
-		is_master = db.command('ismaster')
-		db.authenticate(user, pwd)
-		server_status = db.command('serverStatus')
-		return 0, server_status
-	except ConnectionFailure:
-		return 1, server_status
-	except OperationFailure:
-		return 2, server_status
-
-
-def getArbiterStatus(ip, port):
-	'''Get the status of an arbiter.
-
-	Try to get the information of mongodb server by command.
-	You can refer to MongoDB manual for more details about ismaster command.
+import sys
+import os
 
-	Args:
-		ip    string   the ip of the arbiter
-		port  int      the port that is used by the arbiter
-
-	Returns:
-		status code    int    0/1
-	'''
-	try:
-		client = MongoClient(ip, port)
-		db = client.admin
-		is_master = db.command('ismaster')
-		return 0
-	except ConnectionFailure:
-		return 1
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import cycle
+from mongodb_zabbix import inventory
+from mongodb_zabbix.scheduler import run
 
 
 def parseArg(argv):
@@ -81,120 +26,52 @@ def parseArg(argv):
 		argv   string  command line arguments
 
 	Returns:
-		zabbix_server  string  the ip of zabbix server
+		options        Options the options shared by the collectors, see mongodb_zabbix/cycle.py
 		user           string  the user of mongodb
 		pwd            string  the password of mongodb
 	'''
-	zabbix_server = ''
 	user = ''
 	pwd = ''
-	try:
-		opts, args = getopt.getopt(argv,"hz:u:d:",["help"])
-	except getopt.GetoptError:
-		print('invalid option\nplease use python mongodb_repl_auth.py --help for more information\n')
-		sys.exit(2)
+	options, opts = cycle.parseOptions(argv, __file__, '-u <mongodb_user> -d <mongodb_password>', shortopts='u:d:', groups=(cycle.parallel,))
 	for opt, arg in opts:
-		if opt in ('-h', '--help'):
-			print('usage:\n  python mongodb_repl_auth.py -z <zabbix_server_ip> -u <mongodb_user> -d <mongodb_password>\n')
-			sys.exit()
-		elif opt == '-z':
-			zabbix_server = arg
-		elif opt == '-u':
+		if opt == '-u':
 			user = arg
 		elif opt == '-d':
 			pwd = arg
-	return zabbix_server, user, pwd
-
-
-def send_value(item_key, zabbix_server, item_value, zabbix_host):
-	'''Send certain value to a zabbix host by zabbix_sender process.
-
-	Args:
-		item_key      string   the key of a certain zabbix item
-		zabbix_server string   the ip of zabbix server
-		item_value    string   the value to be send to zabbix server
-		zabbix_host   string   the hostname in zabbix
-	'''
-	send = subprocess.getstatusoutput('zabbix_sender -z ' + zabbix_server + ' -s ' + zabbix_host + ' -k ' + item_key + ' -o ' + item_value)
-	print(send[1])
-	if send[0] == 0:
-		print('\n', item_key, zabbix_host, 'send successfully\n')
-	else:
-		print('\n', item_key, zabbix_host, 'failed to send\n')
+	return options, user, pwd
 
 
-def process_notarbiter(ip, port, zabbix_server, hostname, user, pwd):
-	'''Get the status data from a primary or secondary member of the replica set and send them to zabbix server.
+def collect(batch, options, repl, user, pwd):
+	'''Run one collection cycle: get the status of all the members of the replica set and send them to zabbix server.
 
-	And you can refer to MongoDB manual for more details about the returns of serverStatus command.
-
-	Args:
-		ip            string   the ip of mongo server
-		port          int      the port of mongo server
-		zabbix_server string   the ip of zabbix server
-		hostname      string   the host name in zabbix
-		user          string   the user of mongodb
-		pwd           string   the password of mongodb
+	The nodes are polled in parallel by at most options.workers threads, only
+	those of the zabbix hosts that fall to this collector when options.share is
+	given. The replication status of every member, the arbiter included, comes
+	from one replSetGetStatus of the set.
+	Polling stops options.deadline seconds after the cycle started: what was
+	collected by then is sent, and the nodes still polled are reported as timed out.
 	'''
-	status_result =  getServerStatus(ip, port, user, pwd)
-	if status_result[0]  == 0:
-		send_value('mongo.alive', zabbix_server, str(1), hostname)
-		send_value('mongo.conn.current', zabbix_server, str(status_result[1]['connections']['current']), hostname)
-		send_value('mongo.conn.available', zabbix_server, str(status_result[1]['connections']['available']), hostname)
-		send_value('mongo.mem.resident', zabbix_server, str(status_result[1]['mem']['resident']), hostname)
-		send_value('mongo.network.in', zabbix_server, str(status_result[1]['network']['bytesIn']), hostname)
-		send_value('mongo.network.out', zabbix_server, str(status_result[1]['network']['bytesOut']), hostname)
-		send_value('mongo.op.delete', zabbix_server, str(status_result[1]['opcounters']['delete']), hostname)
-		send_value('mongo.op.getmore', zabbix_server, str(status_result[1]['opcounters']['getmore']), hostname)
-		send_value('mongo.op.insert', zabbix_server, str(status_result[1]['opcounters']['insert']), hostname)
-		send_value('mongo.op.query', zabbix_server, str(status_result[1]['opcounters']['query']), hostname)
-		send_value('mongo.op.update', zabbix_server, str(status_result[1]['opcounters']['update']), hostname)
-		send_value('mongo.page_faults', zabbix_server, str(status_result[1]['extra_info']['page_faults']), hostname)
-		send_value('mongo.uptime', zabbix_server, str(status_result[1]['uptime']), hostname)
-		send_value('mongo.version', zabbix_server, str(status_result[1]['version']), hostname)
-	elif status_result[0]  == 1:
-		send_value('mongo.alive', zabbix_server, str(0), hostname)
-		print('Cound not connect to the server', ip, str(port))
-	else:
-		print('\nCound not get the server status', ip, str(port))
-
-
-def process_arbiter(ip, port, zabbix_server, hostname):
-	'''Get the status data from an arbiter member of the replica set and send them to zabbix server.
-
-	Args:
-		ip            string   the ip of mongo server
-		port          int      the port of mongo server
-		zabbix_server string   the ip of zabbix server
-		hostname      string   the host name in zabbix
-	'''
-	status =  getArbiterStatus(ip, port)
-	if status  == 0:
-		send_value('mongo.alive', zabbix_server, str(1), hostname)
-	elif status  == 1:
-		send_value('mongo.alive', zabbix_server, str(0), hostname)
-		print('Cound not connect to the server', ip, str(port))
+	start = cycle.begin()
+	targets = inventory.replTargets(repl, batch, user, pwd)
+	if options.share is not None:
+		targets = options.share.select(targets)
+	inventory.pollTargets(targets, batch, start + options.deadline, options.workers)
+	cycle.finish(batch, options, start)
 
 
 # the main method 
 def main(argv):
-	zabbix_server, user, pwd = parseArg(argv)
-	if zabbix_server == '' or user == '' or pwd == '':
+	options, user, pwd = parseArg(argv)
+	if options.zabbix_server == '' or user == '' or pwd == '':
 		print('invalid input!\nplease check and use python mongodb_repl_auth.py --help for more information\n')
 		sys.exit(2)
 
+	batch = cycle.setup(options, __file__)
+
 	with open('/root/liyunting/repl.json', 'r') as f:
 		repl = json.load(f)
-	members = repl['members']
-	for m in members:
-		mongo_ip = m['ip']
-		mongo_port = m['port']
-		role = m['role']
-		if role == 'not arbiter':
-			process_notarbiter(mongo_ip, mongo_port, zabbix_server, hostname_first + mongo_ip, user, pwd)
-		if role == 'arbiter':
-			process_arbiter(mongo_ip, mongo_port, zabbix_server, hostname_first + mongo_ip)
-		
+	run(collect, options.interval, batch, options, repl, user, pwd)
+
 
 if __name__ == "__main__":
 	main(sys.argv[1:])
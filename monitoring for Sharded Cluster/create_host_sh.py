@@ -4,16 +4,20 @@
 '''
 '@file: create_host_sh.py
 '@author: liyunting
-'@version: 2
-'@lastModify: 2019-02-17 14:30
+'@version: 6
+'@lastModify: 2026-10-18 12:21
 '
 '''
 
 import json
-import requests
 import getopt
+import os
 import sys
-from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import api
+from mongodb_zabbix import provision
+from mongodb_zabbix.discovery import clusterHosts
 
 
 def parseArg(argv):
@@ -26,19 +30,38 @@ def parseArg(argv):
 		zabbix_server  string  the ip of zabbix server
 		zabbix_user    string  the user of zabbix, default: Admin
 		zabbix_pwd     string  password for user, default: zabbix
+		json_mode      bool    import the json mode templates, see mongodb_zabbix/templates.py
+		lld            bool    import the one shard template with low-level discovery, sh_shard.xml
+		chunk          int     the hosts created by one host.create call
+		mass_chunk     int     the hosts one template.massadd call links a template to
+		timeout        tuple   the (connect, read) timeout of an api call in seconds
+		retries        int     the retries of an api call whose connection failed
 	'''
 	zabbix_user = 'Admin'
 	zabbix_pwd = 'zabbix'
 	zabbix_server = ''
+	json_mode = False
+	lld = False
+	chunk = provision.default_chunk
+	mass_chunk = provision.default_mass_chunk
+	timeout = api.default_timeout
+	retries = api.default_retries
 	try:
-		opts, args = getopt.getopt(argv,"hz:u:p:",["help"])
+		opts, args = getopt.getopt(argv,"hz:u:p:jgk:K:t:r:",["help"])
 	except getopt.GetoptError:
 		print('invalid option\nplease use python create_host_sh.py --help for more information\n')
 		sys.exit(2)
 	for opt, arg in opts:
 		if opt in ('-h', '--help'):
-			print('usage:\n  python create_host_sh.py -z <zabbix_server_ip> -u <zabbix_user> -p <zabbix_password>\n')
+			print('usage:\n  python create_host_sh.py -z <zabbix_server_ip> -u <zabbix_user> -p <zabbix_password> [-j] [-g] [-k <chunk>] [-K <mass_chunk>] [-t <timeout>] [-r <retries>]\n')
 			print('  if no user and password input, then user:Admin and password:zabbix will be used by default')
+			print('  -j imports the *_json.xml templates, whose items depend on one <prefix>.json item, for the collectors run with -j')
+			print('  -g imports sh_shard.xml, one template whose items are discovered for every shard member on a host, for the collectors run with -g,')
+			print('  instead of a template pair per shard')
+			print('  -k is the number of hosts created by one host.create call, default: ' + str(provision.default_chunk))
+			print('  -K is the number of hosts one template.massadd call links a template to, default: ' + str(provision.default_mass_chunk))
+			print('  -t is the timeout of an api call in seconds, <seconds> or <connect>,<read>, default: %g,%g' % api.default_timeout)
+			print('  -r is the number of times an api call whose connection failed, or a read-only one that got 502/503 from a proxy, is retried, default: ' + str(api.default_retries))
 			sys.exit()
 		elif opt == '-z':
 			zabbix_server = arg
@@ -46,7 +69,19 @@ def parseArg(argv):
 			zabbix_user = arg
 		elif opt == '-p':
 			zabbix_pwd = arg
-	return zabbix_server, zabbix_user, zabbix_pwd
+		elif opt == '-j':
+			json_mode = True
+		elif opt == '-g':
+			lld = True
+		elif opt == '-k':
+			chunk = int(arg)
+		elif opt == '-K':
+			mass_chunk = int(arg)
+		elif opt == '-t':
+			timeout = api.parseTimeout(arg)
+		elif opt == '-r':
+			retries = int(arg)
+	return zabbix_server, zabbix_user, zabbix_pwd, json_mode, lld, chunk, mass_chunk, timeout, retries
 
 
 def parseCluster(filepath):
@@ -59,105 +94,45 @@ def parseCluster(filepath):
 		hosts      dict     the information of hosts to be created
 		shards     list     the names of all the shards in the cluster(e.g. ['shard0', 'shard1', 'shard2', 'shard3'])
 	'''
-	hosts = defaultdict(list)
-	shards = []
 	with open(filepath, 'r') as f:
 		cluster = json.load(f)
-	# get mongos, config and all the shard
-	mongos_list = cluster['mongos']
-	config_list = cluster['config']
-	shard_list = cluster['shard']
-
-	for mongos in mongos_list:
-		m_ip = mongos['ip']
-		hosts[m_ip].append('mongos')
-
-	for config in config_list:
-		c_ip = config['ip']
-		hosts[c_ip].append('config')
-
-	for shard in shard_list:
-		s_name = shard['name']
-		shards.append(s_name)
-		s_mem = shard['members']
-		for m in s_mem:
-			m_ip = m['ip']
-			m_role = m['role']
-			hosts[m_ip].append(s_name + ' ' + m_role)
-	return hosts, shards
+	return clusterHosts(cluster)
 
 
-def zabbix_call(payload, zabbix_server):
-	'''Call zabbix web api by json-rpc.
-
-	Args:
-		payload        dict    the parameter to be passed  
-		zabbix_server  string  the ip of zabbix server 
-
-	Returns:
-		the request response object  
-	'''
-	url = "http://" + zabbix_server + "/zabbix/api_jsonrpc.php"
-	headers = {'content-type': 'application/json'}
-	response = requests.post(url, data=json.dumps(payload), headers=headers).json()
-	return response
-
-
-def zabbix_auth(user, pwd, zabbix_server):
+def zabbix_auth(zabbix, user, pwd):
 	'''Connect to zabbix server and authenticate by the given username and password.
 
 	Args:
-		user           string   the zabbix server username
-		pwd            string   the zabbix server password
-		zabbix_server  string   the ip of zabbix server
+		zabbix         ZabbixAPI  the client of the zabbix server
+		user           string     the zabbix server username
+		pwd            string     the zabbix server password
 
 	Returns:
 		the authentication token
 	'''
 	auth = ''
-	payload = {
-	    "method": "user.login",
-	    "params": {
-	    	"user": user,
-	    	"password": pwd
-	    },
-	    "jsonrpc": "2.0",
-	    "id": 1,
-	    "auth": None
-	}
-	res = zabbix_call(payload, zabbix_server) 
-	if 'result' in res :
-		auth = res['result']
-	else:
-		print(res['error'])
+	try:
+		auth = zabbix.login(user, pwd)
+	except api.ApiError as e:
+		print(e.error)
 	return auth
 
 
-def zabbix_create_group(auth, groupname, zabbix_server):
+def zabbix_create_group(zabbix, groupname):
 	'''Connect to zabbix server and create host group.
 
 	If the host group exists, it will be failed. And if it does not exist, then create it and return
 	the id of the host group.
 
 	Args:
-		auth           string   your authentication token
-		groupname      string   the name of the hostgroup
-		zabbix_server  string   the ip of zabbix server
+		zabbix         ZabbixAPI  the client of the zabbix server
+		groupname      string     the name of the hostgroup
 
 	Returns:
 		the host group id
 	'''
 	host_group_id = ''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "hostgroup.create",
-		"params": {
-		    "name": groupname
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("hostgroup.create", {"name": groupname})
 	if 'result' in res :
 		host_group_id = res['result']['groupids'][0]
 		print('create hostgroup:', groupname, 'successfully')
@@ -167,58 +142,18 @@ def zabbix_create_group(auth, groupname, zabbix_server):
 	return host_group_id
 
 
-def zabbix_import_template(auth, content, zabbix_server):
+def zabbix_import_template(zabbix, content):
 	'''Connect to zabbix server and import the MongoDB template.
 
 	Args:
-		auth          string   your authentication token
-		content       string   the content of the template file
-		zabbix_server string   the ip of zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		content       string     the content of the template file
 	'''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "configuration.import",
-		"params": {
-			"format": "xml",
-			"rules": {
-				"applications": {
-						"createMissing": True,
-						"deleteMissing": False
-				},
-				"templates": {
-					"createMissing": True,
-					"updateExisting": True
-				},
-				"screens": {
-					"createMissing": True,
-					"updateExisting": True
-				},
-				"valueMaps": {
-					"createMissing": True,
-					"updateExisting": False
-				},
-				"graphs": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				},
-				"triggers": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				},
-				"items": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				}
-			},
-			"source": content
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("configuration.import", {
+		"format": "xml",
+		"rules": provision.import_rules,
+		"source": content
+	})
 	if 'result' in res :
 		if res['result']:
 			print('template import successfully')
@@ -227,33 +162,25 @@ def zabbix_import_template(auth, content, zabbix_server):
 		print(res['error'])
 
 
-def zabbix_get_template(auth, templatename, zabbix_server):
+def zabbix_get_template(zabbix, templatename):
 	'''Connect to zabbix server and get the id of the template.
 
 	Args:
-		auth          string   your authentication token
-		templatename  string   the name of the template
-		zabbix_server string   the ip of zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		templatename  string     the name of the template
 
 	Returns:
 		the template id
 	'''
 	template_id = ''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "template.get",
-		"params": {
-			"output": "extend",
-			"filter": {
-				"host": [
-					templatename
-				]
-			}
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("template.get", {
+		"output": "extend",
+		"filter": {
+			"host": [
+				templatename
+			]
+		}
+	})
 	if 'result' in res :
 		template_id = res['result'][0]['templateid']
 	else:
@@ -261,103 +188,64 @@ def zabbix_get_template(auth, templatename, zabbix_server):
 	return template_id
 
 
-def zabbix_create_host(auth, hostname, hostip, host_group_id, zabbix_server):
-	'''Create host in zabbix.
+def zabbix_create_hosts(zabbix, hosts, host_group_id, chunk=provision.default_chunk):
+	'''Create hosts in zabbix, chunk hosts per host.create call.
+
+	A host that can not be created, e.g. because it already exists, is reported
+	and the other hosts of its call are created without it.
 
 	Args:
-		auth          string    your authentication token
-		hostname      string    the name of the host
-		hostip        string    the ip of the host
+		zabbix        ZabbixAPI the client of the zabbix server
+		hosts         list      the (name, ip) of the hosts
 		host_group_id string    the id of host group
-		zabbix_server string    the ip of zabbix server
+		chunk         int       the hosts of one call
 
 	Returns:
-		host_id      string   the id of the host
+		host name -> the id of the host, for the hosts created
 	'''
-	host_id = ''
-	payload = {
-	    "jsonrpc": "2.0",
-	    "method": "host.create",
-	    "params": {
-	        "host": hostname,
-	        "interfaces": [
-	            {
-	                "type": 1,
-	                "main": 1,
-	                "useip": 1,
-	                "ip": hostip,
-	                "dns": "",
-	                "port": "10050"
-	            }
-	        ],
-	        "groups": [
-	            {
-	                "groupid": host_group_id
-	            }
-	        ]
-	    },
-	    "auth": auth,
-	    "id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
-	if 'result' in res :
-		host_id = res['result']['hostids'][0]
-		print("create host:", hostname , "successfully")
-	else:
-		print('error in creating host:', hostname)
-		print(res['error'])
-	return host_id
+	items = [(hostname, {
+		"host": hostname,
+		"interfaces": [dict(provision.agent_interface, ip=hostip)],
+		"groups": [{"groupid": host_group_id}]
+	}) for hostname, hostip in hosts]
+	failures = []
+	host_ids = provision.callChunks(zabbix.call, 'host.create', items, chunk, failures)
+	print("create hosts:", len(host_ids), "successfully,", len(failures), "failed")
+	return host_ids
 
 
-def zabbix_link_template(auth, templateid, hostid, zabbix_server):
-	''' Connect to zabbix server and link templates to the host.
+def zabbix_link_templates(zabbix, links, chunk=provision.default_mass_chunk):
+	''' Connect to zabbix server and link every template to its hosts, chunk hosts per template.massadd call.
 
 	Args:
-		auth          string     the authentication token
-		templateid    string     the id of template to be linked
-		hostid        string     the id of the host
-		zabbix_server string     the ip of the zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		links         dict       the id of a template -> the (name, id) of the hosts to link it to
+		chunk         int        the hosts of one call
 	'''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "host.massadd",
-		"params": {
-			"hosts": [
-				{
-					"hostid": hostid
-				}
-			],
-			"templates": [
-				{
-					"templateid": templateid
-				}
-			]
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
-	if 'result' in res :
-		print("link template:", templateid, "for host:", hostid, "successfully")
-	else:
-		print("error in linking template")
-		print(res['error'])
+	failures = []
+	for templateid, hosts in links.items():
+		items = [(hostname, {"hostid": hostid}) for hostname, hostid in hosts]
+		provision.callChunks(zabbix.call, 'template.massadd', items, chunk, failures,
+			lambda hosts: {"templates": [{"templateid": templateid}], "hosts": hosts})
+	if failures:
+		print("error in linking templates for", len(failures), "hosts")
 
 
 def main(argv):
-	zabbix_server, user, pwd = parseArg(argv)
+	zabbix_server, user, pwd, json_mode, lld, chunk, mass_chunk, timeout, retries = parseArg(argv)
 	if zabbix_server == '':
 		print('invalid input!\nplease check and use python create_host_sh.py --help for more information\n')
 		sys.exit(2)
 
-	auth = zabbix_auth(user, pwd, zabbix_server)
+	zabbix = api.ZabbixAPI(zabbix_server, timeout, retries)
+	auth = zabbix_auth(zabbix, user, pwd)
 	if auth == '':
 		print('\nzabbix server authentication failed\n')
 		sys.exit()
 
 	# create host group
 	groupname = 'Mongodb Sh Cluster'
-	group_id = zabbix_create_group(auth, groupname, zabbix_server)
+	group_id = zabbix_create_group(zabbix, groupname)
 	if group_id == '':
 		print('can not complete creating all the hosts in your sharded cluster, please check and try again')
 		sys.exit()
@@ -366,41 +254,57 @@ def main(argv):
 	hosts, shards= parseCluster('./cluster.json')
 	# import template
 	template = {}
-	with open('./sh_mongos.xml', 'r') as f1: 
-		zabbix_import_template(auth, f1.read(), zabbix_server)
-	mongos_template_id = zabbix_get_template(auth, 'Template MongoDB Sh Mongos', zabbix_server)
+	suffix = '_json' if json_mode else ''
+	with open('./sh_mongos' + suffix + '.xml', 'r') as f1: 
+		zabbix_import_template(zabbix, f1.read())
+	mongos_template_id = zabbix_get_template(zabbix, 'Template MongoDB Sh Mongos')
 	template['mongos'] = mongos_template_id
-	with open('./sh_config.xml', 'r') as f2: 
-		zabbix_import_template(auth, f2.read(), zabbix_server)
-	config_template_id = zabbix_get_template(auth, 'Template MongoDB Sh Config', zabbix_server)
+	with open('./sh_config' + suffix + '.xml', 'r') as f2: 
+		zabbix_import_template(zabbix, f2.read())
+	config_template_id = zabbix_get_template(zabbix, 'Template MongoDB Sh Config')
 	template['config'] = config_template_id
-	with open('./sh_shard_na.xml','r') as f3:
-		shard_na = f3.read()
-	with open('./sh_shard_a.xml','r') as f4:
-		shard_a = f4.read()
-	for sh in shards:
-		sh_temp1 = shard_na.replace('shard', sh)
-		sh_content1 = sh_temp1.replace('Shard', sh.capitalize())
-		zabbix_import_template(auth, sh_content1, zabbix_server)
-		sh_template_id = zabbix_get_template(auth, 'Template MongoDB Sh ' + sh.capitalize() + ' Notarbiter', zabbix_server)
-		template[sh + ' not arbiter'] = sh_template_id
-		sh_temp2 = shard_a.replace('shard', sh)
-		sh_content2 = sh_temp2.replace('Shard', sh.capitalize())
-		zabbix_import_template(auth, sh_content2, zabbix_server)
-		sh_template_id = zabbix_get_template(auth, 'Template MongoDB Sh ' + sh.capitalize() + ' Arbiter', zabbix_server)
-		template[sh + ' arbiter'] = sh_template_id
+	if lld:
+		# one template for all the shards, its items are created by discovery
+		with open('./sh_shard' + suffix + '.xml', 'r') as f3:
+			zabbix_import_template(zabbix, f3.read())
+		shard_template_id = zabbix_get_template(zabbix, 'Template MongoDB Sh Shard')
+		for sh in shards:
+			template[sh + ' not arbiter'] = shard_template_id
+			template[sh + ' arbiter'] = shard_template_id
+	else:
+		with open('./sh_shard_na' + suffix + '.xml','r') as f3:
+			shard_na = f3.read()
+		with open('./sh_shard_a' + suffix + '.xml','r') as f4:
+			shard_a = f4.read()
+		for sh in shards:
+			sh_temp1 = shard_na.replace('shard', sh)
+			sh_content1 = sh_temp1.replace('Shard', sh.capitalize())
+			zabbix_import_template(zabbix, sh_content1)
+			sh_template_id = zabbix_get_template(zabbix, 'Template MongoDB Sh ' + sh.capitalize() + ' Notarbiter')
+			template[sh + ' not arbiter'] = sh_template_id
+			sh_temp2 = shard_a.replace('shard', sh)
+			sh_content2 = sh_temp2.replace('Shard', sh.capitalize())
+			zabbix_import_template(zabbix, sh_content2)
+			sh_template_id = zabbix_get_template(zabbix, 'Template MongoDB Sh ' + sh.capitalize() + ' Arbiter')
+			template[sh + ' arbiter'] = sh_template_id
 
 	# create hosts and link templates
 	try:
+		host_ids = zabbix_create_hosts(zabbix, [('sh_' + host, host) for host in hosts], group_id, chunk)
+		links = {}
 		for host in hosts:
 			hostname = 'sh_' + host
-			host_id = zabbix_create_host(auth, hostname, host, group_id, zabbix_server)
-			if host_id != '':
-				for component in hosts[host]:
-					zabbix_link_template(auth, template[component], host_id, zabbix_server)
+			if hostname not in host_ids:
+				continue
+			# with -g the members of several shards on a host share one template
+			for template_id in set(template[component] for component in hosts[host]):
+				links.setdefault(template_id, []).append((hostname, host_ids[hostname]))
+		zabbix_link_templates(zabbix, links, mass_chunk)
 	except Exception as e:
 		print(e)
 		print('can not complete creating all the hosts in your sharded cluster, please check and try again')
+	zabbix.printLatency()
+	zabbix.close()
 
 
 if __name__ == '__main__':
@@ -4,70 +4,25 @@
 '''
 '@file mongodb_sh_noauth.py
 '@author liyunting
-'@version 1
-'@lastModify: 2019-02-17 15:18
+'@version 3
+'@lastModify: 2026-10-18 22:10
 '
 '''
 
 import json
-import sys, getopt
-import subprocess
-from pymongo import *
-from pymongo.errors import ConnectionFailure
-from pymongo.errors import OperationFailure
+import sys
+import os
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import cycle
+from mongodb_zabbix import discovery
+from mongodb_zabbix import inventory
+from mongodb_zabbix import tracing
+from mongodb_zabbix.scheduler import run
 
-#the prefix of hosts that are created
-hostname_first = 'sh_'
 
-
-def getServerStatus(ip, port):
-	'''Get the serverStatus of the mongos or mongod instance.
-
-	Try to get the information of mongodb server by command.
-	You can refer to MongoDB manual for more details about serverStatus command.
-
-	Args:
-		ip    string   the server ip that the mongos or mongod instance is located
-		port  int      the port that is used by the monhos or mongod instance
-
-	Returns:
-		status code    int    0/1/2
-		server_status  dict   the status result
-	'''
-	server_status = {}
-	try:
-		client = MongoClient(ip, port)
-		db = client.admin
-		is_master = db.command('ismaster')
-		server_status = db.command('serverStatus')
-		return 0, server_status
-	except ConnectionFailure:
-		return 1, server_status
-	except OperationFailure:
-		return 2, server_status
-
-
-def getArbiterStatus(ip, port):
-	'''Get the status of an arbiter.
-
-	Try to get the information of mongodb server by command.
-	You can refer to MongoDB manual for more details about ismaster command.
-
-	Args:
-		ip    string   the ip of the arbiter
-		port  int      the port that is used by the arbiter
-
-	Returns:
-		status code    int    0/1
-	'''
-	try:
-		client = MongoClient(ip, port)
-		db = client.admin
-		is_master = db.command('ismaster')
-		return 0
-	except ConnectionFailure:
-		return 1
+#the inventory of the sharded cluster, when it is not discovered
+cluster_file = '/root/liyunting/cluster.json'
 
 
 def parseArg(argv):
@@ -77,121 +32,74 @@ def parseArg(argv):
 		argv   string  command line arguments
 
 	Returns:
-		zabbix_server  string  the ip of zabbix server
+		options        Options the options shared by the collectors, see mongodb_zabbix/cycle.py
+		cluster_path   string  the inventory of the sharded cluster
+		seeds          list    the seed mongos to discover the cluster from, {'ip', 'port'}
+		ttl            float   the seconds a discovered topology is reused
 	'''
-	zabbix_server = ''
-	try:
-		opts, args = getopt.getopt(argv,"hz:",["help"])
-	except getopt.GetoptError:
-		print('invalid option\nplease use python mongodb_sh_noauth.py --help for more information\n')
-		sys.exit(2)
+	cluster_path = cluster_file
+	seeds = []
+	ttl = discovery.default_ttl
+	options, opts = cycle.parseOptions(argv, __file__, '', '[-c <cluster_file> | -s <mongos_ip:port,...> [-e <ttl>]]', 'c:s:e:',
+		groups=(cycle.parallel, cycle.lld), help=[
+			'-c is the json file that describes the sharded cluster, default: ' + cluster_file,
+			'with -s the cluster is discovered from the given mongos instead, and discovered again every <ttl> seconds, default: ' + str(discovery.default_ttl)
+		])
 	for opt, arg in opts:
-		if opt in ('-h', '--help'):
-			print('usage:\n  python mongodb_sh_noauth.py -z <zabbix_server_ip>\n')
-			sys.exit()
-		elif opt == '-z':
-			zabbix_server = arg
-	return zabbix_server
-
-
-def send_value(item_key, zabbix_server, item_value, zabbix_host):
-	'''Send certain value to a zabbix host by zabbix_sender process.
-
-	Args:
-		item_key      string   the key of a certain zabbix item
-		zabbix_server string   the ip of zabbix server
-		item_value    string   the value to be send to zabbix server
-		zabbix_host   string   the hostname in zabbix
+		if opt == '-c':
+			cluster_path = arg
+		elif opt == '-s':
+			seeds = [discovery.parseHost(h) for h in arg.split(',') if h]
+		elif opt == '-e':
+			ttl = float(arg)
+	return options, cluster_path, seeds, ttl
+
+
+def collect(batch, options, topology, cluster):
+	'''Run one collection cycle: get the status of all the components of the sharded cluster and send them to zabbix server.
+
+	The nodes are polled in parallel by at most options.workers threads, only
+	those of the zabbix hosts that fall to this collector when options.share is
+	given. With a topology the cluster is the one it discovered, otherwise the
+	one read from the file. With options.lld the shard members are keyed for
+	sh_shard.xml and the discovery data of their hosts is sent along.
+	Polling stops options.deadline seconds after the cycle started: what was
+	collected by then is sent, and the nodes still polled are reported as timed out.
 	'''
-	send = subprocess.getstatusoutput('zabbix_sender -z ' + zabbix_server + ' -s ' + zabbix_host + ' -k ' + item_key + ' -o ' + item_value)
-	print(send[1])
-	if send[0] == 0:
-		print('\n', item_key, zabbix_host, 'send successfully\n')
-	else:
-		print('\n', item_key, zabbix_host, 'failed to send\n')
-
-
-def process_notarbiter(ip, port, zabbix_server, hostname, component):
-	'''Get the status data from a not arbiter component(e.g. mongos, config, shard1 not arbiter) of the sharded cluster and send them to zabbix server.
-
-	And you can refer to MongoDB manual for more details about the returns of serverStatus command.
-
-	Args:
-		ip            string   the ip of mongo server
-		port          int      the port of mongo server
-		zabbix_server string   the ip of zabbix server
-		hostname      string   the host name in zabbix
-		component     string   the name of the component(e.g. mongos, config, shard0)
-	'''
-	status_result =  getServerStatus(ip, port)
-	if status_result[0]  == 0:
-		send_value(component + '.alive', zabbix_server, str(1), hostname)
-		send_value(component + '.conn.current', zabbix_server, str(status_result[1]['connections']['current']), hostname)
-		send_value(component + '.network.in', zabbix_server, str(status_result[1]['network']['bytesIn']), hostname)
-		send_value(component + '.network.out', zabbix_server, str(status_result[1]['network']['bytesOut']), hostname)
-		send_value(component + '.op.delete', zabbix_server, str(status_result[1]['opcounters']['delete']), hostname)
-		send_value(component + '.op.getmore', zabbix_server, str(status_result[1]['opcounters']['getmore']), hostname)
-		send_value(component + '.op.insert', zabbix_server, str(status_result[1]['opcounters']['insert']), hostname)
-		send_value(component + '.op.query', zabbix_server, str(status_result[1]['opcounters']['query']), hostname)
-		send_value(component + '.op.update', zabbix_server, str(status_result[1]['opcounters']['update']), hostname)
-		send_value(component + '.uptime', zabbix_server, str(status_result[1]['uptime']), hostname)
-		send_value(component + '.version', zabbix_server, str(status_result[1]['version']), hostname)
-	elif status_result[0]  == 1:
-		send_value(component + '.alive', zabbix_server, str(0), hostname)
-		print('Cound not connect to the server', ip, str(port))
-	else:
-		print('\nCound not get the server status', ip, str(port))
-
-
-def process_arbiter(ip, port, zabbix_server, hostname, component):
-	'''Get the status data from an arbiter component of the sharded cluster and send them to zabbix server.
-
-	Args:
-		ip            string   the ip of mongo server
-		port          int      the port of mongo server
-		zabbix_server string   the ip of zabbix server
-		hostname      string   the host name in zabbix
-		component     string   the name of the component
-	'''
-	status =  getArbiterStatus(ip, port)
-	if status  == 0:
-		send_value(component + '.alive', zabbix_server, str(1), hostname)
-	elif status  == 1:
-		send_value(component + '.alive', zabbix_server, str(0), hostname)
-		print('Cound not connect to the server', ip, str(port))
+	start = cycle.begin()
+	if topology is not None:
+		with tracing.span('discover'):
+			cluster = topology.get(options.workers)
+		if cluster is None:
+			print('Cound not discover the sharded cluster')
+			cycle.abort()
+			return
+	targets = inventory.clusterTargets(cluster, batch, lld=options.lld)
+	if options.share is not None:
+		targets = options.share.select(targets)
+	inventory.shardDiscovery(targets, batch)
+	inventory.pollTargets(targets, batch, start + options.deadline, options.workers)
+	cycle.finish(batch, options, start)
 
 
 # the main method 
 def main(argv):
-	zabbix_server = parseArg(argv)
-	if zabbix_server == '':
+	options, cluster_path, seeds, ttl = parseArg(argv)
+	if options.zabbix_server == '':
 		print('invalid input!\nplease check and use python mongodb_sh_noauth.py --help for more information\n')
 		sys.exit(2)
 
-	with open('/root/liyunting/cluster.json', 'r') as f:
-		cluster = json.load(f)
-
-	mongos_list = cluster["mongos"]
-	config_list = cluster["config"]
-	shard_list = cluster["shard"]
-
-	for mongos in mongos_list:
-		process_notarbiter(mongos['ip'], mongos['port'], zabbix_server, hostname_first + mongos['ip'], 'mongos')
+	batch = cycle.setup(options, __file__)
 
-	for config in config_list:
-		process_notarbiter(config['ip'], config['port'], zabbix_server, hostname_first + config['ip'], 'config')
-
-	for shard in shard_list:
-		name = shard['name']
-		members = shard['members']
-		for m in members:
-			if m['role'] == 'not arbiter':
-				process_notarbiter(m['ip'], m['port'], zabbix_server, hostname_first + m['ip'], name)
-			if m['role'] == 'arbiter':
-				process_arbiter(m['ip'], m['port'], zabbix_server, hostname_first + m['ip'], name)
+	topology = None
+	cluster = None
+	if seeds:
+		topology = discovery.ClusterDiscovery(seeds, ttl=ttl)
+	else:
+		with open(cluster_path, 'r') as f:
+			cluster = json.load(f)
+	run(collect, options.interval, batch, options, topology, cluster)
 
 
 if __name__ == '__main__':
 	main(sys.argv[1:])
-
-
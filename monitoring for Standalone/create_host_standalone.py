@@ -4,64 +4,40 @@
 '''
 '@file: create_host_standalone.py
 '@author: liyunting
-'@version: 2
-'@lastModify: 2019-02-14 14:44
+'@version: 4
+'@lastModify: 2026-10-18 12:21
 '
 '''
 
-import json
 import sys
 import getopt
-import requests
+import os
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import api
+from mongodb_zabbix import provision
 
-def zabbix_call(payload, zabbix_server):
-	''' Call zabbix web api by json-rpc.
 
-	Args:
-		payload        dict    the parameter to be passed  
-		zabbix_server  string  the ip of zabbix server 
-
-	Returns:
-		the request response object  
-	'''
-	url = "http://" + zabbix_server + "/zabbix/api_jsonrpc.php"
-	headers = {'content-type': 'application/json'}
-	response = requests.post(url, data=json.dumps(payload), headers=headers).json()
-	return response
-
-
-def zabbix_auth(user, pwd, zabbix_server):
+def zabbix_auth(zabbix, user, pwd):
 	'''Connect to zabbix server and authenticate by the given username and password.
 
 	Args:
-		user           string   the zabbix server username
-		pwd            string   the zabbix server password
-		zabbix_server  string   the ip of zabbix server
+		zabbix         ZabbixAPI  the client of the zabbix server
+		user           string     the zabbix server username
+		pwd            string     the zabbix server password
 
 	Returns:
 		the authentication token
 	'''
 	auth = ''
-	payload = {
-		"method": "user.login",
-		"params": {
-			"user": user,
-			"password": pwd
-		},
-		"jsonrpc": "2.0",
-		"id": 1,
-		"auth": None
-	}
-	res = zabbix_call(payload, zabbix_server) 
-	if 'result' in res :
-		auth = res['result']
-	else:
-		print(res['error'])
+	try:
+		auth = zabbix.login(user, pwd)
+	except api.ApiError as e:
+		print(e.error)
 	return auth
 
 
-def zabbix_create_group(auth, groupname, zabbix_server):
+def zabbix_create_group(zabbix, groupname):
 	'''Connect to zabbix server and create host group.
 
 	Firstly, check whether the host group exists. If it exists, then return 
@@ -69,46 +45,29 @@ def zabbix_create_group(auth, groupname, zabbix_server):
 	the id of the host group.
 
 	Args:
-		auth           string   your authentication token
-		groupname      string   the name of the hostgroup
-		zabbix_server  string   the ip of zabbix server
+		zabbix         ZabbixAPI  the client of the zabbix server
+		groupname      string     the name of the hostgroup
 
 	Returns:
 		the host group id
 	'''
 	host_group_id = ''
 	#try to get the host group id
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "hostgroup.get",
-		"params": {
-			"output": "extend",
-			"filter": {
-				"name": [
-					groupname,
-				]
-			}
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("hostgroup.get", {
+		"output": "extend",
+		"filter": {
+			"name": [
+				groupname,
+			]
+		}
+	})
 	if 'result' in res and len(res['result']) > 0:
 		host_group_id = res['result'][0]['groupid']
 		print('the hostgroup:', groupname, 'already exists')
 	else :
 		#The host group does not exist
 		#Then create host group
-		payload = {
-			"jsonrpc": "2.0",
-			"method": "hostgroup.create",
-			"params": {
-				"name": groupname
-			},
-			"auth": auth,
-			"id": 1
-		}
-		res = zabbix_call(payload, zabbix_server)
+		res = zabbix.request("hostgroup.create", {"name": groupname})
 		if 'result' in res :
 			host_group_id = res['result']['groupids'][0]
 			print('create hostgroup:', groupname, 'successfully')
@@ -118,60 +77,20 @@ def zabbix_create_group(auth, groupname, zabbix_server):
 	return host_group_id
 
 
-def zabbix_import_template(auth, filepath, zabbix_server):
+def zabbix_import_template(zabbix, filepath):
 	'''Connect to zabbix server and import the MongoDB template.
 
 	Args:
-		auth          string   your authentication token
-		filepath      string   the whole path of the xml file(e.g. '/root/liyunting/example.xml')
-		zabbix_server string   the ip of zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		filepath      string     the whole path of the xml file(e.g. '/root/liyunting/example.xml')
 	'''
 	with open(filepath,'r') as f:
 		content = f.read()
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "configuration.import",
-		"params": {
-			"format": "xml",
-			"rules": {
-				"applications": {
-						"createMissing": True,
-						"deleteMissing": False
-				},
-				"templates": {
-					"createMissing": True,
-					"updateExisting": True
-				},
-				"screens": {
-					"createMissing": True,
-					"updateExisting": True
-				},
-				"valueMaps": {
-					"createMissing": True,
-					"updateExisting": False
-				},
-				"graphs": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				},
-				"triggers": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				},
-				"items": {
-					"createMissing": True,
-					"updateExisting": True,
-					"deleteMissing": True
-				}
-			},
-			"source": content
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("configuration.import", {
+		"format": "xml",
+		"rules": provision.import_rules,
+		"source": content
+	})
 	if 'result' in res :
 		if res['result']:
 			print('template import successfully')
@@ -180,33 +99,25 @@ def zabbix_import_template(auth, filepath, zabbix_server):
 		print(res['error'])
 
 
-def zabbix_get_template(auth, templatename, zabbix_server):
+def zabbix_get_template(zabbix, templatename):
 	'''Connect to zabbix server and get the id of the template.
 
 	Args:
-		auth          string   your authentication token
-		templatename  string   the name of the template
-		zabbix_server string   the ip of zabbix server
+		zabbix        ZabbixAPI  the client of the zabbix server
+		templatename  string     the name of the template
 
 	Returns:
 		the template id
 	'''
 	template_id = ''
-	payload = {
-		"jsonrpc": "2.0",
-		"method": "template.get",
-		"params": {
-		    "output": "extend",
-		    "filter": {
-		        "host": [
-		            templatename
-		        ]
-		    }
-		},
-		"auth": auth,
-		"id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("template.get", {
+		"output": "extend",
+		"filter": {
+			"host": [
+				templatename
+			]
+		}
+	})
 	if 'result' in res :
 		template_id = res['result'][0]['templateid']
 	else:
@@ -214,50 +125,31 @@ def zabbix_get_template(auth, templatename, zabbix_server):
 	return template_id
 
 
-def zabbix_create_host(auth, hostname, hostip, host_group_id, template_id, zabbix_server):
+def zabbix_create_host(zabbix, hostname, hostip, host_group_id, template_id):
 	'''Create host and link template.
 
 	Args:
-		auth          string    your authentication token
+		zabbix        ZabbixAPI the client of the zabbix server
 		hostname      string    the name of the host to be created
 		hostip        string    the ip of the host to be created
 		host_group_id string    the id of host group
 		template_id   string    the id of template
-		zabbix_server string    the ip of zabbix server
 	'''
-	host_id = ''
-	payload = {
-	    "jsonrpc": "2.0",
-	    "method": "host.create",
-	    "params": {
-	        "host": hostname,
-	        "interfaces": [
-	            {
-	                "type": 1,
-	                "main": 1,
-	                "useip": 1,
-	                "ip": hostip,
-	                "dns": "",
-	                "port": "10050"
-	            }
-	        ],
-	        "groups": [
-	            {
-	                "groupid": host_group_id
-	            }
-	        ],
-	        "templates": [
-	            {
-	                "templateid": template_id
-	            }
-	        ]		        
-	    },
-	    "auth": auth,
-	    "id": 1
-	}
-	res = zabbix_call(payload, zabbix_server)
+	res = zabbix.request("host.create", {
+		"host": hostname,
+		"interfaces": [dict(provision.agent_interface, ip=hostip)],
+		"groups": [
+			{
+				"groupid": host_group_id
+			}
+		],
+		"templates": [
+			{
+				"templateid": template_id
+			}
+		]
+	})
 	if 'result' in res :
-		host_id = res['result']['hostids'][0]
 		print("create host:", hostname , "successfully")
 	else:
 		print('error in creating host:', hostname)
@@ -275,20 +167,29 @@ def parseArg(argv):
 		zabbix_user    string  the user of zabbix, default: Admin
 		zabbix_pwd     string  password for user, default: zabbix
 		mongo_ip       string  the ip of mongo server
+		json_mode      bool    import the json mode templates, see mongodb_zabbix/templates.py
+		timeout        tuple   the (connect, read) timeout of an api call in seconds
+		retries        int     the retries of an api call whose connection failed
 	'''
 	zabbix_user = 'Admin'
 	zabbix_pwd = 'zabbix'
 	zabbix_server = ''
+	json_mode = False
 	mongo_ip = ''
+	timeout = api.default_timeout
+	retries = api.default_retries
 	try:
-		opts, args = getopt.getopt(argv,"hz:u:p:m:",["help"])
+		opts, args = getopt.getopt(argv,"hz:u:p:m:jt:r:",["help"])
 	except getopt.GetoptError:
 		print('invalid option\nplease use python create_host_standalone.py --help for more information\n')
 		sys.exit(2)
 	for opt, arg in opts:
 		if opt in ('-h', '--help'):
-			print('usage:\n  python create_host_standalone.py -z <zabbix_server_ip> -u <zabbix_user> -p <zabbix_password> -m <mongodb_ip>\n')
+			print('usage:\n  python create_host_standalone.py -z <zabbix_server_ip> -u <zabbix_user> -p <zabbix_password> -m <mongodb_ip> [-j] [-t <timeout>] [-r <retries>]\n')
 			print('  if no user and password input, then user:Admin and password:zabbix will be used by default')
+			print('  -j imports the *_json.xml templates, whose items depend on one <prefix>.json item, for the collectors run with -j')
+			print('  -t is the timeout of an api call in seconds, <seconds> or <connect>,<read>, default: %g,%g' % api.default_timeout)
+			print('  -r is the number of times an api call whose connection failed, or a read-only one that got 502/503 from a proxy, is retried, default: ' + str(api.default_retries))
 			sys.exit()
 		elif opt == '-z':
 			zabbix_server = arg
@@ -296,30 +197,38 @@ def parseArg(argv):
 			zabbix_user = arg
 		elif opt == '-p':
 			zabbix_pwd = arg
+		elif opt == '-j':
+			json_mode = True
 		elif opt == '-m':
 			mongo_ip = arg
-	return zabbix_server, zabbix_user, zabbix_pwd, mongo_ip
+		elif opt == '-t':
+			timeout = api.parseTimeout(arg)
+		elif opt == '-r':
+			retries = int(arg)
+	return zabbix_server, zabbix_user, zabbix_pwd, mongo_ip, json_mode, timeout, retries
 
 
 # the main method
 def main(argv):
-	zabbix_server, user, pwd, mongo_ip = parseArg(argv)
+	zabbix_server, user, pwd, mongo_ip, json_mode, timeout, retries = parseArg(argv)
 	if zabbix_server == '' or mongo_ip == '':
 		print('invalid input!\nplease check and use python create_host_standalone.py --help for more information\n')
 		sys.exit(2)
 
-	auth = zabbix_auth(user, pwd, zabbix_server)
+	zabbix = api.ZabbixAPI(zabbix_server, timeout, retries)
+	auth = zabbix_auth(zabbix, user, pwd)
 	if auth == '':
 		print('\nzabbix server authentication failed\n')
 		sys.exit()
 
 	#import template and get its id
-	zabbix_import_template(auth, './mongo_standalone.xml', zabbix_server)
-	template_id = zabbix_get_template(auth, 'Template DB MongoDB', zabbix_server)
+	suffix = '_json' if json_mode else ''
+	zabbix_import_template(zabbix, './mongo_standalone' + suffix + '.xml')
+	template_id = zabbix_get_template(zabbix, 'Template DB MongoDB')
 
 	#create host group 'Mongodb Standalone'
 	hostgroup = 'Mongodb Standalone'
-	group_id = zabbix_create_group(auth, hostgroup, zabbix_server)
+	group_id = zabbix_create_group(zabbix, hostgroup)
 
 	#if import template and create host group successfully
 	#then create host 'mongo_server'
@@ -327,9 +236,11 @@ def main(argv):
 		#create host named by ip with prefix 'mongo_' and and link 'Template DB MongoDB'
 		hostname_first = 'mongo_'
 		hostname = hostname_first + mongo_ip
-		zabbix_create_host(auth, hostname, mongo_ip, group_id, template_id, zabbix_server)
+		zabbix_create_host(zabbix, hostname, mongo_ip, group_id, template_id)
 	else :
 		print("can not complete creating the host, please check and try again")
+	zabbix.printLatency()
+	zabbix.close()
 
 
 if __name__ == '__main__':
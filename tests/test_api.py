@@ -0,0 +1,73 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_api.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:21
+'
+'''
+
+import json
+import os
+import sys
+import threading
+import unittest
+
+try:
+	from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+	from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import api
+
+
+class FakeProxy(BaseHTTPRequestHandler):
+	'''A proxy in front of the zabbix api that replies 502 to the first calls, after zabbix applied them.'''
+
+	def do_POST(self):
+		request = json.loads(self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8'))
+		server = self.server
+		server.applied.append(request['method'])
+		if len(server.applied) <= server.failures:
+			body = b'<html>502 Bad Gateway</html>'
+			self.send_response(502)
+		else:
+			body = json.dumps({'jsonrpc': '2.0', 'result': [], 'id': request['id']}).encode('utf-8')
+			self.send_response(200)
+		self.send_header('Content-Length', str(len(body)))
+		self.end_headers()
+		self.wfile.write(body)
+
+	def log_message(self, *args):
+		pass
+
+
+class TestRetries(unittest.TestCase):
+
+	def setUp(self):
+		self.server = HTTPServer(('127.0.0.1', 0), FakeProxy)
+		self.server.applied = []
+		self.server.failures = 1
+		thread = threading.Thread(target=self.server.serve_forever)
+		thread.daemon = True
+		thread.start()
+		self.addCleanup(self.server.server_close)
+		self.addCleanup(self.server.shutdown)
+		self.api = api.ZabbixAPI('http://127.0.0.1:%d/api_jsonrpc.php' % self.server.server_address[1], retries=2)
+		self.addCleanup(self.api.close)
+		api.retry_backoff, backoff = 0.01, api.retry_backoff
+		self.addCleanup(setattr, api, 'retry_backoff', backoff)
+
+	def test_read_only_call_is_retried_on_502(self):
+		self.assertEqual(self.api.call('host.get', {}), [])
+		self.assertEqual(self.server.applied, ['host.get', 'host.get'])
+
+	def test_call_that_changes_zabbix_is_made_once(self):
+		self.assertRaises(ValueError, self.api.call, 'host.create', [])
+		self.assertEqual(self.server.applied, ['host.create'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,102 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_connection.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 12:19
+'
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import connection
+from mongodb_zabbix import inventory
+
+
+class FakeClient(object):
+	'''Stands for a MongoClient, counting the logins a new one would make.'''
+
+	created = 0
+
+	def __init__(self):
+		FakeClient.created += 1
+		self.closed = False
+
+	def close(self):
+		self.closed = True
+
+
+class FakeManager(connection.ConnectionManager):
+
+	def create(self, ip, port, user, pwd):
+		return FakeClient()
+
+
+class FakeBatch(object):
+
+	json_mode = False
+
+	def add(self, zabbix_host, item_key, item_value, clock=None):
+		pass
+
+
+def poll(ip, port, user):
+	connection.get_client(ip, port, user, 'secret')
+
+
+class TestConnectionCache(unittest.TestCase):
+
+	def setUp(self):
+		self.saved = connection.manager
+		connection.manager = FakeManager()
+		FakeClient.created = 0
+
+	def tearDown(self):
+		connection.manager = self.saved
+
+	def targets(self, count):
+		return [('host%d' % i, 'mongo', poll, ('10.0.%d.%d' % (i // 250, i % 250), 27017, 'admin')) for i in range(count)]
+
+	def test_fleet_above_the_default_cap_reuses_its_clients(self):
+		count = connection.manager.max_clients + 164
+		targets = self.targets(count)
+		for cycle in range(3):
+			inventory.pollTargets(targets, FakeBatch(), workers=4)
+		stats = connection.stats()
+		self.assertEqual(FakeClient.created, count)
+		self.assertEqual(stats['misses'], count)
+		self.assertEqual(stats['hits'], 2 * count)
+		self.assertEqual(stats['evictions'], 0)
+		self.assertEqual(stats['clients'], count)
+
+	def test_cap_falls_back_to_base_sockets(self):
+		inventory.pollTargets(self.targets(10), FakeBatch(), workers=4)
+		self.assertEqual(connection.stats()['max_clients'], connection.base_sockets // connection.sockets_per_client)
+
+	def test_cap_never_exceeds_max_sockets(self):
+		connection.set_max_sockets(600)
+		targets = self.targets(400)
+		for cycle in range(2):
+			inventory.pollTargets(targets, FakeBatch(), workers=4)
+		stats = connection.stats()
+		self.assertEqual(stats['max_clients'], 300)
+		self.assertEqual(stats['clients'], 300)
+		self.assertGreater(stats['evictions'], 0)
+
+	def test_least_recently_used_client_is_closed_above_the_cap(self):
+		manager = FakeManager(max_sockets=4)
+		first = manager.get('10.0.0.1', 27017)
+		manager.get('10.0.0.2', 27017)
+		manager.get('10.0.0.1', 27017)
+		manager.get('10.0.0.3', 27017)
+		self.assertFalse(first.closed)
+		self.assertEqual(manager.stats()['evictions'], 1)
+		self.assertEqual(sorted(k[0] for k in manager.clients), ['10.0.0.1', '10.0.0.3'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,68 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_cycle.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:11
+'
+'''
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import cycle
+from mongodb_zabbix import instrument
+from mongodb_zabbix.sender import SendResult, ZabbixBatch
+
+
+class FakeSender(object):
+	'''Stands for a ZabbixSender, recording the values of every send.'''
+
+	chunk_size = 250
+
+	def __init__(self):
+		self.sends = []
+
+	def send(self, items):
+		self.sends.append(list(items))
+		return SendResult(len(items), 0, len(items))
+
+
+class TestFinish(unittest.TestCase):
+
+	def setUp(self):
+		instrument.stats.reset()
+		self.addCleanup(instrument.stats.reset)
+		self.batch = ZabbixBatch('127.0.0.1')
+		self.batch.sender = FakeSender()
+		self.options = cycle.Options(collector_host='collector', interval=0, deadline=10)
+
+	def test_one_send_with_the_collector_items(self):
+		for cycles in range(2):
+			start = cycle.begin()
+			with instrument.timer('poll'):
+				self.batch.add('mongo_127.0.0.1', 'mongo.alive', '1')
+			cycle.finish(self.batch, self.options, start)
+		sends = self.batch.sender.sends
+		self.assertEqual(len(sends), 2)
+		keys = [item[1] for item in sends[1] if item[0] == 'collector']
+		self.assertIn('collector.poll.count', keys)
+		self.assertIn('collector.cycle.duration', keys)
+		# the send of a cycle is reported with the next one
+		self.assertNotIn('collector.send.count', [item[1] for item in sends[0]])
+		self.assertIn('collector.send.count', keys)
+		self.assertEqual(len(self.batch), 0)
+
+	def test_no_collector_items_without_host(self):
+		self.options.collector_host = ''
+		self.batch.add('mongo_127.0.0.1', 'mongo.alive', '1')
+		cycle.finish(self.batch, self.options, time.time())
+		self.assertEqual([item[1] for item in self.batch.sender.sends[0]], ['mongo.alive'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,72 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_inventory.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:13
+'
+'''
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import inventory
+
+
+class TestFleetLoad(unittest.TestCase):
+
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		self.write('standalone0.json', {'ip': '127.0.0.1', 'port': 27017})
+		self.write('cluster0.json', {'seeds': ['127.0.0.1:20000']})
+
+	def write(self, name, doc):
+		path = os.path.join(self.path, name)
+		with open(path, 'w') as f:
+			f.write(doc if isinstance(doc, str) else json.dumps(doc))
+
+	def names(self, fleet):
+		return [entry[0] for entry in fleet.inventories]
+
+	def test_added_changed_and_removed_files(self):
+		fleet = inventory.Fleet(self.path)
+		self.assertEqual(self.names(fleet), ['cluster0.json', 'standalone0.json'])
+		topology = fleet.inventories[0][3]
+
+		self.write('standalone1.json', {'ip': '127.0.0.2', 'port': 27017})
+		self.write('standalone0.json', {'ip': '127.0.0.1', 'port': 27018})
+		os.remove(os.path.join(self.path, 'cluster0.json'))
+		fleet.load()
+		self.assertEqual(self.names(fleet), ['standalone0.json', 'standalone1.json'])
+		self.assertEqual(fleet.inventories[0][2]['port'], 27018)
+
+		self.write('cluster0.json', {'seeds': ['127.0.0.1:20000']})
+		fleet.load()
+		self.assertIsNot(fleet.inventories[0][3], topology)
+
+	def test_unchanged_files_keep_their_topology(self):
+		fleet = inventory.Fleet(self.path)
+		topology = fleet.inventories[0][3]
+		fleet.load()
+		self.assertIs(fleet.inventories[0][3], topology)
+
+	def test_unparsable_file_keeps_its_previous_inventory(self):
+		fleet = inventory.Fleet(self.path)
+		self.write('standalone0.json', '{"ip": "127.0.0.1", "po')
+		fleet.load()
+		self.assertEqual(self.names(fleet), ['cluster0.json', 'standalone0.json'])
+		self.assertEqual(fleet.inventories[1][2]['port'], 27017)
+		self.write('standalone0.json', {'ip': '127.0.0.1', 'port': 27019})
+		fleet.load()
+		self.assertEqual(fleet.inventories[1][2]['port'], 27019)
+
+
+if __name__ == '__main__':
+	unittest.main()
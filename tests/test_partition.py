@@ -0,0 +1,41 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_partition.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:13
+'
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix.partition import parsePartition
+
+
+class TestParsePartition(unittest.TestCase):
+
+	def test_no_options_polls_everything(self):
+		self.assertIsNone(parsePartition(None, None, '', ''))
+
+	def test_index_and_count(self):
+		share = parsePartition(1, 3, '', '')
+		self.assertEqual(share.me, '1')
+
+	def test_peers_and_peer(self):
+		share = parsePartition(None, None, 'a,b,c', 'b')
+		self.assertEqual(share.me, 'b')
+
+	def test_incomplete_pairs_are_refused(self):
+		for args in [(None, 3, '', ''), (0, None, '', ''), (None, None, 'a,b', ''), (None, None, '', 'a')]:
+			self.assertRaises(ValueError, parsePartition, *args)
+
+	def test_both_pairs_are_refused(self):
+		self.assertRaises(ValueError, parsePartition, 0, 2, 'a,b', 'a')
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,62 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_pool.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:12
+'
+'''
+
+import os
+import subprocess
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import pool
+from mongodb_zabbix import scheduler
+
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# a collector run once whose only node hangs for 10 seconds past a 0.3 second deadline
+hung_run = '''
+import sys, time
+sys.path.insert(0, %r)
+from mongodb_zabbix import pool
+from mongodb_zabbix.scheduler import run
+
+def cycle():
+	late = pool.pollUntil([(('10.0.0.1', 27017), time.sleep, (10,))], time.time() + 0.3)
+	print('late', len(late))
+
+run(cycle, 0)
+''' % root
+
+
+class TestPollUntil(unittest.TestCase):
+
+	def tearDown(self):
+		pool.shutdown()
+
+	def test_late_tasks_are_reported(self):
+		start = time.time()
+		late = pool.pollUntil([(('a', 1), time.sleep, (0.5,)), (('b', 1), time.sleep, (0,))], start + 0.1, 2)
+		self.assertLess(time.time() - start, 0.3)
+		self.assertEqual(late, set([('a', 1)]))
+		# still running, so not polled again by the next cycle
+		self.assertEqual(pool.pollUntil([(('a', 1), time.sleep, (0,))], time.time() + 0.1), set([('a', 1)]))
+
+	def test_run_once_does_not_wait_for_hung_polls(self):
+		self.addCleanup(os.remove, scheduler.lockPath(['-c']))
+		start = time.time()
+		out = subprocess.check_output([sys.executable, '-c', hung_run], cwd=root, universal_newlines=True)
+		self.assertLess(time.time() - start, 5)
+		self.assertIn('late 1', out)
+		self.assertIn('exiting without waiting for 1 polls still running', out)
+
+
+if __name__ == '__main__':
+	unittest.main()
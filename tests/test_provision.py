@@ -0,0 +1,62 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_provision.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:20
+'
+'''
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import provision
+from mongodb_zabbix.api import ApiError
+
+
+class FakeApi(object):
+	'''Stands for ZabbixAPI.call, failing every call that holds a bad host, or every call at all.'''
+
+	def __init__(self, bad=(), error=None):
+		self.bad = bad
+		self.error = error
+		self.calls = 0
+
+	def call(self, method, params):
+		self.calls += 1
+		if self.error is not None:
+			raise ApiError(method, self.error)
+		if any(p['host'] in self.bad for p in params):
+			raise ApiError(method, {'code': -32602, 'message': 'Invalid params.', 'data': 'Incorrect value for field "interfaces".'})
+		return {'hostids': [str(i) for i in range(len(params))]}
+
+
+def hosts(count):
+	return [('h%d' % i, {'host': 'h%d' % i}) for i in range(count)]
+
+
+class TestCallItems(unittest.TestCase):
+
+	def test_bad_item_is_found_in_halves(self):
+		api = FakeApi(bad=('h5',))
+		failures = []
+		ids = provision.callItems(api.call, 'host.create', hosts(16), failures)
+		self.assertEqual([f[0] for f in failures], ['h5'])
+		self.assertEqual(len(ids), 15)
+		self.assertNotIn('h5', ids)
+
+	def test_error_of_every_item_stops_the_halving(self):
+		api = FakeApi(error={'code': -32602, 'message': 'Invalid params.', 'data': 'No permissions to referred object or it does not exist!'})
+		failures = []
+		ids = provision.callItems(api.call, 'host.create', hosts(100), failures)
+		self.assertEqual(ids, {})
+		self.assertEqual(len(failures), 100)
+		# the whole chunk and its two halves
+		self.assertEqual(api.calls, 3)
+
+
+if __name__ == '__main__':
+	unittest.main()
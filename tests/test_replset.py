@@ -0,0 +1,90 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_replset.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 20:30
+'
+'''
+
+import datetime
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import replset
+
+
+class FakeBatch(object):
+
+	def __init__(self):
+		self.values = {}
+
+	def add(self, zabbix_host, item_key, item_value, clock=None):
+		self.values[(zabbix_host, item_key)] = item_value
+
+
+members = [
+	{'ip': '127.0.0.1', 'port': 27017, 'role': 'not arbiter'},
+	{'ip': '127.0.0.2', 'port': 27018, 'role': 'not arbiter'},
+	{'ip': '127.0.0.3', 'port': 27019, 'role': 'arbiter'}
+]
+
+
+def statusReply(names):
+	'''A replSetGetStatus reply of the members, the first one primary and answering.'''
+	now = datetime.datetime(2026, 10, 18, 12, 0, 0)
+	return {'members': [
+		{'name': names[0], 'health': 1.0, 'state': 1, 'optimeDate': now, 'self': True},
+		{'name': names[1], 'health': 1.0, 'state': 2, 'optimeDate': now - datetime.timedelta(seconds=3), 'pingMs': 2},
+		{'name': names[2], 'health': 1.0, 'state': 7, 'pingMs': 1}
+	]}
+
+
+class TestProcessReplset(unittest.TestCase):
+
+	def setUp(self):
+		self.saved = (replset.getReplSetStatus, replset.process_arbiter)
+		self.probed = []
+		replset.process_arbiter = lambda ip, port, batch, hostname, prefix: self.probed.append(ip)
+
+	def tearDown(self):
+		replset.getReplSetStatus, replset.process_arbiter = self.saved
+
+	def run_replset(self, names):
+		reply = statusReply(names)
+		replset.getReplSetStatus = lambda set_name, members, user, pwd: (reply, 0, members[0])
+		batch = FakeBatch()
+		replset.process_replset('rs0', members, batch, 'repl_', 'mongo')
+		return batch.values
+
+	def test_members_named_by_ip(self):
+		values = self.run_replset(['127.0.0.1:27017', '127.0.0.2:27018', '127.0.0.3:27019'])
+		self.assertEqual(values[('repl_127.0.0.1', 'mongo.repl.state')], '1')
+		self.assertEqual(values[('repl_127.0.0.2', 'mongo.repl.lag')], '3.0000')
+		self.assertEqual(values[('repl_127.0.0.3', 'mongo.alive')], '1')
+		self.assertEqual(self.probed, [])
+
+	def test_members_named_by_host_name(self):
+		# the answering member is found by its self flag, the others by resolving their names
+		values = self.run_replset(['db0.example.invalid:27017', 'localhost:27018', 'db2.example.invalid:27019'])
+		self.assertEqual(values[('repl_127.0.0.1', 'mongo.repl.state')], '1')
+		self.assertEqual(values.get(('repl_127.0.0.2', 'mongo.repl.state')), None)
+		self.assertEqual(self.probed, ['127.0.0.3'])
+		self.assertNotIn(('repl_127.0.0.3', 'mongo.alive'), values)
+
+	def test_match_by_resolved_host(self):
+		reply = statusReply(['a.example.invalid:27017', 'b.example.invalid:27018', 'localhost:27017'])
+		found = replset.matchMembers(reply, [{'ip': '127.0.0.1', 'port': 27017, 'role': 'arbiter'}], None)
+		self.assertEqual(found, {'127.0.0.1:27017': 'localhost:27017'})
+
+	def test_arbiter_probed_when_no_member_answers(self):
+		replset.getReplSetStatus = lambda set_name, members, user, pwd: (None, 0, None)
+		replset.process_replset('rs0', members, FakeBatch(), 'repl_', 'mongo')
+		self.assertEqual(self.probed, ['127.0.0.3'])
+
+
+if __name__ == '__main__':
+	unittest.main()
@@ -0,0 +1,188 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_sender.py
+'@author: liyunting
+'@version: 3
+'@lastModify: 2026-10-18 12:20
+'
+'''
+
+import json
+import os
+import socket
+import struct
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import sender
+from mongodb_zabbix.sender import ZabbixSender, packJson
+
+
+class FakeTrapper(object):
+	'''A zabbix trapper on 127.0.0.1 that records every request and answers as told.
+
+	reply(data) returns the info string of the reply to a request, or one of
+	'close' to close the connection without replying and 'hang' to never reply.
+	'''
+
+	def __init__(self, reply):
+		self.reply = reply
+		self.requests = []
+		self.headers = []
+		self.connections = 0
+		self.hung = []
+		self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.server.bind(('127.0.0.1', 0))
+		self.server.listen(16)
+		self.address = '127.0.0.1:%d' % self.server.getsockname()[1]
+		self.thread = threading.Thread(target=self.serve)
+		self.thread.daemon = True
+		self.thread.start()
+
+	def serve(self):
+		while True:
+			try:
+				conn, peer = self.server.accept()
+			except socket.error:
+				return
+			self.connections += 1
+			header = sender.recv_exact(conn, sender.zbx_header_size)
+			length = struct.unpack('<Q', header[5:])[0]
+			payload = json.loads(sender.recv_exact(conn, length).decode('utf-8'))
+			self.headers.append((header[:5], length))
+			self.requests.append(payload)
+			info = self.reply(payload['data'])
+			if info == 'hang':
+				self.hung.append(conn)
+				continue
+			if info != 'close':
+				data = json.dumps({'response': 'success', 'info': info}).encode('utf-8')
+				conn.sendall(sender.zbx_header + struct.pack('<Q', len(data)) + data)
+			conn.close()
+
+	def close(self):
+		self.server.close()
+		for conn in self.hung:
+			conn.close()
+
+
+def accept(data):
+	return 'processed: %d; failed: 0; total: %d; seconds spent: 0.000100' % (len(data), len(data))
+
+
+def values(count):
+	return [('mongo_127.0.0.1', 'mongo.item%d' % i, str(i), 1760000000123456789 + i) for i in range(count)]
+
+
+class TestZabbixSender(unittest.TestCase):
+
+	def trapper(self, reply):
+		trapper = FakeTrapper(reply)
+		self.addCleanup(trapper.close)
+		return trapper
+
+	def test_framing(self):
+		trapper = self.trapper(accept)
+		result = ZabbixSender(trapper.address).send(values(3))
+		self.assertEqual(trapper.headers[0][0], b'ZBXD\x01')
+		request = trapper.requests[0]
+		self.assertEqual(trapper.headers[0][1], len(json.dumps(request, separators=(',', ':')).encode('utf-8')))
+		self.assertEqual(request['request'], 'sender data')
+		self.assertIn('clock', request)
+		self.assertIn('ns', request)
+		self.assertEqual(request['data'][1], {'host': 'mongo_127.0.0.1', 'key': 'mongo.item1', 'value': '1',
+			'clock': 1760000000, 'ns': 123456790})
+		self.assertTrue(result.delivered)
+
+	def test_chunks(self):
+		trapper = self.trapper(accept)
+		result = ZabbixSender(trapper.address, chunk_size=2).send(values(5))
+		self.assertEqual([len(r['data']) for r in trapper.requests], [2, 2, 1])
+		self.assertEqual((result.processed, result.failed, result.total), (5, 0, 5))
+
+	def test_processed_and_failed(self):
+		trapper = self.trapper(lambda data: 'processed: 3; failed: 1; total: 4; seconds spent: 0.000250')
+		result = ZabbixSender(trapper.address).send(values(4))
+		self.assertEqual((result.processed, result.failed, result.total), (3, 1, 4))
+		self.assertAlmostEqual(result.seconds_spent, 0.00025)
+		self.assertTrue(result.delivered)
+		self.assertEqual(result.undelivered, [])
+
+	def test_unparsable_info_counts_all_failed(self):
+		trapper = self.trapper(lambda data: 'garbage')
+		result = ZabbixSender(trapper.address).send(values(4))
+		self.assertEqual((result.processed, result.failed), (0, 4))
+
+	def test_partial_failure(self):
+		# the trapper drops the connection of the second request
+		replies = iter([accept, lambda data: 'close', accept])
+		trapper = self.trapper(lambda data: next(replies)(data))
+		items = values(6)
+		result = ZabbixSender(trapper.address, chunk_size=2).send(items)
+		self.assertEqual(trapper.connections, 2)
+		self.assertFalse(result.delivered)
+		self.assertEqual((result.processed, result.failed, result.total), (2, 4, 6))
+		self.assertEqual(result.undelivered, items[2:])
+
+	def test_hung_trapper(self):
+		trapper = self.trapper(lambda data: 'hang')
+		items = values(1500)
+		start = time.time()
+		result = ZabbixSender(trapper.address, timeout=0.5).send(items)
+		self.assertLess(time.time() - start, 2)
+		self.assertEqual(trapper.connections, 1)
+		self.assertFalse(result.delivered)
+		self.assertEqual(result.undelivered, items)
+		self.assertEqual(result.failed, 1500)
+
+
+class TestPackJson(unittest.TestCase):
+
+	def test_pack_by_host_and_prefix(self):
+		items = [
+			('h1', 'mongo.alive', '1', 10),
+			('h1', 'mongo.version', '4.0.6', 11),
+			('h1', 'collector.send', '0.5', 12),
+			('h1', 'shard.discovery', '{"data":[]}', 13),
+			('h2', 'mongo.alive', '0', 14)
+		]
+		packed = packJson(items, ('collector.',))
+		self.assertEqual(packed, [
+			('h1', 'collector.send', '0.5', 12),
+			('h1', 'shard.discovery', '{"data":[]}', 13),
+			('h1', 'mongo.json', '{"alive":1,"version":"4.0.6"}', 10),
+			('h2', 'mongo.json', '{"alive":0}', 14)
+		])
+
+	def test_defaults_fill_the_missing_fields(self):
+		items = [('h1', 'mongo.alive', '0', 10), ('h1', 'mongo.timeout', '0', 11)]
+		defaults = [
+			('h1', [('mongo.alive', '1'), ('mongo.conn.current', '0'), ('mongo.version', '')]),
+			('h2', [('mongo.alive', '0')])
+		]
+		self.assertEqual(packJson(items, (), defaults), [
+			('h1', 'mongo.json', '{"alive":0,"timeout":0,"conn.current":0,"version":""}', 10)
+		])
+
+	def test_later_sample_of_a_field_starts_another_document(self):
+		# a node late in the previous cycle, then polled again in this one
+		items = [
+			('h1', 'mongo.alive', '1', 10),
+			('h1', 'mongo.conn.current', '5', 10),
+			('h1', 'mongo.alive', '1', 20),
+			('h1', 'mongo.conn.current', '7', 20),
+			('h1', 'mongo.timeout', '0', 21)
+		]
+		defaults = [('h1', [('mongo.timeout', '0')])]
+		self.assertEqual(packJson(items, (), defaults), [
+			('h1', 'mongo.json', '{"alive":1,"conn.current":5,"timeout":0}', 10),
+			('h1', 'mongo.json', '{"alive":1,"conn.current":7,"timeout":0}', 20)
+		])
+
+
+if __name__ == '__main__':
+	unittest.main()
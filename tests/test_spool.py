@@ -0,0 +1,85 @@
+#-*- coding: utf-8 -*-
+
+'''
+'@file: test_spool.py
+'@author: liyunting
+'@version: 1
+'@lastModify: 2026-10-18 12:10
+'
+'''
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from mongodb_zabbix import instrument
+from mongodb_zabbix.sender import SendResult, ZabbixBatch
+from mongodb_zabbix.spool import Spool
+
+
+class FakeSender(object):
+	'''Stands for a ZabbixSender that delivers every chunk at once.'''
+
+	chunk_size = 10
+
+	def __init__(self):
+		self.chunks = []
+
+	def send(self, items):
+		self.chunks.append(list(items))
+		return SendResult(len(items), 0, len(items))
+
+	def send_chunk(self, data):
+		self.chunks.append(data)
+		return SendResult(len(data), 0, len(data))
+
+
+def values(count):
+	return [('mongo_127.0.0.1', 'mongo.item%d' % i, str(i), 1760000000000000000 + i) for i in range(count)]
+
+
+class TestReplay(unittest.TestCase):
+
+	def setUp(self):
+		self.path = tempfile.mkdtemp()
+		self.addCleanup(shutil.rmtree, self.path)
+		# 100 values per second, 10 per chunk: a chunk every 0.1 s
+		self.spool = Spool(self.path, max_rate=100)
+		self.spool.append(values(100), FakeSender.chunk_size)
+
+	def test_replay_stops_at_the_deadline(self):
+		sender = FakeSender()
+		start = time.time()
+		result = self.spool.replay(sender, start + 0.25)
+		self.assertLess(time.time() - start, 0.3)
+		self.assertEqual(result.processed, 30)
+		# the rest is replayed from where it stopped
+		result = self.spool.replay(sender)
+		self.assertEqual(result.processed, 70)
+		self.assertEqual([c['key'] for c in sender.chunks[3]], ['mongo.item%d' % i for i in range(30, 40)])
+		self.assertEqual(self.spool.segments(), [])
+
+	def test_no_replay_after_the_deadline(self):
+		result = self.spool.replay(FakeSender(), time.time() - 1)
+		self.assertEqual(result.total, 0)
+		self.assertEqual(self.spool.stats()['replayed'], 0)
+
+	def test_replay_is_timed_apart_from_send(self):
+		batch = ZabbixBatch('127.0.0.1', self.spool)
+		batch.sender = FakeSender()
+		batch.add('mongo_127.0.0.1', 'mongo.alive', '1')
+		instrument.stats.reset()
+		start = time.time()
+		result = batch.send(start + 0.15)
+		timings = instrument.stats.reset()[0]
+		self.assertEqual(result.processed, 21)
+		self.assertLess(timings['send'][2], 0.05)
+		self.assertGreater(timings['replay'][2], 0.05)
+
+
+if __name__ == '__main__':
+	unittest.main()